@@ -2,7 +2,7 @@ from flask import Blueprint, jsonify, request
 from flask_cors import cross_origin
 from ucs import UCSUtil
 from config import Const
-from db import YamlDB
+from db import YamlDB, config_cached
 
 aci = Blueprint("aci", __name__)
 
@@ -74,6 +74,7 @@ class ACI(object):
 
 @aci.route(Const.API_ROOT2 + "/aci", methods=['GET', 'POST', 'PUT', 'DELETE'])
 @cross_origin()
+@config_cached
 def aci_handler():
     if request.method == 'POST':
         j, rc = ACI.create_aci(request.json)
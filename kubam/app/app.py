@@ -4,11 +4,13 @@ from aci import aci
 from deploy import deploy
 from host import hosts
 from iso import isos
-from monitor import monitor
+from monitor import monitor, Inventory
 from network import networks
 from server import servers
 from setting import setting
 from disks import disks
+from metrics import metrics
+from tracing import tracing
 
 app = Flask(__name__)
 app.register_blueprint(aci)
@@ -16,11 +18,15 @@ app.register_blueprint(deploy)
 app.register_blueprint(disks)
 app.register_blueprint(hosts)
 app.register_blueprint(isos)
+app.register_blueprint(metrics)
 app.register_blueprint(monitor)
 app.register_blueprint(networks)
 app.register_blueprint(servers)
 app.register_blueprint(setting)
+app.register_blueprint(tracing)
 CORS(app)
+# the last known inventory of the server groups is there from the start.
+Inventory.warm()
 
 
 @app.route('/')
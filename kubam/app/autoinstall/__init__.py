@@ -1,2 +1,3 @@
 from builder import Builder
 from iso_maker import IsoMaker
+from iso_catalog import IsoCatalog
@@ -1,11 +1,12 @@
 from jinja2 import Environment, FileSystemLoader
-from subprocess import call
-from os import path, chdir, pardir
+from os import path, pardir
 from kickstart import Kickstart
 from vmware import VMware
 from windows import Windows
 from db import YamlDB
 from config import Const
+from tracing import Tracer
+from metrics import Metrics
 
 
 class Builder(object):
@@ -111,15 +112,14 @@ class Builder(object):
     def make_post():
         if path.isdir(Const.KUBAM_DIR + "post/ansible"):
             return 0, "ansible scripts already exist. Do not modify."
-        o = call(["mkdir" , "-p", Const.KUBAM_DIR + "post"])
+        o = Tracer.call(["mkdir" , "-p", Const.KUBAM_DIR + "post"])
         if not o == 0:
             return 1, "error making {0} directory".format(Const.KUBAM_DIR + "post")
-        o = call(["cp", "-a", Const.KUBAM_SHARE_DIR + "/ansible", Const.KUBAM_DIR + "post/"])
+        o = Tracer.call(["cp", "-a", Const.KUBAM_SHARE_DIR + "/ansible", Const.KUBAM_DIR + "post/"])
         if not o == 0:
             return 1, "error copying ansible components to {0} directory".format(Const.KUBAM_DIR + "post")
 
-        chdir(Const.KUBAM_DIR + "post")
-        o = call(["tar", "czf", Const.KUBAM_DIR + "post/ansible.tgz", "ansible"])
+        o = Tracer.call(["tar", "czf", Const.KUBAM_DIR + "post/ansible.tgz", "-C", Const.KUBAM_DIR + "post", "ansible"])
         if not o == 0:
             return 1, "error creating tar archive of ansible scripts."
         return 0, ""
@@ -140,13 +140,23 @@ class Builder(object):
             return err, msg
 
         for host in hosts:
-            err, msg, template, net_template  = Builder.build_template(host, config)
+            err, msg = Builder.make_image(host, config)
             if err > 0:
                 print err, msg
                 break
-            err, msg = Builder.build_boot_image(host, template, net_template)
-            if err == 1:
-                print err, msg
-                break
 
         return err, msg
+
+    @staticmethod
+    def make_image(host, config):
+        """
+        Build the installation image of one host.  The post directory has to be made first.
+        """
+        with Metrics.timer("kubam_image_build_seconds", stage="template", os=host['os']), \
+                Tracer.span("build_template", host=host['name'], os=host['os']):
+            err, msg, template, net_template = Builder.build_template(host, config)
+        if err > 0:
+            return err, msg
+        with Metrics.timer("kubam_image_build_seconds", stage="boot_image", os=host['os']), \
+                Tracer.span("build_boot_image", host=host['name'], os=host['os']):
+            return Builder.build_boot_image(host, template, net_template)
@@ -0,0 +1,149 @@
+import os
+import re
+import yaml
+import shutil
+import hashlib
+import tempfile
+import threading
+from config import Const
+from tracing import Tracer
+
+
+class IsoCatalog(object):
+    """
+    Persistent index of the ISO images in the kubam directory.  Every entry keeps the size, mtime,
+    a content hash and the operating systems the image was detected as, so a listing only needs to
+    stat the files and detection runs once per new or changed image.
+    """
+    lock = threading.Lock()
+    # Bytes hashed from the start and the end of an image. Hashing whole DVDs on every change
+    # would take minutes, the head and tail plus the size are enough to tell images apart.
+    HASH_BLOCK = 4 * 1024 * 1024
+
+    def __init__(self, directory=Const.KUBAM_DIR, catalog_file=Const.ISO_CATALOG):
+        self.directory = directory
+        self.catalog_file = catalog_file
+
+    def load(self):
+        try:
+            with open(self.catalog_file, "r") as f:
+                catalog = yaml.safe_load(f)
+        except (IOError, yaml.YAMLError):
+            return {}
+        if not isinstance(catalog, dict):
+            return {}
+        return catalog
+
+    def save(self, catalog):
+        tmp_file = self.catalog_file + ".tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                yaml.safe_dump(catalog, f, default_flow_style=False)
+            os.rename(tmp_file, self.catalog_file)
+        except (IOError, OSError) as err:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return 1, "{0} {1}".format(err.strerror, self.catalog_file)
+        return 0, None
+
+    @staticmethod
+    def content_hash(iso, size):
+        h = hashlib.sha1()
+        h.update(str(size))
+        with open(iso, "rb") as f:
+            h.update(f.read(IsoCatalog.HASH_BLOCK))
+            if size > IsoCatalog.HASH_BLOCK:
+                f.seek(max(IsoCatalog.HASH_BLOCK, size - IsoCatalog.HASH_BLOCK))
+                h.update(f.read(IsoCatalog.HASH_BLOCK))
+        return h.hexdigest()
+
+    @staticmethod
+    def detect(iso):
+        """
+        Work out which operating systems an ISO image could be by pulling just the key files
+        listed in Const.OS_DICT out of it, without extracting the image.
+        :return: list of matching OS names, e.g: ["centos7.4"], None if osirrox could not be run.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        found = []
+        try:
+            key_files = sorted(set([o["key_file"] for o in Const.OS_DICT.values()]))
+            with open(os.devnull, "w") as devnull:
+                for i, key_file in enumerate(key_files):
+                    out = os.path.join(tmp_dir, str(i))
+                    try:
+                        o = Tracer.call(
+                            ["osirrox", "-indev", iso, "-extract", "/" + key_file, out],
+                            stdout=devnull, stderr=devnull
+                        )
+                    except OSError as err:
+                        print "unable to run osirrox: {0}".format(err)
+                        return None
+                    if not o == 0 or not os.path.isfile(out):
+                        continue
+                    with open(out, "r") as f:
+                        content = f.read()
+                    for name, info in Const.OS_DICT.items():
+                        if info["key_file"] == key_file and re.search(info["key_string"], content):
+                            found.append(name)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return sorted(found)
+
+    def state(self, entry):
+        """
+        Extraction state of the image: whether the tree and boot ISO for the detected OS exist.
+        """
+        entry["extracted"] = any(
+            os.path.isdir(os.path.join(self.directory, Const.OS_DICT[o]["dir"])) for o in entry["os"]
+        )
+        entry["boot_iso"] = any(
+            os.path.isfile(os.path.join(self.directory, o + "-boot.iso")) for o in entry["os"]
+        )
+        return entry
+
+    def refresh(self):
+        """
+        Stat every ISO in the directory and only hash and detect the ones that are new or whose
+        size or mtime changed since the catalog was last written.
+        :return: err, msg, list of catalog entries sorted by name
+        """
+        r = re.compile("iso$", re.IGNORECASE)
+        try:
+            files = filter(r.search, os.listdir(self.directory))
+        except OSError as err:
+            return 1, err.strerror + ": " + err.filename, None
+
+        with IsoCatalog.lock:
+            catalog = self.load()
+            changed = False
+            seen = {}
+            for name in files:
+                iso = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(iso)
+                except OSError:
+                    continue
+                if not os.path.isfile(iso):
+                    continue
+                entry = catalog.get(name)
+                if (not entry or not entry.get("detected") or
+                        entry.get("size") != st.st_size or entry.get("mtime") != int(st.st_mtime)):
+                    oses = self.detect(iso)
+                    entry = {
+                        "name": name,
+                        "file": iso,
+                        "size": st.st_size,
+                        "mtime": int(st.st_mtime),
+                        "hash": self.content_hash(iso, st.st_size),
+                        "os": oses or [],
+                        # try again next time if detection could not run at all.
+                        "detected": oses is not None
+                    }
+                    changed = True
+                seen[name] = self.state(entry)
+            if changed or len(seen) != len(catalog):
+                err, msg = self.save(seen)
+                if err != 0:
+                    return err, msg, None
+        return 0, None, [seen[n] for n in sorted(seen)]
@@ -2,12 +2,18 @@ import os
 import re
 import random
 import string
-import subprocess 
+import hashlib
+from multiprocessing.pool import ThreadPool
 from shutil import rmtree
 from config import Const
+from tracing import Tracer
+from rpm_payload import RpmPayload
 
 
 class IsoMaker(object):
+    # Parts of an extracted CentOS/RHEL tree that make up the boot ISO.
+    BOOT_PARTS = ["isolinux", ".discinfo", "LiveOS", "images"]
+
     @staticmethod
     def list_isos(directory):
         """
@@ -28,7 +34,7 @@ class IsoMaker(object):
     @staticmethod
     def extract_isos(isomap):
         for o in isomap:  
-            os_dir = "/kubam/" + Const.OS_DICT[o['os']]['dir']
+            os_dir = Const.KUBAM_DIR + Const.OS_DICT[o['os']]['dir']
             if not os.path.isdir(os_dir):
                 err, msg = IsoMaker.extract_iso(o['file'], os_dir)
                 if err != 0:
@@ -48,22 +54,14 @@ class IsoMaker(object):
         """
         if not osname in ['rhvh4.1']:
             return 0, None 
-        os.chdir(mnt_dir)
-        files = [x for x in os.listdir("Packages") if x.startswith("redhat-virtualization-host-image-update")]
+        files = [x for x in os.listdir(mnt_dir + "/Packages") if x.startswith("redhat-virtualization-host-image-update")]
         if len(files) < 1:
             return 1, "Unable to find redhat-virtualization-host-image-update package in source" 
-        #o = call(["rpm2cpio", "Packages/" + files[0], "|", "cpio", "-idmv"])
-        ps = subprocess.Popen(('rpm2cpio', 'Packages/' + files[0]), stdout=subprocess.PIPE)
-        output = subprocess.check_output(('cpio', '-idmv'), stdin=ps.stdout)
-        ps.wait()
-        #if not o == 0:
-        #    return 1, "Unable to extract virtualization host image from rhvh4.1 iso directory" 
-        files = [x for x in os.listdir(mnt_dir + "/usr/share/redhat-virtualization-host/image") if x.endswith("squashfs.img")]
-        if len(files) < 1:
-            return 1, "Unable to find squashfs image" 
-        o = subprocess.call(["mv", "usr/share/redhat-virtualization-host/image/" + files[0], mnt_dir + "/squashfs.img"])
-        if not o == 0:
-            return 1, "Unable to move extracted virtualization host squashfs.img" 
+        # Stream only the squashfs image out of the package instead of rpm2cpio | cpio -idmv
+        # of the whole thing into the tree.
+        err, msg = RpmPayload(mnt_dir + "/Packages/" + files[0]).extract("squashfs.img", mnt_dir + "/squashfs.img")
+        if err != 0:
+            return 1, "Unable to extract virtualization host squashfs.img: {0}".format(msg)
         return 0, None
         
 
@@ -82,7 +80,7 @@ class IsoMaker(object):
             return 1, "iso file {0} not found".format(iso)
         # osirrox -prog kubam -indev ./*.iso -extract . centos7.3
         
-        o = subprocess.call(["osirrox", "-acl", "off", "-prog", "kubam", "-indev", iso, "-extract", ".", mnt_dir])
+        o = Tracer.call(["osirrox", "-acl", "off", "-prog", "kubam", "-indev", iso, "-extract", ".", mnt_dir])
         if not o == 0:
             return 1, "error extracting ISO file.  Bad ISO file?"
         return err, "success"
@@ -98,8 +96,8 @@ class IsoMaker(object):
             except OSError as err:
                 # Permission denied error on ISO image.
                 if err.errno == 13:
-                    subprocess.call(["chmod", "-R", "0755", os_dir])
-                    subprocess.call(["chmod", "0755", fname])
+                    Tracer.call(["chmod", "-R", "0755", os_dir])
+                    Tracer.call(["chmod", "0755", fname])
                     f = open(fname, "r")
 
             for line in f:
@@ -107,73 +105,126 @@ class IsoMaker(object):
                     return Const.OS_DICT[iso['os']]
         return None
 
+    @staticmethod
+    def link_tree(src, dst):
+        """
+        Recreate the src file or directory at dst without copying the data: files are hard linked
+        into place and only fall back to a (reflink when the filesystem supports it) copy when
+        src and dst are on different filesystems.
+        :param src: /kubam/centos7.4/LiveOS
+        :param dst: /kubam/tmp/ABCDE/isolinux/LiveOS
+        :return: error code and message
+        """
+        if os.path.isfile(src):
+            pairs = [(src, dst)]
+        else:
+            pairs = []
+            for root, dirs, files in os.walk(src):
+                target = os.path.normpath(os.path.join(dst, os.path.relpath(root, src)))
+                if not os.path.isdir(target):
+                    os.makedirs(target)
+                for f in files:
+                    pairs.append((os.path.join(root, f), os.path.join(target, f)))
+        for s, d in pairs:
+            try:
+                os.link(s, d)
+            except OSError:
+                o = Tracer.call(["cp", "-a", "--reflink=auto", s, d])
+                if not o == 0:
+                    return 1, "Unable to stage {0} to {1}".format(s, d)
+        return 0, None
+
+    @staticmethod
+    def boot_fingerprint(os_dir, stage1_cfg):
+        """
+        Hash the stage1 isolinux.cfg contents together with the path, size and mtime of every
+        file of the extracted tree that goes into the boot ISO.  If either changes the boot ISO
+        has to be rebuilt.
+        """
+        h = hashlib.sha1()
+        with open(stage1_cfg, "rb") as f:
+            h.update(f.read())
+        for part in IsoMaker.BOOT_PARTS:
+            top = os.path.join(os_dir, part)
+            if os.path.isfile(top):
+                entries = [top]
+            else:
+                entries = []
+                for root, dirs, files in os.walk(top):
+                    dirs.sort()
+                    entries.extend(os.path.join(root, f) for f in sorted(files))
+            for e in entries:
+                st = os.stat(e)
+                h.update("{0}:{1}:{2}\n".format(os.path.relpath(e, os_dir), st.st_size, int(st.st_mtime)))
+        return h.hexdigest()
+
     @staticmethod
     def mkboot_centos(os_name, version):
-        boot_iso = "/kubam/" + os_name + version + "-boot.iso"
-        if os.path.isfile(boot_iso):
-            return 0, "boot iso was already created"
-        os_dir = "/kubam/" + os_name + version
-        stage_dir = "/kubam/tmp/" + str().join(random.choice(string.ascii_uppercase + string.digits) for _ in range(5))
-        o = subprocess.call(["mkdir", "-p", stage_dir])
-        if not o == 0:
-            return 1, "Unable to make directory " + stage_dir
-        o = subprocess.call(["cp", "-a", os_dir + "/isolinux", stage_dir])
-        if not o == 0:
-            return 1, "Unable to copy /isolinux to {0}".format(stage_dir)
-        o = subprocess.call(["cp", "-a", os_dir + "/.discinfo", stage_dir + "/isolinux/"])
-        if not o == 0:
-            return 1, "Unable to copy /.discinfo to {0}".format(stage_dir)
-        o = subprocess.call(["cp", "-a", os_dir + "/LiveOS", stage_dir + "/isolinux/"])
-        if not o == 0:
-            return 1, "Unable to copy /LiveOS to {0}".format(stage_dir)
-        o = subprocess.call(["cp", "-a", os_dir + "/images/", stage_dir + "/isolinux/"])
-        if not o == 0:
-            return 1, "Unable to copy /images/ to {0}".format(stage_dir)
-        o = subprocess.call(["cp", "-a", "/usr/share/kubam/stage1/"+os_name+version+"/isolinux.cfg", stage_dir + "/isolinux/"])
-        if not o == 0:
-            return 1, "Unable to copy /isolinux.cfg to {0}".format(stage_dir)
+        boot_iso = Const.KUBAM_DIR + os_name + version + "-boot.iso"
+        stamp_file = boot_iso + ".stamp"
+        os_dir = Const.KUBAM_DIR + os_name + version
+        stage1_cfg = Const.KUBAM_SHARE_DIR + "stage1/" + os_name + version + "/isolinux.cfg"
+        if not os.path.isfile(stage1_cfg):
+            return 1, "Unable to find {0}".format(stage1_cfg)
+        fingerprint = IsoMaker.boot_fingerprint(os_dir, stage1_cfg)
+        if os.path.isfile(boot_iso) and os.path.isfile(stamp_file):
+            with open(stamp_file, "r") as f:
+                if f.read().strip() == fingerprint:
+                    return 0, "boot iso was already created"
 
-        os.chdir("/kubam")
-        o = 0
-        if os_name == "centos":
-            o = subprocess.call([
-                "mkisofs", "-o", boot_iso, "-b", "isolinux.bin", "-c", "boot.cat", "-no-emul-boot", "-V",
-                "CentOS 7 x86_64", "-boot-load-size", "4", "-boot-info-table", "-r",
-                "-J", "-v", "-T", stage_dir + "/isolinux"
-            ])
-        elif os_name == "redhat":
-            o = subprocess.call([
-                "mkisofs", "-o", boot_iso, "-b", "isolinux.bin", "-c", "boot.cat", "-no-emul-boot", "-V",
-                "RHEL-" + version + " Server.x86_64", "-boot-load-size", "4", "-boot-info-table", "-r",
-                "-J", "-v", "-T", stage_dir + "/isolinux"
-            ])
+        stage_dir = Const.KUBAM_DIR + "tmp/" + str().join(random.choice(string.ascii_uppercase + string.digits) for _ in range(5))
+        try:
+            # isolinux/ is small and mkisofs -boot-info-table patches isolinux.bin in place, so
+            # that one gets a real copy.  The big parts are linked in from the extracted tree.
+            o = Tracer.call(["mkdir", "-p", stage_dir])
+            if not o == 0:
+                return 1, "Unable to make directory " + stage_dir
+            o = Tracer.call(["cp", "-a", os_dir + "/isolinux", stage_dir])
+            if not o == 0:
+                return 1, "Unable to copy /isolinux to {0}".format(stage_dir)
+            for part in IsoMaker.BOOT_PARTS[1:]:
+                err, msg = IsoMaker.link_tree(os_dir + "/" + part, stage_dir + "/isolinux/" + part)
+                if err != 0:
+                    return err, msg
+            o = Tracer.call(["cp", "-f", stage1_cfg, stage_dir + "/isolinux/isolinux.cfg"])
+            if not o == 0:
+                return 1, "Unable to copy /isolinux.cfg to {0}".format(stage_dir)
 
-        elif os_name == "rhvh":
-            o = subprocess.call([
-                "mkisofs", "-o", boot_iso, "-b", "isolinux.bin", "-c", "boot.cat", "-no-emul-boot", "-V",
-                "RHVH-" + version + " RHVH.x86_64", "-boot-load-size", "4", "-boot-info-table", "-r",
+            volume = {
+                "centos": "CentOS 7 x86_64",
+                "redhat": "RHEL-" + version + " Server.x86_64",
+                "rhvh": "RHVH-" + version + " RHVH.x86_64"
+            }
+            if os_name not in volume:
+                return 1, "no boot iso recipe for {0}".format(os_name)
+            # Write to a partial file so an interrupted build never looks like a finished ISO.
+            o = Tracer.call([
+                "mkisofs", "-o", boot_iso + ".part", "-b", "isolinux.bin", "-c", "boot.cat", "-no-emul-boot", "-V",
+                volume[os_name], "-boot-load-size", "4", "-boot-info-table", "-r",
                 "-J", "-v", "-T", stage_dir + "/isolinux"
             ])
-        
-
-        if not o == 0:
-            return 1, "mkisofs failed for {0}".format(boot_iso)
+            if not o == 0:
+                return 1, "mkisofs failed for {0}".format(boot_iso)
+            os.rename(boot_iso + ".part", boot_iso)
+            with open(stamp_file, "w") as f:
+                f.write(fingerprint)
+        finally:
+            rmtree(stage_dir, ignore_errors=True)
         return 0, "success"
 
     @staticmethod
     def mkboot_esxi(os_name, version):
-        boot_iso = "/kubam/" + os_name + version + "-boot.iso"
+        boot_iso = Const.KUBAM_DIR + os_name + version + "-boot.iso"
         if os.path.isfile(boot_iso):
             return 0, "boot iso was already created"
-        os_dir = "/kubam/" + os_name + version
+        os_dir = Const.KUBAM_DIR + os_name + version
         # Overwrite the boot directory
-        o = subprocess.call(["cp", "-a", "/usr/share/kubam/stage1/esxi" + version + "/BOOT.CFG", os_dir])
+        o = Tracer.call(["cp", "-a", Const.KUBAM_SHARE_DIR + "stage1/esxi" + version + "/BOOT.CFG", os_dir])
         if not o == 0:
             return 1, "Unable to copy /usr/share/kubam/stage1/esxi{0}/BOOT.CFG to {1}".format(version, os_dir)
 
-        os.chdir("/kubam")
         # https://docs.vmware.com/en/VMware-vSphere/6.5/com.vmware.vsphere.install.doc/GUID-C03EADEA-A192-4AB4-9B71-9256A9CB1F9C.html
-        o = subprocess.call([
+        o = Tracer.call([
             "mkisofs", "-relaxed-filenames", "-J", "-R", "-o", boot_iso, "-b", "ISOLINUX.BIN", "-c", "boot.cat",
             "-no-emul-boot", "-boot-load-size", "4", "-boot-info-table", "-no-emul-boot", os_dir
         ])
@@ -187,7 +238,7 @@ class IsoMaker(object):
         """ 
         check that winpe is there as this is a seperate step
         """
-        if not os.path.isfile("/kubam/WinPE_KUBAM.iso"):
+        if not os.path.isfile(Const.KUBAM_DIR + "WinPE_KUBAM.iso"):
             return 1, "KUBAM WinPE_KUBAM.iso file not found.  This is a separate step. See: https://ciscoucs.github.io/site/kubam/configure/windows2.html"
         return 0, "success"
 
@@ -216,10 +267,19 @@ class IsoMaker(object):
     @staticmethod
     def mkboot_isos(isos):
         """
-        Make boot isos for all images. 
+        Make boot isos for all images.  Each OS is built in its own worker as they
+        don't share any files.
         """
-        for iso in isos:
-            err, msg = IsoMaker.mkboot(iso["os"])
+        oses = sorted(set([iso["os"] for iso in isos]))
+        if not oses:
+            return 0, None
+        pool = ThreadPool(min(len(oses), Const.BOOT_ISO_WORKERS))
+        try:
+            results = pool.map(Tracer.wrap(IsoMaker.mkboot), oses)
+        finally:
+            pool.close()
+            pool.join()
+        for err, msg in results:
             if err != 0:
                 return err, msg
         return 0, None
@@ -236,7 +296,7 @@ class IsoMaker(object):
         err = 0
         msg = None
         for iso in isos:
-            tmp_dir = "/kubam/tmp/"
+            tmp_dir = Const.KUBAM_DIR + "tmp/"
             tmp_dir += str().join(random.choice(string.ascii_uppercase + string.digits) for _ in range(8))
             err, err_msg = self.extract_iso(iso['file'], tmp_dir)
             if err != 0:
@@ -249,29 +309,29 @@ class IsoMaker(object):
                           "that it was {1}. Please change".format(o['dir'], iso['os'])
                 return 1, err_msg
             # If the directory is already there, we don't touch it.
-            if os.path.isdir("/kubam/" + o['dir']):
+            if os.path.isdir(Const.KUBAM_DIR + o['dir']):
                 print "removing temp"
                 try:
                     rmtree(tmp_dir)
                 except OSError as err:
                     # Permission denied error on ISO image.
                     if err.errno == 13:
-                        subprocess.call(["chmod", "-R", "0755", tmp_dir])
+                        Tracer.call(["chmod", "-R", "0755", tmp_dir])
                         rmtree(tmp_dir)
             else:
                 print "creating " + o['dir']
                 try:
-                    os.rename(tmp_dir, "/kubam/" + o['dir'])
+                    os.rename(tmp_dir, Const.KUBAM_DIR + o['dir'])
                 except OSError as err:
                     # Permission denied error on ISO image.
                     if err.errno == 13:
-                        subprocess.call(['chmod', '-R', '0755', tmp_dir])
-                        os.rename(tmp_dir, "/kubam/" + o['dir'])
+                        Tracer.call(['chmod', '-R', '0755', tmp_dir])
+                        os.rename(tmp_dir, Const.KUBAM_DIR + o['dir'])
                     else:
                         return 1, err.strerror + ": " + err.filename
 
             # Now that we have tree, get boot media ready.
             err, msg = self.mkboot(o['dir'])
             # Remove tmp directory
-            rmtree("/kubam/tmp")
+            rmtree(Const.KUBAM_DIR + "tmp")
         return err, msg
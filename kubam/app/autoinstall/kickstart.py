@@ -1,5 +1,5 @@
-from subprocess import call
 from config import Const
+from tracing import Tracer
 
 
 class Kickstart(object):
@@ -13,17 +13,17 @@ class Kickstart(object):
         new_image_dir = Const.KUBAM_DIR + node["name"]
 
         # Copy the file to the directory.
-        o = call(["cp", "-f", Const.BASE_IMG, new_image_name])
+        o = Tracer.call(["cp", "-f", Const.BASE_IMG, new_image_name])
         if not o == 0:
             return 1, "not able to copy {0} to {1}".format(Const.BASE_IMG, new_image_name)
 
         # Create mount point
-        o = call(["mkdir", "-p", new_image_dir])
+        o = Tracer.call(["mkdir", "-p", new_image_dir])
         if not o == 0:
             return 1, "not able to call 'mkdir -p {0}'".format(new_image_dir)
 
         # Use fuse to mount the image, e.g: fuseext2 kube01.img kube01 -o rw+,nonempty
-        o = call(["fuseext2", "-o", "rw+,nonempty", new_image_name, new_image_dir])
+        o = Tracer.call(["fuseext2", "-o", "rw+,nonempty", new_image_name, new_image_dir])
         if not o == 0:
             return 1, "not able to run fuseext2 -o rw+,nonempty {0} {1}".format(new_image_name, new_image_dir)
 
@@ -38,18 +38,18 @@ class Kickstart(object):
             return 1, "{0}".format(err.strerror)
 
         # Move this file to ks.cfg
-        o = call(["mv", fw, fw_real])
+        o = Tracer.call(["mv", fw, fw_real])
         if not o == 0:
             return 1, "unable to run: mv {0} {1}".format(fw, fw_real)
 
         # Unmount the filesystem.
-        o = call(["umount", new_image_dir])
+        o = Tracer.call(["umount", new_image_dir])
         if not o == 0:
             pass  # we had a case in ubuntu where this gave an error and still worked.
             # return 1, "unable to unmount {0}".format(new_image_dir)
 
         # Remove mount directory
-        o = call(["rm", "-rf", new_image_dir])
+        o = Tracer.call(["rm", "-rf", new_image_dir])
         if not o == 0:
             return 1, "unable to rm -rf {0}".format(new_image_dir)
         return 0, None
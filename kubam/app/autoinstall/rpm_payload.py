@@ -0,0 +1,170 @@
+import os
+import bz2
+import zlib
+import struct
+import subprocess
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+
+class RpmPayload(object):
+    """
+    Streaming reader for the cpio archive inside an RPM package.  The package is read front to
+    back exactly once: the headers are parsed to find the payload compressor, the payload is
+    decompressed on the fly and the newc cpio members are walked until the wanted one is found.
+    Only that member is written out, everything else is read and thrown away.
+    """
+    LEAD_SIZE = 96
+    HEADER_MAGIC = "\x8e\xad\xe8\x01"
+    PAYLOADCOMPRESSOR = 1125
+    CPIO_MAGIC = ["070701", "070702"]
+    CPIO_TRAILER = "TRAILER!!!"
+    CHUNK = 1024 * 1024
+
+    def __init__(self, rpm_file):
+        self.rpm_file = rpm_file
+
+    @staticmethod
+    def read_header(f, align):
+        """
+        Read an RPM header structure at the current file position and return a dict of
+        tag -> (type, offset, count, data store) so single tags can be looked up.
+        """
+        intro = f.read(16)
+        if len(intro) != 16 or intro[:4] != RpmPayload.HEADER_MAGIC:
+            raise ValueError("bad rpm header magic")
+        nindex, hsize = struct.unpack(">II", intro[8:16])
+        index = f.read(16 * nindex)
+        store = f.read(hsize)
+        if align:
+            f.read((8 - (hsize % 8)) % 8)
+        tags = {}
+        for i in range(nindex):
+            tag, typ, offset, count = struct.unpack(">iiii", index[i * 16:(i + 1) * 16])
+            tags[tag] = (typ, offset, count, store)
+        return tags
+
+    @staticmethod
+    def header_string(tags, tag, default=None):
+        if tag not in tags:
+            return default
+        typ, offset, count, store = tags[tag]
+        return store[offset:store.index("\0", offset)]
+
+    def open_payload(self, f):
+        """
+        Skip the lead and both headers of the open rpm file and return a readable object that
+        yields the decompressed cpio archive.
+        """
+        if len(f.read(self.LEAD_SIZE)) != self.LEAD_SIZE:
+            raise ValueError("file too short to be an rpm")
+        # The signature header is padded to 8 bytes, the main header is not.
+        self.read_header(f, True)
+        tags = self.read_header(f, False)
+        compressor = self.header_string(tags, self.PAYLOADCOMPRESSOR, "gzip")
+        if compressor == "gzip":
+            return Decompressed(f, zlib.decompressobj(16 + zlib.MAX_WBITS))
+        if compressor == "bzip2":
+            return Decompressed(f, bz2.BZ2Decompressor())
+        if compressor in ["xz", "lzma"] and lzma is not None:
+            return Decompressed(f, lzma.LZMADecompressor())
+        if compressor in ["xz", "lzma", "zstd"]:
+            # No decompressor in this python.  Hand the rest of the file to the command line tool,
+            # which still reads it sequentially and streams the archive back to us.
+            # Python buffers ahead, so put the descriptor itself at the start of the payload.
+            os.lseek(f.fileno(), f.tell(), os.SEEK_SET)
+            tool = "zstd" if compressor == "zstd" else "xz"
+            self.proc = subprocess.Popen([tool, "-dc"], stdin=f, stdout=subprocess.PIPE)
+            return self.proc.stdout
+        raise ValueError("unsupported payload compressor: {0}".format(compressor))
+
+    @staticmethod
+    def read_exact(stream, size, out=None, progress=None):
+        """
+        Read size bytes of the stream, writing them to out if given, otherwise dropping them.
+        """
+        done = 0
+        while done < size:
+            chunk = stream.read(min(RpmPayload.CHUNK, size - done))
+            if not chunk:
+                raise ValueError("unexpected end of cpio archive")
+            done += len(chunk)
+            if out:
+                out.write(chunk)
+            if progress:
+                progress(done, size)
+        return done
+
+    @staticmethod
+    def print_progress(name):
+        state = {"last": -1}
+
+        def report(done, total):
+            pct = 100 * done / total if total else 100
+            if pct / 10 != state["last"]:
+                state["last"] = pct / 10
+                print "extracting {0}: {1}%".format(name, pct)
+        return report
+
+    def extract(self, match, dest, progress=None):
+        """
+        Extract the first cpio member whose name ends with match into dest.
+        :param match: squashfs.img
+        :param dest: /kubam/rhvh4.1/squashfs.img
+        :param progress: function called with (bytes written, member size), prints by default.
+        :return: error code and message
+        """
+        self.proc = None
+        try:
+            with open(self.rpm_file, "rb") as f:
+                stream = self.open_payload(f)
+                while True:
+                    header = stream.read(110)
+                    if len(header) != 110 or header[:6] not in self.CPIO_MAGIC:
+                        return 1, "{0}: bad cpio header in payload".format(self.rpm_file)
+                    size = int(header[54:62], 16)
+                    name_size = int(header[94:102], 16)
+                    name = stream.read(name_size)[:-1]
+                    stream.read((4 - (110 + name_size) % 4) % 4)
+                    if name == self.CPIO_TRAILER:
+                        return 1, "{0} not found in {1}".format(match, self.rpm_file)
+                    if name.endswith(match):
+                        if progress is None:
+                            progress = self.print_progress(os.path.basename(name))
+                        with open(dest + ".part", "wb") as out:
+                            self.read_exact(stream, size, out, progress)
+                        os.rename(dest + ".part", dest)
+                        return 0, None
+                    self.read_exact(stream, size)
+                    stream.read((4 - size % 4) % 4)
+        except (IOError, OSError) as err:
+            return 1, "{0}: {1}".format(self.rpm_file, err)
+        except ValueError as err:
+            return 1, "{0}: {1}".format(self.rpm_file, err)
+        finally:
+            if self.proc:
+                self.proc.stdout.close()
+                self.proc.kill()
+                self.proc.wait()
+
+
+class Decompressed(object):
+    """
+    File-like wrapper that decompresses the underlying file as it is read.
+    """
+    def __init__(self, f, decompressor):
+        self.f = f
+        self.decompressor = decompressor
+        self.buf = ""
+
+    def read(self, n):
+        while len(self.buf) < n:
+            chunk = self.f.read(RpmPayload.CHUNK)
+            if not chunk:
+                break
+            self.buf += self.decompressor.decompress(chunk)
+        out = self.buf[:n]
+        self.buf = self.buf[n:]
+        return out
@@ -1,8 +1,8 @@
 import random
 import string
 import os
-from subprocess import call
 from config import Const
+from tracing import Tracer
 
 
 class VMware(object):
@@ -19,22 +19,22 @@ class VMware(object):
         if not os.path.isdir(src_dir):
             return 1, "source directory {0} not found.  Please extract ISO.".format(src_dir)
 
-        o = call(["mkdir", "-p", tmp_dir])
+        o = Tracer.call(["mkdir", "-p", tmp_dir])
         if not o == 0:
             return 1, "not able to run mkdir -p {0}".format(tmp_dir)
 
         # Create new stage directory
-        o = call(["cp", "-a", src_dir, tmp_dir])
+        o = Tracer.call(["cp", "-a", src_dir, tmp_dir])
         if not o == 0:
             return 1, "not able to copy files from {0} to {1}".format(src_dir, tmp_dir)
 
         # Change access privileges just in case. Not sure why this happens with ESXi.
-        o = call(["chmod", "-R", "0755", tmp_dir])
+        o = Tracer.call(["chmod", "-R", "0755", tmp_dir])
         if not o == 0:
             return 1, "not able to change access privileges to {0}".format(tmp_dir)
 
         # Copy over the BOOT.CAT file to add the kickstart directive.
-        o = call(["cp", Const.KUBAM_SHARE_DIR + "/stage1/" + node["os"] + "/BOOT.CFG", tmp_dir + "/BOOT.CFG"])
+        o = Tracer.call(["cp", Const.KUBAM_SHARE_DIR + "/stage1/" + node["os"] + "/BOOT.CFG", tmp_dir + "/BOOT.CFG"])
         if not o == 0:
             return 1, "not able to copy kickstart directive"
 
@@ -49,26 +49,23 @@ class VMware(object):
             return 1, "{0}".format(err.strerror)
 
         # Move this file to the real one
-        o = call(["mv", fw, fw_real])
+        o = Tracer.call(["mv", fw, fw_real])
         if not o == 0:
             return 1, "unable to run: mv {0} {1}".format(fw, fw_real)
 
-        # Zip it up
-        cwd = os.getcwd()
-        os.chdir("/kubam")
-        o = call([
+        # Zip it up.  Absolute paths and only our own temporary directory, other hosts may be
+        # building their images at the same time.
+        o = Tracer.call([
             "mkisofs", "-relaxed-filenames", "-J", "-R",
-            "-o", node['name'] + ".iso", "-b", "ISOLINUX.BIN",
+            "-o", Const.KUBAM_DIR + node['name'] + ".iso", "-b", "ISOLINUX.BIN",
             "-c", "boot.cat", "-no-emul-boot", "-boot-load-size",
             "4", "-boot-info-table", "-no-emul-boot", tmp_dir
         ])
         if not o == 0:
             return 1, "mkisofs failed to make new boot image. See server logs"
 
-        os.chdir(cwd)
-
         # Remove temporary directory
-        o = call(["rm", "-rf", Const.KUBAM_DIR + "/tmp"])
+        o = Tracer.call(["rm", "-rf", tmp_dir])
         if not o == 0:
-            return 1, "unable to rm -rf {0}".format(Const.KUBAM_DIR + "/tmp")
+            return 1, "unable to rm -rf {0}".format(tmp_dir)
         return 0, None
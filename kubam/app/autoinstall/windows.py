@@ -1,5 +1,5 @@
-from subprocess import call
 from config import Const
+from tracing import Tracer
 
 
 class Windows(object):
@@ -13,12 +13,12 @@ class Windows(object):
         new_image_dir = Const.KUBAM_DIR + node["name"]
 
         # Copy the file to the directory.
-        o = call(["cp", "-f", Const.WIN_IMG, new_image_name])
+        o = Tracer.call(["cp", "-f", Const.WIN_IMG, new_image_name])
         if not o == 0:
             return 1, "not able to copy {0} to {1}".format(Const.BASE_IMG, new_image_name)
 
         # Create mount point
-        o = call(["mkdir", "-p", new_image_dir])
+        o = Tracer.call(["mkdir", "-p", new_image_dir])
         if not o == 0:
             return 1, "not able to call 'mkdir -p {0}'".format(new_image_dir)
 
@@ -31,7 +31,7 @@ class Windows(object):
             return 1, "{0}".format(err.strerror)
 
         # Move this file to the fat filesystem
-        o = call(["mcopy", "-o", "-i", new_image_name, fw, "::autounattend.xml"])
+        o = Tracer.call(["mcopy", "-o", "-i", new_image_name, fw, "::autounattend.xml"])
         if not o == 0:
             return 1, "unable to run: mcopy -o -i {0} {1} ::autounattend.xml".format(new_image_name, fw)
 
@@ -45,12 +45,12 @@ class Windows(object):
             return 1, "{0}".format(err.strerror)
 
         # Move this file to ks.cfg
-        o = call(["mcopy", "-o", "-i", new_image_name, fw, "::network.txt"])
+        o = Tracer.call(["mcopy", "-o", "-i", new_image_name, fw, "::network.txt"])
         if not o == 0:
             return 1, "unable to run: mcopy -o -i  {0} {1} ::network.txt".format(new_image_name, fw)
 
         # Remove stage directory
-        o = call(["rm", "-rf", new_image_dir])
+        o = Tracer.call(["rm", "-rf", new_image_dir])
         if not o == 0:
             return 1, "unable to rm -rf {0}".format(new_image_dir)
         return 0, None
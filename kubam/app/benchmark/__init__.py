@@ -0,0 +1,5 @@
+from fleet import Fleet
+from scratch import Scratch
+from api import ApiBenchmark
+from images import ImageBenchmark
+from startup import StartupBenchmark
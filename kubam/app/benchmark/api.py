@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import math
+import time
+import resource
+import argparse
+import itertools
+import threading
+from collections import OrderedDict
+from app import app
+from config import Const
+from emulator import UCSMEmulator
+from fleet import Fleet
+from scratch import Scratch
+
+
+class ApiBenchmark(object):
+    """
+    Drive the KUBAM API with concurrent clients against a synthetic fleet.  The config lives in a
+    scratch directory, every server group is an emulated UCS domain and the image tools are
+    replaced by stubs, so the numbers show the cost of KUBAM itself: config parsing, SDK calls
+    and template rendering.
+    """
+    def __init__(self, scale="small", clients=8, requests=64, deploy_batch=8, latency=0.0):
+        self.scale = scale
+        self.clients = clients
+        self.requests = requests
+        self.deploy_batch = deploy_batch
+        self.latency = latency
+        self.emulators = []
+        self.config = None
+        self.scratch = Scratch(Fleet.OSES)
+
+    @staticmethod
+    def percentile(values, p):
+        """
+        Nearest rank percentile, p between 0 and 100.
+        """
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        k = int(math.ceil(p / 100.0 * len(ordered))) - 1
+        return ordered[max(0, min(k, len(ordered) - 1))]
+
+    @staticmethod
+    def rss_mb():
+        """
+        Resident memory of this process, the peak if /proc is not available.
+        """
+        try:
+            with open("/proc/self/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024.0
+        except IOError:
+            pass
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    def setup(self):
+        hosts, server_groups, network_groups = Fleet.SCALES[self.scale]
+        self.scratch.setup()
+        ports = []
+        for i in range(server_groups):
+            e = UCSMEmulator(blades=max(1, hosts / server_groups), fsm_seconds=0, latency=self.latency)
+            ports.append(e.start("127.0.0.1"))
+            self.emulators.append(e)
+        err, msg, self.config = Fleet.write(Const.KUBAM_CFG, self.scale, ports)
+        if err != 0:
+            raise IOError(msg)
+
+    def teardown(self):
+        for e in self.emulators:
+            e.stop()
+        self.emulators = []
+        self.scratch.teardown()
+
+    def endpoints(self):
+        """
+        :return: list of (name, method, function of the request number giving (path, json body))
+        """
+        sgs = [sg["name"] for sg in self.config["server_groups"]]
+        hosts = [h["name"] for h in self.config["hosts"]]
+        # concurrent requests build different hosts, the same image is never written twice at once.
+        batch = max(1, min(self.deploy_batch, len(hosts) / self.clients))
+
+        def per_group(path):
+            return lambda i: (Const.API_ROOT2 + "/servers/" + sgs[i % len(sgs)] + path, None)
+
+        def images(i):
+            start = i * batch % len(hosts)
+            return Const.API_ROOT2 + "/deploy/images", hosts[start:start + batch]
+
+        return [
+            ("GET /hosts", "GET", lambda i: (Const.API_ROOT2 + "/hosts", None)),
+            ("GET /networks", "GET", lambda i: (Const.API_ROOT2 + "/networks", None)),
+            ("GET /servers", "GET", lambda i: (Const.API_ROOT2 + "/servers", None)),
+            ("GET /servers/<sg>/servers", "GET", per_group("/servers")),
+            ("GET /servers/<sg>/status", "GET", per_group("/status")),
+            ("GET /servers/<sg>/fsm", "GET", per_group("/fsm")),
+            ("POST /deploy/images", "POST", images),
+        ]
+
+    def run_endpoint(self, method, request_for):
+        """
+        Send self.requests requests from self.clients threads, each with its own test client.
+        """
+        def send(client, i):
+            path, body = request_for(i)
+            if body is None:
+                return client.open(path, method=method).status_code
+            return client.open(path, method=method, data=json.dumps(body),
+                               content_type="application/json").status_code
+
+        # first request builds caches and boot ISOs, it is not counted.
+        send(app.test_client(), 0)
+        counter = itertools.count(1)
+        latencies = []
+        errors = []
+
+        def worker():
+            client = app.test_client()
+            while True:
+                i = next(counter)
+                if i > self.requests:
+                    return
+                start = time.time()
+                status = send(client, i)
+                latencies.append(time.time() - start)
+                if status >= 400:
+                    errors.append(status)
+
+        rss = self.rss_mb()
+        threads = [threading.Thread(target=worker) for _ in range(self.clients)]
+        start = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - start
+        return OrderedDict([
+            ("requests", len(latencies)),
+            ("errors", len(errors)),
+            ("rps", round(len(latencies) / elapsed, 2) if elapsed else 0.0),
+            ("p50_ms", round(self.percentile(latencies, 50) * 1000, 2)),
+            ("p95_ms", round(self.percentile(latencies, 95) * 1000, 2)),
+            ("p99_ms", round(self.percentile(latencies, 99) * 1000, 2)),
+            ("rss_mb", round(self.rss_mb(), 1)),
+            ("rss_growth_mb", round(self.rss_mb() - rss, 1)),
+        ])
+
+    def run(self):
+        """
+        :return: OrderedDict of endpoint name to its results.
+        """
+        self.setup()
+        try:
+            results = OrderedDict()
+            for name, method, request_for in self.endpoints():
+                results[name] = self.run_endpoint(method, request_for)
+            return results
+        finally:
+            self.teardown()
+
+    @staticmethod
+    def compare(results, baseline, tolerance=0.25):
+        """
+        Compare results of one scale with the baseline of that scale.
+        :return: list of regression messages, empty if there are none.
+        """
+        regressions = []
+        for name, r in results.items():
+            base = baseline.get(name)
+            if not base:
+                continue
+            if r["errors"] > base.get("errors", 0):
+                regressions.append("{0}: {1} errors, baseline {2}".format(name, r["errors"], base.get("errors", 0)))
+            for key in ["p50_ms", "p95_ms", "p99_ms", "rss_mb"]:
+                if key in base and r[key] > base[key] * (1 + tolerance):
+                    regressions.append("{0}: {1} {2} is more than {3:.0f}% over baseline {4}".format(
+                        name, key, r[key], tolerance * 100, base[key]))
+            if "rps" in base and r["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append("{0}: rps {1} is more than {2:.0f}% under baseline {3}".format(
+                    name, r["rps"], tolerance * 100, base["rps"]))
+        return regressions
+
+    @staticmethod
+    def report(scale, results):
+        columns = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "rss_mb", "rss_growth_mb"]
+        hosts, server_groups, network_groups = Fleet.SCALES[scale]
+        lines = ["{0}: {1} hosts, {2} server groups, {3} network groups".format(
+            scale, hosts, server_groups, network_groups)]
+        lines.append("{0:<28}".format("endpoint") + "".join("{0:>14}".format(c) for c in columns))
+        for name, r in results.items():
+            lines.append("{0:<28}".format(name) + "".join("{0:>14}".format(r[c]) for c in columns))
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the KUBAM API against synthetic fleets.")
+    parser.add_argument("--scale", action="append", choices=sorted(Fleet.SCALES.keys()),
+                        help="fleet size to run, can be repeated (default: small)")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=64, help="requests per endpoint")
+    parser.add_argument("--deploy-batch", type=int, default=8, help="hosts per image build request")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the emulated UCS adds per request")
+    parser.add_argument("--baseline", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fraction worse than baseline")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    missing = [s for s in args.scale or ["small"] if s not in baseline]
+    if missing and not args.save_baseline:
+        print "warning: no baseline for {0} in {1}, not checking for regressions (run with --save-baseline " \
+              "to store one)".format(", ".join(missing), args.baseline)
+        print
+
+    all_results = OrderedDict()
+    regressions = []
+    for scale in args.scale or ["small"]:
+        results = ApiBenchmark(scale, args.clients, args.requests, args.deploy_batch, args.latency).run()
+        all_results[scale] = results
+        print ApiBenchmark.report(scale, results)
+        print
+        if scale in baseline and not args.save_baseline:
+            regressions += ["{0} {1}".format(scale, r)
+                            for r in ApiBenchmark.compare(results, baseline[scale], args.tolerance)]
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(all_results, f, indent=2)
+    if args.save_baseline:
+        baseline.update(all_results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print "baseline saved to {0}".format(args.baseline)
+    if regressions:
+        print "Regressions against {0}:".format(args.baseline)
+        for r in regressions:
+            print "  " + r
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
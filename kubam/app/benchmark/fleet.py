@@ -0,0 +1,101 @@
+import os
+from cryptography.fernet import Fernet
+from db import YamlDB
+
+
+class Fleet(object):
+    """
+    Synthetic KUBAM configurations for benchmarking: hosts spread over server groups and
+    network groups with an ISO map, written out as a kubam.yaml like the UI would leave it.
+    """
+    # hosts, server groups, network groups
+    SCALES = {
+        "small": (16, 1, 2),
+        "medium": (256, 4, 8),
+        "large": (1024, 8, 16),
+    }
+    # kickstart based operating systems, their images can be built with stubbed tools.
+    OSES = ["centos7.4", "redhat7.5"]
+
+    @staticmethod
+    def network_groups(count):
+        return [{
+            "name": "net{0:02d}".format(i + 1),
+            "netmask": "255.255.0.0",
+            "gateway": "10.{0}.0.1".format(i + 1),
+            "nameserver": "8.8.8.8",
+            "ntpserver": "ntp.esl.cisco.com",
+            "vlan": str(100 + i)
+        } for i in range(count)]
+
+    @staticmethod
+    def server_groups(count, password, ports=None):
+        """
+        UCS Manager server groups with the blades of each one in the server pool.
+        :param password: encrypted password of the server groups.
+        :param ports: ports of the emulated UCS domains, one per server group.
+        """
+        groups = []
+        for i in range(count):
+            sg = {
+                "id": YamlDB.new_uuid(),
+                "name": "ucs{0:02d}".format(i + 1),
+                "type": "ucsm",
+                "credentials": {"user": "admin", "password": password, "ip": "127.0.0.1"}
+            }
+            if ports:
+                sg["credentials"]["port"] = ports[i]
+            groups.append(sg)
+        return groups
+
+    @staticmethod
+    def hosts(count, server_groups, network_groups, oses=None):
+        oses = oses or Fleet.OSES
+        hosts = []
+        per_group = max(1, count / len(server_groups))
+        for i in range(count):
+            sg = min(i / per_group, len(server_groups) - 1)
+            hosts.append({
+                "name": "kube{0:04d}".format(i + 1),
+                "ip": "10.{0}.{1}.{2}".format(i % len(network_groups) + 1, i / 250, i % 250 + 2),
+                "os": oses[i % len(oses)],
+                "role": "k8s master" if i == 0 else "generic",
+                "network_group": network_groups[i % len(network_groups)]["name"],
+                "server_group": server_groups[sg]["name"]
+            })
+        return hosts
+
+    @staticmethod
+    def config(hosts, server_groups=1, network_groups=1, password="", ports=None, iso_dir="/kubam", oses=None):
+        oses = oses or Fleet.OSES
+        sgs = Fleet.server_groups(server_groups, password, ports)
+        nets = Fleet.network_groups(network_groups)
+        host_list = Fleet.hosts(hosts, sgs, nets, oses)
+        for sg in sgs:
+            # select a blade for every host of the group, 8 blades to a chassis like the emulator.
+            count = len([h for h in host_list if h["server_group"] == sg["name"]])
+            sg["server_pool"] = {"blades": ["{0}/{1}".format(b / 8 + 1, b % 8 + 1) for b in range(count)]}
+        return {
+            "kubam_ip": "10.0.0.2",
+            "server_groups": sgs,
+            "network_groups": nets,
+            "hosts": host_list,
+            "iso_map": [{"os": o, "file": os.path.join(iso_dir, o + ".iso")} for o in oses]
+        }
+
+    @staticmethod
+    def write(file_name, scale, ports=None, password="password"):
+        """
+        Write a synthetic config of one of the SCALES to file_name, encrypting the server group
+        password with the key next to it.
+        :return: err, msg, config
+        """
+        hosts, server_groups, network_groups = Fleet.SCALES[scale]
+        db = YamlDB()
+        err, msg, key = db.get_decoder_key(file_name)
+        if err != 0:
+            return err, msg, None
+        config = Fleet.config(hosts, server_groups, network_groups, Fernet(key).encrypt(bytes(password)),
+                              ports, os.path.dirname(file_name))
+        err, msg = db.write_config(config, file_name)
+        return err, msg, config
@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from autoinstall import Builder, IsoMaker
+from config import Const
+from db import YamlDB
+from tracing import Tracer
+from fleet import Fleet
+from scratch import Scratch
+
+
+class ImageBenchmark(object):
+    """
+    Time the image build pipeline for a rack of hosts in a scratch directory: the boot ISOs with
+    IsoMaker.mkboot_isos, then the installation image of every host with Builder.make_images.
+    The spans the Tracer records for template rendering and every external command are summed
+    per stage, next to the bytes written and the peak disk use of each phase.
+    """
+    OSES = ["centos7.4", "esxi6.7", "win2016"]
+    SAMPLE_SECONDS = 0.05  # how often the disk use is sampled during a phase.
+    MIN_SECONDS = 0.05  # stages faster than this in the baseline are too noisy to compare.
+
+    def __init__(self, hosts=16, oses=None, tree_mb=16, stub_tools=True):
+        self.hosts = hosts
+        self.oses = oses or ImageBenchmark.OSES
+        self.scratch = Scratch(self.oses, stub_tools, tree_mb)
+
+    @staticmethod
+    def files(directory):
+        """
+        :return: dict of path to (size, mtime, allocated bytes, inode) of every file under directory.
+        """
+        found = {}
+        for root, dirs, files in os.walk(directory):
+            for f in files:
+                p = os.path.join(root, f)
+                try:
+                    st = os.lstat(p)
+                except OSError:
+                    # removed while a build is running.
+                    continue
+                found[p] = (st.st_size, st.st_mtime, st.st_blocks * 512, (st.st_dev, st.st_ino))
+        return found
+
+    @staticmethod
+    def disk_use(files):
+        """
+        Bytes allocated by the files, hard linked files counted once.
+        """
+        return sum(dict((f[3], f[2]) for f in files.values()).values())
+
+    @staticmethod
+    def stages(trace):
+        """
+        Sum the spans of a trace by name and nesting depth in the order they first ran.
+        """
+        stages = OrderedDict()
+        for s in sorted(trace["spans"], key=lambda x: x["offset"]):
+            stage = stages.setdefault((s["depth"], s["name"]), OrderedDict([
+                ("name", s["name"]), ("depth", s["depth"]), ("count", 0), ("seconds", 0.0), ("max_ms", 0.0)
+            ]))
+            stage["count"] += 1
+            stage["seconds"] += s["duration"]
+            stage["max_ms"] = max(stage["max_ms"], s["duration"] * 1000)
+        for stage in stages.values():
+            stage["mean_ms"] = round(stage["seconds"] * 1000 / stage["count"], 2)
+            stage["seconds"] = round(stage["seconds"], 4)
+            stage["max_ms"] = round(stage["max_ms"], 2)
+        return stages.values()
+
+    def run_phase(self, name, build):
+        """
+        Run build(), returning err, msg, while sampling the disk use of the kubam directory.
+        """
+        before = self.files(Const.KUBAM_DIR)
+        base = self.disk_use(before)
+        peak = [base]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(ImageBenchmark.SAMPLE_SECONDS):
+                peak[0] = max(peak[0], self.disk_use(self.files(Const.KUBAM_DIR)))
+
+        sampler = threading.Thread(target=sample)
+        sampler.daemon = True
+        sampler.start()
+        trace = Tracer.begin("benchmark " + name)
+        start = time.time()
+        try:
+            err, msg = build()
+        finally:
+            elapsed = time.time() - start
+            Tracer.end()
+            done.set()
+            sampler.join()
+        after = self.files(Const.KUBAM_DIR)
+        written = sum(f[0] for p, f in after.items() if before.get(p, (None, None))[:2] != f[:2])
+        return OrderedDict([
+            ("error", msg if err != 0 else None),
+            ("seconds", round(elapsed, 4)),
+            ("bytes_written", written),
+            ("peak_disk_bytes", max(peak[0], self.disk_use(after)) - base),
+            ("stages", self.stages(trace)),
+        ])
+
+    def run(self):
+        """
+        :return: OrderedDict of phase name to its results.
+        """
+        self.scratch.setup()
+        try:
+            config = Fleet.config(self.hosts, iso_dir=Const.KUBAM_DIR, oses=self.oses)
+            err, msg = YamlDB.write_config(config, Const.KUBAM_CFG)
+            if err != 0:
+                raise IOError(msg)
+            results = OrderedDict()
+            results["boot_isos"] = self.run_phase("boot_isos", lambda: IsoMaker.mkboot_isos(config["iso_map"]))
+            results["host_images"] = self.run_phase("host_images", lambda: Builder.make_images(config["hosts"]))
+            return results
+        finally:
+            self.scratch.teardown()
+
+    @staticmethod
+    def compare(results, baseline, tolerance=0.25):
+        """
+        :return: list of regression messages, empty if there are none.
+        """
+        regressions = []
+        for phase, r in results.items():
+            base = baseline.get(phase)
+            if not base:
+                continue
+            if r["error"] and not base.get("error"):
+                regressions.append("{0}: failed with {1}".format(phase, r["error"]))
+            checks = [(phase, key, r[key], base.get(key)) for key in ["seconds", "bytes_written", "peak_disk_bytes"]]
+            base_stages = dict(((b["depth"], b["name"]), b) for b in base.get("stages", []))
+            for stage in r["stages"]:
+                b = base_stages.get((stage["depth"], stage["name"]))
+                if b and b["seconds"] >= ImageBenchmark.MIN_SECONDS:
+                    name = "{0} {1}".format(phase, stage["name"])
+                    checks.append((name, "seconds", stage["seconds"], b["seconds"]))
+            for name, key, value, base_value in checks:
+                if base_value is not None and value > base_value * (1 + tolerance):
+                    regressions.append("{0}: {1} {2} is more than {3:.0f}% over baseline {4}".format(
+                        name, key, value, tolerance * 100, base_value))
+        return regressions
+
+    @staticmethod
+    def report(hosts, oses, results):
+        mb = 1024.0 * 1024
+        lines = ["{0} hosts of {1}".format(hosts, ", ".join(oses))]
+        for phase, r in results.items():
+            lines.append("")
+            lines.append("{0}: {1:.2f}s, {2:.1f} MB written, {3:.1f} MB peak disk{4}".format(
+                phase, r["seconds"], r["bytes_written"] / mb, r["peak_disk_bytes"] / mb,
+                ", error: " + r["error"] if r["error"] else ""))
+            lines.append("  {0:<34}{1:>8}{2:>12}{3:>12}{4:>12}".format("stage", "count", "seconds", "mean_ms",
+                                                                       "max_ms"))
+            for s in r["stages"]:
+                lines.append("  {0:<34}{1:>8}{2:>12}{3:>12}{4:>12}".format(
+                    "  " * s["depth"] + s["name"], s["count"], s["seconds"], s["mean_ms"], s["max_ms"]))
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the KUBAM image build pipeline.")
+    parser.add_argument("--hosts", type=int, default=16)
+    parser.add_argument("--os", action="append", choices=sorted(Const.OS_DICT.keys()),
+                        help="operating system of the hosts, can be repeated (default: {0})".format(
+                            " ".join(ImageBenchmark.OSES)))
+    parser.add_argument("--tree-mb", type=int, default=16, help="size of the synthetic extracted ISO trees")
+    parser.add_argument("--real-tools", action="store_true",
+                        help="run fuseext2, mkisofs, mcopy, ... instead of stubs, needs them and FUSE")
+    parser.add_argument("--baseline", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           "images_baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fraction worse than baseline")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    oses = args.os or ImageBenchmark.OSES
+    results = ImageBenchmark(args.hosts, oses, args.tree_mb, not args.real_tools).run()
+    print ImageBenchmark.report(args.hosts, oses, results)
+    print
+
+    # results are only comparable for the same hosts, operating systems and tools.
+    key = "{0} hosts {1}{2}".format(args.hosts, ",".join(oses), " real tools" if args.real_tools else "")
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    regressions = []
+    if key not in baseline and not args.save_baseline:
+        print "warning: no baseline for {0} in {1}, not checking for regressions (run with --save-baseline " \
+              "to store one)".format(key, args.baseline)
+    if key in baseline and not args.save_baseline:
+        regressions = ImageBenchmark.compare(results, baseline[key], args.tolerance)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        baseline[key] = results
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print "baseline saved to {0}".format(args.baseline)
+    failed = [p for p, r in results.items() if r["error"]]
+    if regressions:
+        print "Regressions against {0}:".format(args.baseline)
+        for r in regressions:
+            print "  " + r
+    if regressions or failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+from config import Const
+
+
+class Scratch(object):
+    """
+    Throw away KUBAM directory for benchmarks.  Const paths point into it while it is set up, the
+    stage1 base images and configs of the source tree are used as fixtures when they are present,
+    every OS gets a synthetic extracted tree and ISO, and the image tools can be replaced by stubs.
+    """
+    # Const values pointed at the scratch directory.
+    PATCHED = ["KUBAM_CFG", "KUBAM_DIR", "KUBAM_SHARE_DIR", "BASE_IMG", "WIN_IMG", "TEMPLATE_DIR"]
+    TOOLS = ["fuseext2", "umount", "mkisofs", "osirrox", "implantisomd5", "mcopy"]
+    # Stand-in for the image tools: create the -o output file, if any, and succeed.  Only absolute
+    # paths are outputs, fuseext2 -o and mcopy -o are options.
+    STUB = "#!/bin/sh\nwhile [ $# -gt 0 ]; do\n  if [ \"$1\" = \"-o\" ]; then case \"$2\" in /*) : > \"$2\";; esac; fi\n" \
+           "  shift\ndone\n"
+    SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    TEMPLATE_DIR = os.path.join(SOURCE_DIR, "templates") + "/"
+    STAGE1_DIR = os.path.join(SOURCE_DIR, "files", "stage1") + "/"
+
+    def __init__(self, oses, stub_tools=True, tree_mb=0):
+        """
+        :param oses: operating systems to create an extracted tree and ISO for.
+        :param tree_mb: size of the big file of every extracted tree, the squashfs image of
+        CentOS/RHEL or the modules of ESXi.
+        """
+        self.oses = oses
+        self.stub_tools = stub_tools
+        self.tree_mb = tree_mb
+        self.work = None
+        self.saved = {}
+
+    @staticmethod
+    def touch(file_name, content="", size=0):
+        if not os.path.isdir(os.path.dirname(file_name)):
+            os.makedirs(os.path.dirname(file_name))
+        with open(file_name, "w") as f:
+            f.write(content)
+            for _ in range(size / 65536):
+                f.write("\0" * 65536)
+
+    def fixture(self, name, target, content="", size=0):
+        """
+        Copy a stage1 file of the source tree to target, or write content and size zeros instead.
+        """
+        if os.path.isfile(Scratch.STAGE1_DIR + name):
+            if not os.path.isdir(os.path.dirname(target)):
+                os.makedirs(os.path.dirname(target))
+            shutil.copy(Scratch.STAGE1_DIR + name, target)
+        else:
+            self.touch(target, content, size)
+
+    def tree(self, o):
+        """
+        Extracted ISO tree with the files the image builders read.
+        """
+        os_dir = Const.KUBAM_DIR + Const.OS_DICT[o]["dir"] + "/"
+        big = self.tree_mb * 1024 * 1024
+        self.touch(os_dir + Const.OS_DICT[o]["key_file"], Const.OS_DICT[o]["key_string"] + "\n")
+        if o.startswith("esxi"):
+            self.touch(os_dir + "ISOLINUX.BIN", size=24576)
+            self.touch(os_dir + "BOOT.CFG", "kernel=/tboot.b00\n")
+            self.touch(os_dir + "S.V00", size=big)
+            self.fixture(o + "/BOOT.CFG", Const.KUBAM_SHARE_DIR + "stage1/" + o + "/BOOT.CFG",
+                         "kernelopt=ks=cdrom:/KS.CFG\n")
+        elif not o.startswith("win"):
+            self.touch(os_dir + "isolinux/isolinux.bin", size=24576)
+            self.touch(os_dir + "isolinux/vmlinuz", size=65536)
+            self.touch(os_dir + "LiveOS/squashfs.img", size=big)
+            self.touch(os_dir + "images/pxeboot/vmlinuz", size=65536)
+            self.fixture(o + "/isolinux.cfg", Const.KUBAM_SHARE_DIR + "stage1/" + o + "/isolinux.cfg",
+                         "default vesamenu.c32\n")
+        else:
+            self.touch(Const.KUBAM_DIR + "WinPE_KUBAM.iso", size=65536)
+        self.touch(Const.KUBAM_DIR + o + ".iso")
+
+    def setup(self):
+        self.work = tempfile.mkdtemp(prefix="kubam-bench-")
+        self.saved = dict((k, getattr(Const, k)) for k in Scratch.PATCHED)
+        self.cwd = os.getcwd()
+        self.path = os.environ.get("PATH", "")
+
+        share_dir = os.path.join(self.work, "share") + "/"
+        Const.KUBAM_DIR = os.path.join(self.work, "kubam") + "/"
+        Const.KUBAM_CFG = Const.KUBAM_DIR + "kubam.yaml"
+        Const.KUBAM_SHARE_DIR = share_dir
+        Const.BASE_IMG = share_dir + "stage1/ks.img"
+        Const.WIN_IMG = share_dir + "stage1/win.img"
+        if os.path.isdir(Scratch.TEMPLATE_DIR):
+            Const.TEMPLATE_DIR = Scratch.TEMPLATE_DIR
+
+        self.fixture("ks.img", Const.BASE_IMG, size=1024 * 1024)
+        self.fixture("win.img", Const.WIN_IMG, size=1024 * 1024)
+        self.touch(share_dir + "ansible/site.yml", "---\n")
+        for o in self.oses:
+            self.tree(o)
+        if self.stub_tools:
+            bin_dir = os.path.join(self.work, "bin")
+            for tool in Scratch.TOOLS:
+                self.touch(os.path.join(bin_dir, tool), Scratch.STUB)
+                os.chmod(os.path.join(bin_dir, tool), 0755)
+            os.environ["PATH"] = bin_dir + os.pathsep + self.path
+
+    def teardown(self):
+        for k, v in self.saved.items():
+            setattr(Const, k, v)
+        os.environ["PATH"] = self.path
+        # in case an image tool changed the working directory.
+        os.chdir(self.cwd)
+        shutil.rmtree(self.work, ignore_errors=True)
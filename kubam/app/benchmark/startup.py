@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from collections import OrderedDict
+from api import ApiBenchmark
+
+
+class StartupBenchmark(object):
+    """
+    Time importing the API server in fresh interpreters, the way a restarted container comes up,
+    and optionally the first use of a platform layer after it.  Reports the import time, the
+    resident memory and which SDKs ended up loaded.
+    """
+    SDKS = ["ucsmsdk", "ucscsdk", "imcsdk", "cryptography", "sshpubkeys"]
+    PLATFORMS = OrderedDict([("ucsm", ("ucs", "UCSUtil")), ("ucsc", ("ucsc", "UCSCUtil")), ("imc", ("imc", "IMCUtil"))])
+    APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # Runs in the child: import the app, load the platform layers given as arguments and print
+    # the measurements as JSON.
+    PROBE = "\n".join([
+        "import sys, time, json",
+        "start = time.time()",
+        "import app",
+        "startup = time.time() - start",
+        "for pkg, cls in json.loads(sys.argv[1]):",
+        "    getattr(__import__(pkg), cls).load()",
+        "rss = [int(l.split()[1]) / 1024.0 for l in open('/proc/self/status') if l.startswith('VmRSS:')]",
+        "print json.dumps({'startup': startup, 'seconds': time.time() - start, 'rss_mb': rss[0],",
+        "                  'modules': len(sys.modules), 'sdks': [m for m in sys.argv[2:] if m in sys.modules]})",
+    ])
+
+    def __init__(self, runs=5, platforms=None):
+        self.runs = runs
+        self.platforms = platforms or []
+
+    def probe(self, platforms):
+        layers = json.dumps([StartupBenchmark.PLATFORMS[p] for p in platforms])
+        with open(os.devnull, "w") as devnull:
+            out = subprocess.check_output([sys.executable, "-W", "ignore", "-c", StartupBenchmark.PROBE, layers] +
+                                          StartupBenchmark.SDKS, cwd=StartupBenchmark.APP_DIR, stderr=devnull)
+        return json.loads(out.strip().split("\n")[-1])
+
+    def run(self):
+        """
+        :return: OrderedDict of "startup" and "startup + <platform>" to their results.
+        """
+        results = OrderedDict()
+        for platforms in [[]] + [[p] for p in self.platforms]:
+            probes = [self.probe(platforms) for _ in range(self.runs)]
+            seconds = [p["seconds"] for p in probes]
+            results[" + ".join(["startup"] + platforms)] = OrderedDict([
+                ("runs", self.runs),
+                ("p50_ms", round(ApiBenchmark.percentile(seconds, 50) * 1000, 1)),
+                ("max_ms", round(max(seconds) * 1000, 1)),
+                ("rss_mb", round(ApiBenchmark.percentile([p["rss_mb"] for p in probes], 50), 1)),
+                ("modules", probes[-1]["modules"]),
+                ("sdks", probes[-1]["sdks"]),
+            ])
+        return results
+
+    @staticmethod
+    def report(results):
+        lines = ["{0:<24}{1:>10}{2:>10}{3:>10}{4:>10}  {5}".format("", "p50_ms", "max_ms", "rss_mb", "modules",
+                                                                   "sdks")]
+        for name, r in results.items():
+            lines.append("{0:<24}{1:>10}{2:>10}{3:>10}{4:>10}  {5}".format(
+                name, r["p50_ms"], r["max_ms"], r["rss_mb"], r["modules"], ", ".join(r["sdks"]) or "-"))
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the start up time and memory of the KUBAM API server.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--platform", action="append", choices=StartupBenchmark.PLATFORMS.keys(),
+                        help="also measure the first use of this platform, can be repeated")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+    results = StartupBenchmark(args.runs, args.platform).run()
+    print StartupBenchmark.report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
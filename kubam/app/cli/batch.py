@@ -0,0 +1,349 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from collections import OrderedDict
+from contextlib import contextmanager
+from autoinstall import Builder, IsoMaker
+from config import Const
+from db import YamlDB
+from deploy.pipeline import Pipeline
+from helper import KubamError
+from ucs import UCSUtil, UCSServer
+from ucsc import UCSCUtil, UCSCServer
+
+
+def quiet_worker():
+    """
+    Pool initializer: what the modules, the SDKs and the tools they run print goes to standard
+    error in the workers, standard output is kept for the JSON results.
+    """
+    sys.stdout.flush()
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+
+@contextmanager
+def stdout_to_stderr():
+    """
+    The same for what runs in this process, until the block ends.
+    """
+    sys.stdout.flush()
+    saved_fd, saved = os.dup(1), sys.stdout
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    try:
+        yield
+    finally:
+        sys.stderr.flush()
+        os.dup2(saved_fd, 1)
+        os.close(saved_fd)
+        sys.stdout = saved
+
+
+def run_task(task):
+    """
+    Run one task of a batch in a worker process.
+    :param task: (kind, name, arguments of the Batch method of the kind)
+    :return: the result record of the task
+    """
+    kind, name, args = task
+    start = time.time()
+    try:
+        err, msg, detail = getattr(Batch, "task_" + kind)(*args)
+    except Exception as e:
+        err, msg, detail = 1, e.msg if isinstance(e, KubamError) else str(e), None
+    result = OrderedDict([("task", kind), ("name", name), ("status", "failed" if err else "done"),
+                          ("error", msg if err else None), ("seconds", round(time.time() - start, 3))])
+    if detail:
+        result.update(detail)
+    return result
+
+
+class Batch(object):
+    """
+    Bulk operations on the hosts and server groups of a kubam.yaml from the command line, through
+    the same modules as the API but without its HTTP server.  Each operating system, host image and
+    server group is worked on in a worker process of its own, Const.BATCH_WORKERS at a time, with a
+    line of progress as each one finishes and a JSON record of every task at the end.
+    """
+    COMMANDS = ["images", "vmedia", "deploy", "power"]
+    POWER_ACTIONS = ["on", "off", "hardreset", "softreset"]
+    # the util, login and logout and server classes of each platform, looked up when used so the
+    # SDKs load on use.
+    PLATFORMS = {
+        "ucsm": (UCSUtil, "ucs_login", "ucs_logout", UCSServer),
+        "ucsc": (UCSCUtil, "ucsc_login", "ucsc_logout", UCSCServer),
+    }
+
+    def __init__(self, workers=Const.BATCH_WORKERS, progress=sys.stderr):
+        self.workers = workers
+        self.progress = progress
+        self.results = []
+
+    def load(self, host_names=None, sg_names=None, strict=False):
+        """
+        :param strict: the config has to have all it takes to build images.
+        :return: (config, the hosts asked for, in the server groups asked for)
+        """
+        db = YamlDB()
+        err, msg, config = db.open_config(Const.KUBAM_CFG)
+        if err == 0 and strict:
+            err, msg, config = db.validate_config(config or {}, True)
+        if err != 0:
+            raise KubamError(msg)
+        config = config or {}
+        hosts = config.get("hosts") or []
+        known = set(h["name"] for h in hosts)
+        for name in host_names or []:
+            if name not in known:
+                raise KubamError("{0} is not a valid host".format(name))
+        known = set(sg["name"] for sg in config.get("server_groups") or [])
+        for name in sg_names or []:
+            if name not in known:
+                raise KubamError("server group {0} does not exist".format(name))
+        if host_names:
+            hosts = [h for h in hosts if h["name"] in host_names]
+        if sg_names:
+            hosts = [h for h in hosts if h.get("server_group") in sg_names]
+        return config, hosts
+
+    @staticmethod
+    def isos(config, hosts):
+        """
+        :return: the iso map entries of the operating systems of the hosts.
+        """
+        iso_map = dict((i["os"], i) for i in config.get("iso_map") or [])
+        for o in sorted(set(h["os"] for h in hosts)):
+            if o not in iso_map:
+                raise KubamError("Please map {0} to an iso image".format(o))
+        return [iso_map[o] for o in sorted(set(h["os"] for h in hosts))]
+
+    @staticmethod
+    def server_groups(config, hosts, sg_names=None):
+        """
+        :return: server group name -> server group, of the UCS server groups of the hosts, or of
+        those asked for.
+        """
+        names = set(sg_names or []) | set(h.get("server_group") for h in hosts)
+        return OrderedDict((sg["name"], sg) for sg in config.get("server_groups") or []
+                           if sg["name"] in names and sg.get("type") in Batch.PLATFORMS)
+
+    def run(self, tasks):
+        """
+        Run the tasks in worker processes, reporting each one as it finishes.
+        :return: the results of the tasks, in the order they finished.
+        """
+        if not tasks:
+            return []
+        results = []
+        pool = multiprocessing.Pool(min(self.workers, len(tasks)), quiet_worker)
+        try:
+            for result in pool.imap_unordered(run_task, tasks):
+                results.append(result)
+                self.report(result, len(results), len(tasks))
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        self.results.extend(results)
+        return results
+
+    def report(self, result, done, total):
+        if self.progress is None:
+            return
+        width = len(str(total))
+        self.progress.write("[{0:>{w}}/{1}] {2} {3}: {4} {5:.1f}s{6}\n".format(
+            done, total, result["task"], result["name"], result["status"], result["seconds"],
+            ": " + result["error"] if result["error"] else "", w=width))
+        self.progress.flush()
+
+    def block(self, kind, name, reason):
+        result = OrderedDict([("task", kind), ("name", name), ("status", "blocked"), ("error", reason),
+                              ("seconds", 0.0)])
+        self.results.append(result)
+        return result
+
+    # The tasks, each run in a worker process.  They return (err, msg, details for the result).
+    @staticmethod
+    def task_boot(iso):
+        err, msg = IsoMaker.extract_isos([iso])
+        if err == 0:
+            err, msg = IsoMaker.mkboot(iso["os"])
+        return err, msg, None
+
+    @staticmethod
+    def task_image(host, config):
+        err, msg = Builder.make_image(host, config)
+        return err, msg, None
+
+    @staticmethod
+    def ucs_call(sg, fn):
+        """
+        Call fn(handle, server class) with a login to the server group.
+        """
+        util, login, logout, server = Batch.PLATFORMS[sg["type"]]
+        handle = getattr(util, login)(sg)
+        try:
+            return fn(handle, server)
+        finally:
+            getattr(util, logout)(handle)
+
+    @staticmethod
+    def task_vmedia(sg, oses, kubam_ip):
+        err, msg = Batch.ucs_call(sg, lambda handle, server: server.make_vmedias(
+            handle, sg.get("org", "org-root"), kubam_ip, oses))
+        return err, msg, {"oses": oses}
+
+    @staticmethod
+    def task_power(sg, hosts, action):
+        def power(handle, server):
+            out = OrderedDict()
+            for h in hosts:
+                try:
+                    server.power_server(handle, Pipeline.power_target(sg, h), action)
+                    out[h["name"]] = "done"
+                except KubamError as e:
+                    out[h["name"]] = e.msg
+            return out
+        out = Batch.ucs_call(sg, power)
+        failed = [name for name, status in out.items() if status != "done"]
+        msg = "{0} of {1} servers failed".format(len(failed), len(out)) if failed else None
+        return len(failed), msg, {"hosts": out}
+
+    @staticmethod
+    def task_deploy(hosts, isos, server_groups, kubam_ip, config):
+        pipeline = Pipeline(hosts, isos, server_groups, kubam_ip, config)
+        pipeline.run()
+        progress = pipeline.progress()
+        failed = [h for h in progress["hosts"] if h["status"] != "done"]
+        msg = "{0} of {1} hosts failed".format(len(failed), len(progress["hosts"])) if failed else None
+        return len(failed), msg, {"hosts": progress["hosts"]}
+
+    # The commands.
+    def boot_images(self, isos):
+        """
+        Extract every operating system and make its boot ISO, each in a worker.
+        :return: the operating systems that failed
+        """
+        results = self.run([("boot", iso["os"], (iso,)) for iso in isos])
+        return set(r["name"] for r in results if r["status"] != "done")
+
+    def images(self, host_names=None, sg_names=None):
+        config, hosts = self.load(host_names, sg_names, True)
+        failed = self.boot_images(Batch.isos(config, hosts))
+        with stdout_to_stderr():
+            err, msg = Builder.make_post()
+        tasks = []
+        for h in hosts:
+            if err != 0:
+                self.block("image", h["name"], msg)
+            elif h["os"] in failed:
+                self.block("image", h["name"], "boot {0} failed".format(h["os"]))
+            else:
+                tasks.append(("image", h["name"], (h, config)))
+        self.run(tasks)
+
+    def vmedia(self, host_names=None, sg_names=None):
+        config, hosts = self.load(host_names, sg_names)
+        # without hosts, the vMedia policies of every mapped operating system.
+        all_oses = sorted(set(i["os"] for i in config.get("iso_map") or []))
+        tasks = []
+        for name, sg in Batch.server_groups(config, hosts, sg_names).items():
+            oses = sorted(set(h["os"] for h in hosts if h.get("server_group") == name)) or all_oses
+            tasks.append(("vmedia", name, (sg, oses, config.get("kubam_ip"))))
+        self.run(tasks)
+
+    def deploy(self, host_names=None, sg_names=None):
+        """
+        Deploy the hosts of each server group with a deploy pipeline in a worker of its own, once
+        the operating systems they share have their boot ISOs.
+        """
+        config, hosts = self.load(host_names, sg_names, True)
+        if not hosts:
+            raise KubamError("No hosts defined")
+        isos = Batch.isos(config, hosts)
+        failed = self.boot_images(isos)
+        # made once here rather than by every pipeline at the same time.
+        with stdout_to_stderr():
+            err, msg = Builder.make_post()
+        if err != 0:
+            raise KubamError(msg)
+        server_groups = Batch.server_groups(config, hosts)
+        groups = OrderedDict()
+        for h in hosts:
+            if h["os"] in failed:
+                self.block("deploy", h["name"], "boot {0} failed".format(h["os"]))
+                continue
+            name = h.get("server_group") if h.get("server_group") in server_groups else None
+            groups.setdefault(name, []).append(h)
+        tasks = []
+        for name, group in groups.items():
+            sgs = {name: server_groups[name]} if name else {}
+            tasks.append(("deploy", name or "no server group", (group, isos, sgs, config.get("kubam_ip"), config)))
+        self.run(tasks)
+
+    def power(self, action, host_names=None, sg_names=None):
+        if action not in Batch.POWER_ACTIONS:
+            raise KubamError("power method {0} is not supported. Use: {1}".format(
+                action, ", ".join(Batch.POWER_ACTIONS)))
+        config, hosts = self.load(host_names, sg_names)
+        tasks = []
+        for name, sg in Batch.server_groups(config, hosts).items():
+            group = [h for h in hosts if h.get("server_group") == name and "server" in h]
+            if group:
+                tasks.append(("power", name, (sg, group, action)))
+        self.run(tasks)
+
+    def summary(self, command, seconds):
+        counts = OrderedDict()
+        for r in self.results:
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+        status = "done" if set(counts) <= set(["done"]) else "failed"
+        return OrderedDict([("command", command), ("status", status), ("seconds", round(seconds, 3)),
+                            ("tasks", counts), ("results", self.results)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run KUBAM operations on many hosts and server groups at once, "
+                                                 "without the API server.")
+    parser.add_argument("command", choices=Batch.COMMANDS)
+    parser.add_argument("action", nargs="?", choices=Batch.POWER_ACTIONS, help="what power does to the servers")
+    parser.add_argument("--config", default=Const.KUBAM_CFG, help="the kubam.yaml to work on")
+    parser.add_argument("--host", action="append", help="only this host, can be repeated (default: all)")
+    parser.add_argument("--server-group", action="append",
+                        help="only the hosts of this server group, can be repeated (default: all)")
+    parser.add_argument("--workers", type=int, default=Const.BATCH_WORKERS, help="worker processes")
+    parser.add_argument("--output", help="write the results as JSON to this file instead of standard output")
+    parser.add_argument("--quiet", action="store_true", help="don't show the progress")
+    args = parser.parse_args(argv)
+    if args.command == "power" and not args.action:
+        parser.error("power needs an action: " + ", ".join(Batch.POWER_ACTIONS))
+
+    Const.KUBAM_CFG = args.config
+    batch = Batch(args.workers, None if args.quiet else sys.stderr)
+    start = time.time()
+    try:
+        if args.command == "power":
+            batch.power(args.action, args.host, args.server_group)
+        else:
+            getattr(batch, args.command)(args.host, args.server_group)
+    except KubamError as e:
+        sys.stderr.write("error: {0}\n".format(e.msg))
+        return 2
+    summary = batch.summary(args.command, time.time() - start)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    else:
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0 if summary["status"] == "done" else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,15 +1,47 @@
+import os
+
+
 # Class with constant variables
 class Const(object):
     KUBAM_CFG = "/kubam/kubam.yaml"
     API_ROOT = "/api/v1"
     API_ROOT2 = "/api/v2"
     KUBAM_DIR = "/kubam/"
+    ISO_CATALOG = KUBAM_DIR + ".iso_catalog.yaml"  # cached size, hash and detected OS of each ISO.
     KUBAM_SHARE_DIR = "/usr/share/kubam/"
     BASE_IMG = KUBAM_SHARE_DIR + "/stage1/ks.img"  # ext2 formatted base image. 
     WIN_IMG = KUBAM_SHARE_DIR + "/stage1/win.img"  # windows requires fat32 formatted
     TEMPLATE_DIR = KUBAM_SHARE_DIR + "/templates/"
+    TRACE_KEEP = 200  # number of finished request traces kept for the traces API.
+    TRACE_SLOW_SECONDS = float(os.environ.get("KUBAM_TRACE_SLOW_SECONDS", "1.0"))  # log spans slower than this.
+    BOOT_ISO_WORKERS = 4  # boot ISOs of different operating systems built at the same time.
+    WATCH_SECONDS = float(os.environ.get("KUBAM_WATCH_SECONDS", "5"))  # between polls of a watched server group.
+    INVENTORY_SECONDS = float(os.environ.get("KUBAM_INVENTORY_SECONDS", "300"))  # age a saved inventory is refreshed at.
+    WATCH_KEEPALIVE = 15  # seconds between keepalive comments on an idle event stream.
+    SERVER_QUERY_MAX_DNS = 64  # asking for more servers than this fetches them all and filters instead.
+    DEPLOY_WORKERS = {  # tasks of each deploy pipeline stage run at the same time.
+        "extract": 2, "boot_iso": 4, "image": 4, "vmedia": 2, "profile": 4, "associate": 4, "power": 4
+    }
+    DEPLOY_SESSIONS = 4  # UCS logins a deployment opens per server group.
+    BATCH_WORKERS = 8  # worker processes of the batch command line, each works on one OS, host or server group.
+    DEPLOY_KEEP = 20  # finished deployments kept for the deploy API.
+    DOMAIN_CACHE_SECONDS = {  # how long facts about a UCS domain are cached.
+        "firmware": 3600, "orgs": 600, "templates": 300, "vlans": 300
+    }
+    QUERY_CACHE_SECONDS = {  # how long query results about objects of a class are cached.
+        "computeblade": 3, "computerackunit": 3, "lsserver": 10, "storagecontroller": 30, "storagelocaldisk": 30
+    }
+    QUERY_CACHE_BYTES = 32 * 1024 * 1024  # results beyond this, least recently used first, are dropped.
+    DOMAIN_MAX_CALLS = 8  # logins, queries and commits in flight against one domain.
+    DOMAIN_RETRIES = 2  # times a login or query that failed on the network is tried again.
+    DOMAIN_BACKOFF = 0.2  # seconds before the first retry, doubled for every next one.
+    BREAKER_FAILURES = 3  # failures in a row after which a domain is not tried for a while.
+    BREAKER_SECONDS = 30  # how long requests to such a domain fail at once.
+    XML_API_TIMEOUT = 30  # seconds an XML API request of the XML engine may take.
+    XML_ENGINE_CONNECTIONS = 256  # requests an XML engine has open at once, over all domains.
     HTTP_OK = 200
     HTTP_CREATED = 201
+    HTTP_ACCEPTED = 202
     HTTP_NO_CONTENT = 204
     HTTP_BAD_REQUEST = 400
     HTTP_UNAUTHORIZED = 401
@@ -1 +1,2 @@
 from yaml_db import YamlDB
+from cache import config_cached
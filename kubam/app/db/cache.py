@@ -0,0 +1,45 @@
+import threading
+from functools import wraps
+from flask import Response, make_response, request
+from config import Const
+from yaml_db import YamlDB
+
+# Serialized GET responses by (config file, path and query string), each with the config
+# version it was made from.  Dropped when it gets this big.
+MAX_CACHED_RESPONSES = 256
+_responses = {}
+_lock = threading.Lock()
+
+
+def config_cached(fn):
+    """
+    For handlers whose GET response only depends on kubam.yaml.  GET responses get an ETag of the
+    config version and a Last-Modified of the config file.  A matching If-None-Match gets a 304
+    and the body of the last 200 is served again until the config changes.  Other methods are
+    passed through untouched.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if request.method != "GET":
+            return fn(*args, **kwargs)
+        version, mtime = YamlDB.config_version(Const.KUBAM_CFG)
+        if version is None:
+            return fn(*args, **kwargs)
+        key = (Const.KUBAM_CFG, request.full_path)
+        cached = _responses.get(key)
+        if request.if_none_match.contains(version):
+            response = Response(status=304)
+        elif cached is not None and cached[0] == version:
+            response = Response(cached[1], mimetype=cached[2])
+        else:
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code != Const.HTTP_OK:
+                return response
+            with _lock:
+                if len(_responses) >= MAX_CACHED_RESPONSES:
+                    _responses.clear()
+                _responses[key] = (version, response.get_data(), response.mimetype)
+        response.set_etag(version)
+        response.last_modified = mtime
+        return response
+    return wrapper
@@ -1,11 +1,13 @@
+import os
+import time
 import yaml
 import uuid
+import hashlib
 from socket import inet_aton, error as serror
 from os import path
-from sshpubkeys import SSHKey, InvalidKeyException
-from cryptography.fernet import Fernet
 from config import Const
 from helper import KubamError
+from metrics import Metrics
 
 
 class YamlDB(object):
@@ -15,6 +17,11 @@ class YamlDB(object):
     2.  Create a kickstart file based on a template.
     3.  Create an image from that kickstart file to be used to boot a UCS.
     """
+    # config file: ((inode, modification time, size), when it was hashed, digest) of the last
+    # config_version, so the file is only read again when it changed.
+    versions = {}
+    # seconds between the modification times the file system can tell apart.
+    MTIME_RESOLUTION = 1.0
 
     # Makes sure that the list of ISO images actually exists.
     @staticmethod
@@ -35,6 +42,7 @@ class YamlDB(object):
         msg = ""
         bad_keys = []
 
+        from sshpubkeys import SSHKey, InvalidKeyException
         for k in key_list:
             if not k:
                 return 1, "No Key was passed in."
@@ -148,7 +156,8 @@ class YamlDB(object):
         try:
             with open(out_file, "w") as f:
                 try:
-                    msg = yaml.safe_dump(config, f, encoding='utf-8', default_flow_style=False)
+                    with Metrics.timer("kubam_config_seconds", op="write"):
+                        msg = yaml.safe_dump(config, f, encoding='utf-8', default_flow_style=False)
                 except yaml.YAMLError as err:
                     msg = "Error writing {0} config file: {1}".format(out_file, err)
                     err = 1
@@ -158,6 +167,33 @@ class YamlDB(object):
 
         return err, msg
 
+    @staticmethod
+    def config_version(file_name):
+        """
+        A version of the config file that changes whenever it is written, through write_config or
+        by anything else.  It is a digest of what the file holds, so every process serving the
+        same file has the same version.  The digest is kept while the inode, modification time
+        and size stay the same, unless the file was modified so shortly before it was hashed that
+        a write within the file system's time resolution would leave them as they were.
+        :return: (version, modification time), (None, None) when there is no config file
+        """
+        try:
+            st = os.stat(file_name)
+        except OSError:
+            return None, None
+        key = (st.st_ino, st.st_mtime, st.st_size)
+        known = YamlDB.versions.get(file_name)
+        if known is not None and known[0] == key and known[1] - st.st_mtime > YamlDB.MTIME_RESOLUTION:
+            return known[2], st.st_mtime
+        hashed = time.time()
+        try:
+            with open(file_name, "rb") as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+        except IOError:
+            return None, None
+        YamlDB.versions[file_name] = (key, hashed, digest)
+        return digest, st.st_mtime
+
     # Get the config file and parse it out so we know what we have.
     @staticmethod
     def open_config(file_name):
@@ -166,7 +202,8 @@ class YamlDB(object):
         try:
             with open(file_name, "r") as stream:
                 try:
-                    config = yaml.load(stream)
+                    with Metrics.timer("kubam_config_seconds", op="parse"):
+                        config = yaml.load(stream)
                 except yaml.YAMLError as e:
                     msg = "Error parsing {0} config file: ".format(file_name)
                     msg += e
@@ -433,6 +470,7 @@ class YamlDB(object):
         err, msg, key = self.get_decoder_key(file_name)
         if err == 1:
             return err, msg
+        from cryptography.fernet import Fernet
         f = Fernet(key)
         gh['credentials']['password'] = f.encrypt(bytes(gh['credentials']['password']))
         # Nothing in here yet, first entry
@@ -490,6 +528,7 @@ class YamlDB(object):
         err, msg, key = self.get_decoder_key(Const.KUBAM_CFG)
         if err == 1:
             return err, msg, None
+        from cryptography.fernet import Fernet
         f = Fernet(key)
         return 0, None, f.decrypt(encrypted_password)
 
@@ -784,6 +823,7 @@ class YamlDB(object):
         """
         Create the key in a file name, write it out and return the key.
         """
+        from cryptography.fernet import Fernet
         key = Fernet.generate_key()
         try:
             with open(file_name, "w") as f:
@@ -892,6 +932,7 @@ class YamlDB(object):
         err, msg, key = self.get_decoder_key(file_name)
         if err == 1:
             return err, msg
+        from cryptography.fernet import Fernet
         f = Fernet(key)
         gh['credentials']['password'] = f.encrypt(bytes(gh['credentials']['password']))
 
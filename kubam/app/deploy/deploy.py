@@ -4,6 +4,9 @@ from ucs import UCSProfile
 from autoinstall import Builder, IsoMaker
 from db import YamlDB
 from config import Const
+from metrics import Metrics
+from helper import KubamError
+from pipeline import Pipeline
 
 deploy = Blueprint("deploy", __name__)
 
@@ -71,19 +74,64 @@ class Deployments(object):
         if err != 0:
             return {'error': msg}, 200
         # if the iso image isn't already exploded, extract it. 
-        err, msg = IsoMaker.extract_isos(isos)
+        with Metrics.timer("kubam_image_build_seconds", stage="extract_isos"):
+            err, msg = IsoMaker.extract_isos(isos)
         if err != 0:
             return {'error': msg}, 200
         # if the boot image isn't already created, create it. 
-        err, msg = IsoMaker.mkboot_isos(isos) 
+        with Metrics.timer("kubam_image_build_seconds", stage="boot_isos"):
+            err, msg = IsoMaker.mkboot_isos(isos)
         if err != 0:
             return {'error': msg}, 400
         # always go through and create the auto installation media for each server. 
-        err, msg = Builder.make_images(hosts)
+        with Metrics.timer("kubam_image_build_seconds", stage="host_images"):
+            err, msg = Builder.make_images(hosts)
         if err != 0:
             return {'error': msg}, 400
         return {'status': "server images created!"}, 201
 
+    @staticmethod
+    def create_deployment(req):
+        """
+        Deploy hosts through the pipeline: images, vMedia policies, service profiles, association
+        and power on, each host as soon as it can.
+        ["host01", "host02", ... ] or no arguments for all hosts.
+        """
+        err, msg, hosts = Deployments.get_valid_hosts(req)
+        if err != 0:
+            return {'error': msg}, Const.HTTP_BAD_REQUEST
+        if len(hosts) < 1:
+            return {'error': "No hosts defined"}, Const.HTTP_BAD_REQUEST
+        err, msg, isos = Deployments.get_valid_isos(list(set([x["os"] for x in hosts])))
+        if err != 0:
+            return {'error': msg}, Const.HTTP_BAD_REQUEST
+        db = YamlDB()
+        err, msg, config = db.parse_config(Const.KUBAM_CFG, True)
+        if err != 0:
+            return {'error': msg}, Const.HTTP_BAD_REQUEST
+        server_groups = {}
+        for sg in set([h["server_group"] for h in hosts if "server_group" in h]):
+            try:
+                server_groups[sg] = db.get_server_group(Const.KUBAM_CFG, sg)
+            except KubamError as e:
+                return {'error': str(e)}, Const.HTTP_BAD_REQUEST
+        try:
+            pipeline = Pipeline.start(hosts, isos, server_groups, config["kubam_ip"], config)
+        except KubamError as e:
+            return {'error': str(e)}, Const.HTTP_BAD_REQUEST
+        return {'deployment': pipeline.progress()}, Const.HTTP_ACCEPTED
+
+    @staticmethod
+    def list_deployments():
+        return {'deployments': [p.progress(hosts=False) for p in Pipeline.list_runs()]}, Const.HTTP_OK
+
+    @staticmethod
+    def get_deployment(deployment_id):
+        pipeline = Pipeline.get(deployment_id)
+        if pipeline is None:
+            return {'error': "deployment {0} does not exist.".format(deployment_id)}, Const.HTTP_NOT_FOUND
+        return {'deployment': pipeline.progress()}, Const.HTTP_OK
+
 
 @deploy.route(Const.API_ROOT2 + "/deploy/images", methods=['POST', 'GET', 'DELETE'])
 @cross_origin()
@@ -93,3 +141,20 @@ def deploy_image_handler():
     else:
         j, rc = Deployments.list_images()
     return jsonify(j), rc
+
+
+@deploy.route(Const.API_ROOT2 + "/deploy", methods=['POST', 'GET'])
+@cross_origin()
+def deploy_handler():
+    if request.method == 'POST':
+        j, rc = Deployments.create_deployment(request.json)
+    else:
+        j, rc = Deployments.list_deployments()
+    return jsonify(j), rc
+
+
+@deploy.route(Const.API_ROOT2 + "/deploy/<deployment_id>", methods=['GET'])
+@cross_origin()
+def deployment_handler(deployment_id):
+    j, rc = Deployments.get_deployment(deployment_id)
+    return jsonify(j), rc
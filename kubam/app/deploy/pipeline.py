@@ -0,0 +1,314 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+from autoinstall import Builder, IsoMaker
+from config import Const
+from db import YamlDB
+from helper import KubamError
+from metrics import Metrics
+from tracing import Tracer
+from ucs import UCSUtil, UCSServer
+from ucsc import UCSCUtil, UCSCServer
+
+log = logging.getLogger("kubam.deploy")
+
+
+class Pipeline(object):
+    """
+    Deploys hosts as a graph of tasks instead of stage by stage for the whole fleet.  Every OS is
+    extracted and gets its boot ISO and, per server group, its vMedia policy once.  Every host gets
+    its image, its service profile, is associated and powered on as soon as what it depends on is
+    done, so the first hosts install while the images of the others are still being built.  Each
+    stage has its own workers, Const.DEPLOY_WORKERS, and a failed task only holds up what depends
+    on it.
+    """
+    lock = threading.Lock()
+    runs = OrderedDict()
+    STAGES = ["extract", "boot_iso", "vmedia", "image", "profile", "associate", "power"]
+    # the util, login and logout and server classes of each platform, looked up when used so the
+    # SDKs load on use.
+    PLATFORMS = {
+        "ucsm": (UCSUtil, "ucs_login", "ucs_logout", UCSServer),
+        "ucsc": (UCSCUtil, "ucsc_login", "ucsc_logout", UCSCServer),
+    }
+
+    def __init__(self, hosts, isos, server_groups, kubam_ip, config):
+        """
+        :param hosts: the hosts to deploy.
+        :param isos: the iso map entries of their operating systems.
+        :param server_groups: server group name -> server group of the hosts that have one.
+        :param config: kubam.yaml the host images are built from.
+        """
+        self.id = YamlDB.new_uuid()
+        self.hosts = hosts
+        self.server_groups = server_groups
+        self.kubam_ip = kubam_ip
+        self.config = config
+        self.started = time.time()
+        self.finished = None
+        self.tasks = OrderedDict()
+        self.host_tasks = OrderedDict()
+        self.remaining = 0
+        self.sessions = {}
+        self.pools = {}
+        self.done = threading.Event()
+        isos = dict((i["os"], i) for i in isos)
+        for h in hosts:
+            sg = server_groups.get(h.get("server_group"))
+            stages = OrderedDict()
+            stages["extract"] = self.add(("extract", h["os"]), IsoMaker.extract_isos, [isos[h["os"]]])
+            stages["boot_iso"] = self.add(("boot_iso", h["os"]), IsoMaker.mkboot, h["os"],
+                                          deps=[stages["extract"]])
+            stages["image"] = self.add(("image", h["name"]), Builder.make_image, h, config,
+                                       deps=[stages["extract"]])
+            if sg is not None and sg["type"] in Pipeline.PLATFORMS:
+                stages["vmedia"] = self.add(("vmedia", sg["name"], h["os"]), self.make_vmedia, sg, h["os"],
+                                            deps=[stages["boot_iso"]])
+                if "service_profile_template" in h:
+                    stages["profile"] = self.add(("profile", h["name"]), self.make_profile, sg, h,
+                                                 deps=[stages["vmedia"]])
+                    if "server" in h:
+                        stages["associate"] = self.add(("associate", h["name"]), self.associate, sg, h,
+                                                       deps=[stages["profile"], stages["image"]])
+                        stages["power"] = self.add(("power", h["name"]), self.power_on, sg, h,
+                                                   deps=[stages["associate"]])
+            self.host_tasks[h["name"]] = stages
+
+    def add(self, key, fn, *args, **kwargs):
+        """
+        Add a task, once, with the tasks it depends on.
+        :return: the key of the task
+        """
+        if key not in self.tasks:
+            deps = kwargs.get("deps", [])
+            self.tasks[key] = {"stage": key[0], "fn": fn, "args": args, "deps": deps, "waiting": set(deps),
+                               "dependents": [], "status": "pending", "error": None, "started": None,
+                               "finished": None}
+            for d in deps:
+                self.tasks[d]["dependents"].append(key)
+            self.remaining += 1
+        return key
+
+    @staticmethod
+    def start(hosts, isos, server_groups, kubam_ip, config):
+        """
+        Start deploying the hosts in the background.
+        :return: the pipeline
+        """
+        with Pipeline.lock:
+            for run in Pipeline.runs.values():
+                if run.finished is not None:
+                    continue
+                busy = set(h["name"] for h in run.hosts) & set(h["name"] for h in hosts)
+                if busy:
+                    raise KubamError("host {0} is already being deployed.".format(sorted(busy)[0]))
+            pipeline = Pipeline(hosts, isos, server_groups, kubam_ip, config)
+            finished = [k for k, r in Pipeline.runs.items() if r.finished is not None]
+            for k in finished[:max(0, len(finished) - Const.DEPLOY_KEEP + 1)]:
+                del Pipeline.runs[k]
+            Pipeline.runs[pipeline.id] = pipeline
+        thread = threading.Thread(target=pipeline.run, name="deploy " + pipeline.id)
+        thread.daemon = True
+        thread.start()
+        return pipeline
+
+    @staticmethod
+    def get(deployment_id):
+        with Pipeline.lock:
+            return Pipeline.runs.get(deployment_id)
+
+    @staticmethod
+    def list_runs():
+        with Pipeline.lock:
+            return list(Pipeline.runs.values())
+
+    def run(self):
+        for stage in Pipeline.STAGES:
+            self.pools[stage] = ThreadPool(Const.DEPLOY_WORKERS[stage])
+        err, msg = Builder.make_post()
+        with Pipeline.lock:
+            for key, task in self.tasks.items():
+                if err != 0 and task["stage"] == "image":
+                    self.finish(key, "failed", msg)
+                elif not task["deps"] and task["status"] == "pending":
+                    self.submit(key)
+            if self.remaining == 0:
+                self.done.set()
+        self.done.wait()
+        for pool in self.pools.values():
+            pool.close()
+            pool.join()
+        self.logout()
+        log.info("deployment %s finished in %.1fs", self.id, self.finished - self.started)
+
+    def submit(self, key):
+        task = self.tasks[key]
+        task["status"] = "queued"
+        self.pools[task["stage"]].apply_async(Tracer.wrap(self.execute), (key,))
+
+    def execute(self, key):
+        task = self.tasks[key]
+        task["status"] = "running"
+        task["started"] = time.time()
+        try:
+            err, msg = task["fn"](*task["args"])
+        except Exception as e:
+            err, msg = 1, str(e)
+        Metrics.observe("kubam_deploy_stage_seconds", time.time() - task["started"], stage=task["stage"],
+                        result="error" if err else "ok")
+        if err:
+            log.warning("deploy %s failed: %s", " ".join(key), msg)
+        with Pipeline.lock:
+            self.finish(key, "failed" if err else "done", msg if err else None)
+            if self.remaining == 0:
+                self.done.set()
+
+    def finish(self, key, status, error=None):
+        """
+        Record the result of a task and start the tasks that were waiting for it, or block them
+        and everything after them when it failed.
+        """
+        task = self.tasks[key]
+        task["status"] = status
+        task["error"] = error
+        task["finished"] = time.time()
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.finished = task["finished"]
+        for d in task["dependents"]:
+            dependent = self.tasks[d]
+            if dependent["status"] != "pending":
+                continue
+            dependent["waiting"].discard(key)
+            if status != "done":
+                self.finish(d, "blocked", "{0} {1} {2}".format(" ".join(key), status, "" if error is None
+                                                                  else error).strip())
+            elif not dependent["waiting"]:
+                self.submit(d)
+
+    def session(self, sg):
+        """
+        Log in to a server group, reusing the logins of tasks that are done with theirs, at most
+        Const.DEPLOY_SESSIONS at a time.  A task waits for a login to be given back, or for one
+        being made to fail and leave room for its own.
+        :return: (handle, platform server class)
+        """
+        util, login, logout, server = Pipeline.PLATFORMS[sg["type"]]
+        with Pipeline.lock:
+            sessions = self.sessions.get(sg["name"])
+            if sessions is None:
+                sessions = self.sessions[sg["name"]] = {"idle": [], "count": 0,
+                                                        "ready": threading.Condition(Pipeline.lock)}
+            while not sessions["idle"] and sessions["count"] >= Const.DEPLOY_SESSIONS:
+                sessions["ready"].wait()
+            if sessions["idle"]:
+                return sessions["idle"].pop(), server
+            sessions["count"] += 1
+        try:
+            return getattr(util, login)(sg), server
+        except Exception:
+            with Pipeline.lock:
+                sessions["count"] -= 1
+                sessions["ready"].notify()
+            raise
+
+    def release(self, sg, handle):
+        with Pipeline.lock:
+            sessions = self.sessions[sg["name"]]
+            sessions["idle"].append(handle)
+            sessions["ready"].notify()
+
+    def logout(self):
+        for name, sessions in self.sessions.items():
+            util, login, logout, server = Pipeline.PLATFORMS[self.server_groups[name]["type"]]
+            with Pipeline.lock:
+                handles, sessions["idle"] = sessions["idle"], []
+            for handle in handles:
+                try:
+                    getattr(util, logout)(handle)
+                except Exception as e:
+                    log.warning("logging out of %s failed: %s", name, e)
+
+    def ucs_call(self, sg, fn):
+        """
+        Call fn(handle, server class) with a login to the server group.
+        """
+        handle, server = self.session(sg)
+        try:
+            return fn(handle, server)
+        finally:
+            self.release(sg, handle)
+
+    def make_vmedia(self, sg, os_name):
+        return self.ucs_call(sg, lambda handle, server: server.make_vmedias(
+            handle, sg.get("org", "org-root"), self.kubam_ip, [os_name]))
+
+    def make_profile(self, sg, host):
+        return self.ucs_call(sg, lambda handle, server: server.make_profile_from_template(
+            handle, sg.get("org", "org-root"), host))
+
+    def associate(self, sg, host):
+        return self.ucs_call(sg, lambda handle, server: server.associate_server(
+            handle, sg.get("org", "org-root"), host))
+
+    @staticmethod
+    def power_target(sg, host):
+        """
+        The server hash power_server takes for the server a host is installed on.
+        """
+        return {"dn": host["server"], "service_profile": "{0}/ls-{1}".format(sg.get("org", "org-root"), host["name"]),
+                "domain_id": host["server"].split("/")[0]}
+
+    def power_on(self, sg, host):
+        s = Pipeline.power_target(sg, host)
+        self.ucs_call(sg, lambda handle, server: server.power_server(handle, s, "on"))
+        return 0, None
+
+    def progress(self, hosts=True):
+        """
+        :return: the state of the deployment, the tasks of every stage by status and, with hosts,
+        the status of each stage of every host.
+        """
+        with Pipeline.lock:
+            stages = OrderedDict((s, {}) for s in Pipeline.STAGES)
+            for task in self.tasks.values():
+                stages[task["stage"]][task["status"]] = stages[task["stage"]].get(task["status"], 0) + 1
+            out = OrderedDict([("id", self.id), ("status", self.status()), ("started", self.started),
+                               ("finished", self.finished), ("stages", stages)])
+            # when each host that is done was done.
+            ready = [max(self.tasks[k]["finished"] for k in t.values()) for t in self.host_tasks.values()
+                     if all(self.tasks[k]["status"] == "done" for k in t.values())]
+            out["hosts_done"] = len(ready)
+            out["hosts_total"] = len(self.host_tasks)
+            out["first_host_seconds"] = min(ready) - self.started if ready else None
+            if hosts:
+                out["hosts"] = [self.host_progress(name, t) for name, t in self.host_tasks.items()]
+        return out
+
+    def host_progress(self, name, tasks):
+        h = OrderedDict([("name", name), ("stages", OrderedDict())])
+        for stage in Pipeline.STAGES:
+            if stage not in tasks:
+                h["stages"][stage] = "skipped"
+                continue
+            task = self.tasks[tasks[stage]]
+            h["stages"][stage] = task["status"]
+            if task["error"] is not None and "error" not in h:
+                h["error"] = task["error"]
+        statuses = set(h["stages"].values())
+        if statuses & set(["failed", "blocked"]):
+            h["status"] = "failed"
+        elif statuses <= set(["done", "skipped"]):
+            h["status"] = "done"
+        else:
+            h["status"] = "running"
+        return h
+
+    def status(self):
+        if self.finished is None:
+            return "running"
+        if any(t["status"] != "done" for t in self.tasks.values()):
+            return "failed"
+        return "done"
@@ -4,11 +4,40 @@ from ucs import UCSUtil, UCSServer
 from ucsc import UCSCUtil, UCSCServer
 from db import YamlDB
 from config import Const
-from helper import KubamError
+from helper import KubamError, wants_ndjson, server_records, ndjson_response
 
 disks = Blueprint("disks", __name__)
 
 class Disks(object):
+    @staticmethod
+    def stream_ucsm(handle, wanted):
+        """
+        Like list_ucsm, but streams the drives of each server as a line of NDJSON as soon as
+        they are fetched.
+        """
+        try:
+            ucs_servers = UCSServer.stream_selected_servers(handle, wanted)
+        except KubamError as e:
+            UCSUtil.ucs_logout(handle)
+            return jsonify({"error": str(e)}), Const.HTTP_BAD_REQUEST
+        records = server_records(ucs_servers, "disks", lambda i: UCSServer.disk_records(handle, i))
+        return ndjson_response(records, lambda: UCSUtil.ucs_logout(handle))
+
+    @staticmethod
+    def stream_ucsc(handle, wanted):
+        """
+        Like list_ucsc, but streams the drives of each server as a line of NDJSON as soon as
+        they are fetched.
+        """
+        try:
+            ucs_servers = UCSCServer.stream_selected_servers(handle, wanted)
+        except KubamError as e:
+            UCSCUtil.ucsc_logout(handle)
+            return jsonify({"error": str(e)}), Const.HTTP_BAD_REQUEST
+        records = server_records(ucs_servers, "disks", lambda i: UCSCServer.disk_records(handle, i),
+                                 domains=True)
+        return ndjson_response(records, lambda: UCSCUtil.ucsc_logout(handle))
+
     @staticmethod
     def list_ucsm(handle, wanted):
         """
@@ -16,22 +45,14 @@ class Disks(object):
             and stuff.
         """
         try:
-            all_servers = UCSServer.list_servers(handle)
-            ucs_servers = UCSUtil.servers_to_objects(all_servers, wanted)
+            ucs_servers = UCSServer.list_selected_servers(handle, wanted)
         except KubamError as e:
             UCSUtil.ucs_logout(handle)
             return {"error": str(e)}, Const.HTTP_BAD_REQUEST
         disks = {} 
-        from ucsmsdk.mometa.storage.StorageLocalDisk import StorageLocalDisk
         for i in ucs_servers:
             try:
-                server_disks = UCSServer.list_disks(handle, i)
-                disks[i['dn']] = []
-                for d in server_disks:
-                    # d.__dict__ flattens the object to a dictionary. 
-                    kv = d.__dict__
-                    kv = dict((key, value) for key, value in kv.iteritems() if not key.startswith('_') )
-                    disks[i['dn']].append( kv)
+                disks[i['dn']] = UCSServer.disk_records(handle, i)
             except KubamError as e:
                 UCSUtil.ucs_logout(handle)
                 return {"error": str(e)}, Const.HTTP_BAD_REQUEST
@@ -47,22 +68,14 @@ class Disks(object):
         Get all the drives of the servers listed and print them out. 
         """
         try:
-            all_servers = UCSCServer.list_servers(handle)
-            ucs_servers = UCSCUtil.servers_to_objects(all_servers, wanted)
+            ucs_servers = UCSCServer.list_selected_servers(handle, wanted)
         except KubamError as e:
             UCSCUtil.ucsc_logout(handle)
             return {"error": str(e)}, Const.HTTP_BAD_REQUEST
         disks = {} 
-        from ucscsdk.mometa.storage.StorageLocalDisk import StorageLocalDisk
         for i in ucs_servers:
             try:
-                server_disks = UCSCServer.list_disks(handle, i)
-                disks[i['dn']] = []
-                for d in server_disks:
-                    # d.__dict__ flattens the object to a dictionary. 
-                    kv = d.__dict__
-                    kv = dict((key, value) for key, value in kv.iteritems() if not key.startswith('_') )
-                    disks[i['dn']].append( kv)
+                disks[i['dn']] = UCSCServer.disk_records(handle, i)
             except KubamError as e:
                 UCSUtil.ucs_logout(handle)
                 return {"error": str(e)}, Const.HTTP_BAD_REQUEST
@@ -74,8 +87,7 @@ class Disks(object):
     @staticmethod
     def delete_ucsm(handle, wanted):
         try:
-            all_servers = UCSServer.list_servers(handle)
-            ucs_servers = UCSUtil.servers_to_objects(all_servers, wanted)
+            ucs_servers = UCSServer.list_selected_servers(handle, wanted)
         except KubamError as e:
             UCSUtil.ucs_logout(handle)
             return {"error": str(e)}, Const.HTTP_BAD_REQUEST
@@ -95,9 +107,11 @@ class Disks(object):
         """
         sets the JBOD disks to unconfigured good.
         """
+        # without a list of servers nothing is reset, not every disk in UCS Central.
+        if wanted == "all":
+            wanted = {}
         try:
-            all_servers = UCSCServer.list_servers(handle)
-            ucs_servers = UCSCUtil.servers_to_objects(all_servers, wanted)
+            ucs_servers = UCSCServer.list_selected_servers(handle, wanted)
         except KubamError as e:
             UCSCUtil.ucsc_logout(handle)
             return {"error": str(e)}, Const.HTTP_BAD_REQUEST
@@ -116,6 +130,7 @@ class Disks(object):
 def disk_operation(server_group):
     """
     Figure out the operation and do it. 
+    With ?stream=ndjson (or Accept: application/x-ndjson) the drives are streamed one server per line.
     """
     wanted = "all"
     try: 
@@ -137,6 +152,8 @@ def disk_operation(server_group):
 
         if request.method == "DELETE":
             js, rc = Disks.delete_ucsm(handle,  wanted)
+        if wants_ndjson():
+            return Disks.stream_ucsm(handle, wanted)
         js, rc = Disks.list_ucsm(handle, wanted)
         
         return jsonify(js), rc
@@ -150,6 +167,8 @@ def disk_operation(server_group):
 
         if request.method == "DELETE":
             js, rc = Disks.delete_ucsc(handle, wanted)
+        if wants_ndjson():
+            return Disks.stream_ucsc(handle, wanted)
         js, rc =  Disks.list_ucsc(handle, wanted)
         return jsonify(js), rc
 
@@ -0,0 +1,4 @@
+from xml_api import XmlApiEmulator
+from ucsm import UCSMEmulator
+from ucsc import UCSCEmulator
+from imc import IMCEmulator
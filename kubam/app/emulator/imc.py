@@ -0,0 +1,76 @@
+import time
+import argparse
+from xml_api import XmlApiEmulator
+
+
+class IMCEmulator(XmlApiEmulator):
+    """
+    Standalone C-Series CIMC with its vMedia service.  A vMedia mapping reports "In Progress" for
+    mount_seconds after it is created and "OK" afterwards.
+    """
+    VERSION = "3.0(4a)"
+
+    def __init__(self, serial="FCH0000001", model="UCSC-C220-M4S", mount_seconds=5.0, **kwargs):
+        super(IMCEmulator, self).__init__(**kwargs)
+        self.mount_seconds = mount_seconds
+        self.mounts = {}
+        self.add("topSystem", "sys", name="cimc-" + serial, address="127.0.0.1", mode="stand-alone")
+        self.add("computeRackUnit", "sys/rack-unit-1", id="1", serial=serial, model=model, operPower="off",
+                 adminPower="policy", numOfCpus="2", numOfCores="24", totalMemory="262144", memorySpeed="2400",
+                 usrLbl="")
+        self.add("biosUnit", "sys/rack-unit-1/bios", model=model, serial=serial)
+        self.add("mgmtController", "sys/rack-unit-1/mgmt", model=model, subject="blade")
+        self.add("firmwareRunning", "sys/rack-unit-1/mgmt/fw-system", deployment="system", type="blade-controller",
+                 version=self.VERSION)
+        self.add("commSvcEp", "sys/svc-ext")
+        self.add("commVMedia", "sys/svc-ext/vmedia-svc", adminState="enabled", encryptionState="Disabled",
+                 activeSessions="0")
+
+    def on_commit(self, class_id, dn, attrs, status):
+        if class_id == "commVMediaMap":
+            if status == "deleted":
+                self.mounts.pop(dn, None)
+            else:
+                self.mounts[dn] = time.time()
+
+    def live_attrs(self, class_id, dn, attrs):
+        if dn in self.mounts:
+            done = time.time() - self.mounts[dn] >= self.mount_seconds
+            return dict(attrs, mappingStatus="OK" if done else "In Progress")
+        return attrs
+
+
+def start_fleet(count, host="127.0.0.1", first_port=0, **kwargs):
+    """
+    Start count CIMC emulators, each on its own port like separate servers.
+    :return: list of (emulator, port)
+    """
+    fleet = []
+    for i in range(count):
+        e = IMCEmulator(serial="FCH{0:07d}".format(i + 1), **kwargs)
+        fleet.append((e, e.start(host, first_port + i if first_port else 0)))
+    return fleet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate a fleet of CIMC XML APIs for benchmarking KUBAM.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000, help="port of the first CIMC, the rest follow it")
+    parser.add_argument("--count", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds per request")
+    parser.add_argument("--mount-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    fleet = start_fleet(args.count, args.host, args.port, latency=args.latency, jitter=args.jitter,
+                        mount_seconds=args.mount_seconds)
+    print "{0} CIMC emulators on {1} ports {2}-{3}".format(args.count, args.host, fleet[0][1], fleet[-1][1])
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for e, port in fleet:
+            e.stop()
+
+
+if __name__ == '__main__':
+    main()
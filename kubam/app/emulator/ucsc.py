@@ -0,0 +1,98 @@
+import time
+import argparse
+from ucsm import UCSMEmulator
+from xml_api import split_dn
+
+
+class UCSCEmulator(UCSMEmulator):
+    """
+    UCS Central with a number of registered UCS domains.  Servers live under compute/sys-<domain id>,
+    service profiles are bound through the same lsBinding as on UCS Manager and powered through
+    lsServerOperation on the org/req-<name>/inst-<domain id> remote instance.  The resource-mgr
+    configRemoteResolveChildren method reads objects of a domain by their domain relative dn.
+    """
+    PATHS = ["/xmlIM/"]
+    VERSION = "2.0(1b)"
+    FIRST_DOMAIN = 1001
+
+    def __init__(self, domains=4, blades=16, racks=0, disks=2, fsm_seconds=30.0, **kwargs):
+        self.domains = domains
+        super(UCSCEmulator, self).__init__(blades=blades, racks=racks, disks=disks, fsm_seconds=fsm_seconds,
+                                           **kwargs)
+        self.methods["configRemoteResolveChildren"] = self.config_remote_resolve_children
+
+    def build(self, blades, racks, disks):
+        self.add("topSystem", "sys", name="kubam-central-emulator", address="127.0.0.1", mode="stand-alone")
+        self.add("firmwareRunning", "sys/mgmt/fw-system", deployment="system", type="system",
+                 version=self.VERSION, packageVersion=self.VERSION)
+        self.add("orgOrg", "org-root", name="root", level="0")
+        self.add("computeResourceAggrEp", "compute")
+        for d in range(self.domains):
+            domain_id = self.FIRST_DOMAIN + d
+            sys_dn = "compute/sys-{0}".format(domain_id)
+            self.add("computeSystem", sys_dn, id=str(domain_id), name="ucs-{0}".format(domain_id),
+                     address="10.0.{0}.{1}".format(d / 250, d % 250 + 1),
+                     totalPhysicalCnt=str(blades + racks))
+            self.build_domain(sys_dn, blades, racks, disks, d * (blades + racks))
+
+    @staticmethod
+    def fsm_classes(class_id):
+        return "configFsm", "configFsmStage"
+
+    def on_commit(self, class_id, dn, attrs, status):
+        super(UCSCEmulator, self).on_commit(class_id, dn, attrs, status)
+        sp = split_dn(dn)[0]
+        if class_id == "lsBinding" and status != "deleted" and sp in self.mos:
+            # the remote instance used for operations on the profile in its domain.
+            org, rn = split_dn(sp)
+            req = "{0}/req-{1}".format(org, rn[3:])
+            domain = attrs.get("pnDn", "").split("/")[1].replace("sys-", "")
+            self.add("computeRequirement", req, name=rn[3:])
+            self.add("computeInstance", "{0}/inst-{1}".format(req, domain), id=domain)
+        elif class_id == "lsServerOperation" and status != "deleted":
+            req, inst = split_dn(sp)
+            org, rn = split_dn(req)
+            self.set_power("{0}/ls-{1}".format(org, rn[4:]), attrs.get("state"))
+
+    def check_conf(self, e, dn):
+        # remote operations are accepted for any profile, like on UCS Central.
+        if e.tag == "lsServerOperation":
+            return None
+        return super(UCSCEmulator, self).check_conf(e, dn)
+
+    def config_remote_resolve_children(self, req):
+        # sys/chassis-1/blade-2/fsm of domain 1009 is compute/sys-1009/chassis-1/blade-2/fsm
+        in_dn = req.get("inDn", "").strip("/").split("/", 1)
+        req.set("inDn", "/".join(["compute/sys-" + req.get("inDomainId")] + in_dn[1:]))
+        if req.find("inFilter") is not None and len(req.find("inFilter")) == 0:
+            req.remove(req.find("inFilter"))
+        return self.config_resolve_children(req)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate a UCS Central XML API for benchmarking KUBAM.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--domains", type=int, default=4)
+    parser.add_argument("--blades", type=int, default=16, help="blades per domain")
+    parser.add_argument("--racks", type=int, default=0, help="rack servers per domain")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds per request")
+    parser.add_argument("--mo-latency", type=float, default=0.0, help="seconds per object returned")
+    parser.add_argument("--fsm-seconds", type=float, default=30.0)
+    args = parser.parse_args()
+    emulator = UCSCEmulator(domains=args.domains, blades=args.blades, racks=args.racks,
+                            fsm_seconds=args.fsm_seconds, latency=args.latency, jitter=args.jitter,
+                            mo_latency=args.mo_latency)
+    port = emulator.start(args.host, args.port)
+    print "UCS Central emulator with {0} domains of {1} blades and {2} rack servers on {3}:{4}".format(
+        args.domains, args.blades, args.racks, args.host, port)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
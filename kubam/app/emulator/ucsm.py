@@ -0,0 +1,219 @@
+import time
+import argparse
+import xml.etree.ElementTree as ET
+from xml_api import XmlApiEmulator, split_dn
+
+
+class UCSMEmulator(XmlApiEmulator):
+    """
+    UCS Manager domain with a configurable fleet of blades and rack servers.  Every server has a
+    board, an adapter with two ports, a storage controller with local disks and an FSM, and service
+    profiles made from a template have two vNICs.  Binding a service profile to a server
+    starts an Associate FSM whose stages complete over fsm_seconds, and lsPower changes the power state.
+    """
+    VERSION = "3.2(3a)"
+    BLADES_PER_CHASSIS = 8
+    FSM_STAGES = ["Begin", "BiosPostCompletion", "PnuOSIdent", "PnuOSPolicy", "PnuOSConfig",
+                  "BmcConfigPnuOS", "SolRedirectEnable", "Success"]
+
+    def __init__(self, blades=16, racks=0, disks=2, fsm_seconds=30.0, **kwargs):
+        super(UCSMEmulator, self).__init__(**kwargs)
+        self.fsm_seconds = fsm_seconds
+        self.fsms = {}
+        self.methods["lsInstantiateNNamedTemplate"] = self.ls_instantiate_n_named_template
+        self.build(blades, racks, disks)
+
+    def build(self, blades, racks, disks):
+        self.add("topSystem", "sys", name="kubam-emulator", address="127.0.0.1", mode="cluster")
+        self.add("mgmtEntity", "sys/mgmt", id="A", leadership="primary")
+        self.add("firmwareRunning", "sys/mgmt/fw-system", deployment="system", type="system",
+                 version=self.VERSION, packageVersion=self.VERSION)
+        for fi in ["A", "B"]:
+            self.add("networkElement", "sys/switch-" + fi, id=fi, model="UCS-FI-6332", operability="operable")
+        self.add("orgOrg", "org-root", name="root", level="0")
+        self.build_domain("sys", blades, racks, disks)
+
+    def build_domain(self, sys_dn, blades, racks, disks, first=0):
+        """
+        Add the chassis, blades and rack servers of one domain under sys_dn.
+        :param first: number of servers already built, keeps serials and uuids unique.
+        """
+        for i in range(blades):
+            chassis, slot = i / self.BLADES_PER_CHASSIS + 1, i % self.BLADES_PER_CHASSIS + 1
+            if slot == 1:
+                self.add("equipmentChassis", "{0}/chassis-{1}".format(sys_dn, chassis), id=str(chassis),
+                         model="UCSB-5108-AC2", operability="operable")
+            dn = "{0}/chassis-{1}/blade-{2}".format(sys_dn, chassis, slot)
+            self.add_server("computeBlade", dn, first + i, disks, chassisId=str(chassis), slotId=str(slot),
+                            model="UCSB-B200-M4")
+        for i in range(racks):
+            dn = "{0}/rack-unit-{1}".format(sys_dn, i + 1)
+            self.add_server("computeRackUnit", dn, first + blades + i, disks, id=str(i + 1),
+                            model="UCSC-C220-M4S")
+
+    def add_server(self, class_id, dn, n, disks, **attrs):
+        self.add(class_id, dn, serial="FCH{0:07d}".format(n + 1),
+                 uuid="1b4e28ba-2fa1-11d2-883f-{0:012x}".format(n + 1),
+                 association="none", assignedToDn="", availability="available", operPower="off",
+                 adminPower="policy", operState="unassociated", numOfCpus="2", numOfCores="24",
+                 totalMemory="262144", memorySpeed="2400", usrLbl="", **attrs)
+        self.add("computeBoard", dn + "/board", id="0", operPower="off", presence="equipped")
+        self.add("adaptorUnit", dn + "/adaptor-1", id="1", model="UCSB-MLOM-40G-03", serial="FCH{0:07d}A".format(n + 1))
+        for port in [1, 2]:
+            self.add("adaptorHostEthIf", dn + "/adaptor-1/host-eth-{0}".format(port), id=str(port),
+                     mac="00:25:B5:{0:02X}:{1:02X}:{2:02X}".format(port, (n + 1) / 256 % 256, (n + 1) % 256))
+        ctrl = dn + "/board/storage-SAS-1"
+        self.add("storageController", ctrl, id="1", type="SAS", model="Cisco 12G SAS Modular Raid Controller",
+                 operability="operable")
+        for d in range(disks):
+            self.add("storageLocalDisk", ctrl + "/disk-{0}".format(d + 1), id=str(d + 1),
+                     diskState="unconfigured-good", size="953344", serial="S{0:07d}{1}".format(n + 1, d + 1))
+        self.start_fsm(class_id, dn, "Discover", done=True)
+
+    @staticmethod
+    def fsm_classes(class_id):
+        return class_id + "Fsm", class_id + "FsmStage"
+
+    def start_fsm(self, class_id, dn, name, done=False):
+        """
+        (Re)start the FSM of a server, replacing the stages of the previous run.
+        """
+        fsm = dn + "/fsm"
+        fsm_class, stage_class = self.fsm_classes(class_id)
+        self.remove(fsm)
+        self.add(fsm_class, fsm, currentFsm=name, instanceId="0", sacl="")
+        for i, stage in enumerate(self.FSM_STAGES):
+            self.add(stage_class, "{0}/stage-{1}{2}".format(fsm, name, stage),
+                     name=name + stage, order=str(i + 1), descr="{0} {1}".format(name, stage), retry="0")
+        self.fsms[fsm] = {"name": name, "start": time.time() - (self.fsm_seconds if done else 0)}
+
+    def fsm_progress(self, fsm):
+        state = self.fsms.get(fsm)
+        if state is None:
+            return 100, 0
+        elapsed = time.time() - state["start"]
+        if self.fsm_seconds <= 0 or elapsed >= self.fsm_seconds:
+            return 100, elapsed
+        return int(100 * elapsed / self.fsm_seconds), elapsed
+
+    def live_attrs(self, class_id, dn, attrs):
+        if dn in self.fsms:
+            progress, elapsed = self.fsm_progress(dn)
+            state = self.fsms[dn]
+            attrs = dict(attrs, progress=str(progress))
+            if progress == 100:
+                done = time.gmtime(state["start"] + self.fsm_seconds)
+                attrs.update(fsmStatus="nop", completionTime=time.strftime("%Y-%m-%dT%H:%M:%S.000", done))
+            else:
+                current = self.FSM_STAGES[progress * len(self.FSM_STAGES) / 100]
+                attrs.update(fsmStatus=state["name"] + current, completionTime="never")
+            return attrs
+        fsm = split_dn(dn)[0]
+        if fsm in self.fsms and "order" in attrs:
+            progress, elapsed = self.fsm_progress(fsm)
+            position = progress * len(self.FSM_STAGES) / 100.0
+            order = int(attrs["order"]) - 1
+            if progress == 100 or order + 1 <= position:
+                status = "success"
+            elif order <= position:
+                status = "inProgress"
+            else:
+                status = "nop"
+            start = self.fsms[fsm]["start"] + self.fsm_seconds * (order + 1) / len(self.FSM_STAGES)
+            updated = time.strftime("%Y-%m-%dT%H:%M:%S.000", time.gmtime(start)) if status == "success" else ""
+            return dict(attrs, stageStatus=status, lastUpdateTime=updated)
+        return attrs
+
+    def server_dn(self, pn_dn):
+        entry = self.get(pn_dn)
+        if entry and entry[0] in ["computeBlade", "computeRackUnit"]:
+            return entry[0], pn_dn
+        return None, None
+
+    def on_commit(self, class_id, dn, attrs, status):
+        sp = split_dn(dn)[0]
+        if class_id == "lsBinding":
+            if status == "deleted":
+                for s in self.classes.get("computeblade", []) + self.classes.get("computerackunit", []):
+                    if self.mos[s][1]["assignedToDn"] == sp:
+                        self.add(self.mos[s][0], s, association="none", assignedToDn="", operState="unassociated")
+                        self.start_fsm(self.mos[s][0], s, "Disassociate")
+                return
+            server_class, server = self.server_dn(attrs.get("pnDn"))
+            if server is None:
+                return
+            self.add(server_class, server, association="associated", assignedToDn=sp, operState="ok")
+            self.add("lsBinding", dn, assignedToDn=attrs.get("pnDn"), operState="used")
+            if sp in self.mos:
+                self.add("lsServer", sp, assocState="associated", pnDn=attrs.get("pnDn"))
+            self.start_fsm(server_class, server, "Associate")
+        elif class_id == "lsPower" and status != "deleted":
+            self.set_power(sp, attrs.get("state"))
+        elif class_id == "lsServer" and status == "deleted":
+            for s in self.classes.get("computeblade", []) + self.classes.get("computerackunit", []):
+                if self.mos[s][1]["assignedToDn"] == dn:
+                    self.add(self.mos[s][0], s, association="none", assignedToDn="", operState="unassociated",
+                             operPower="off")
+
+    def set_power(self, sp, state):
+        """
+        Apply a power state such as admin-up or admin-down to the server bound to service profile sp.
+        """
+        server_class, server = self.server_dn(self.mos.get(sp, (None, {}))[1].get("pnDn"))
+        if server is None:
+            return
+        power = "off" if state == "admin-down" else "on"
+        self.add(server_class, server, operPower=power)
+        self.add("computeBoard", server + "/board", operPower=power)
+
+    def ls_instantiate_n_named_template(self, req):
+        template = req.get("dn")
+        if template not in self.mos:
+            return self.error(req, "102", "template {0} does not exist".format(template))
+        org = req.get("inTargetOrg")
+        if org not in self.mos:
+            return self.error(req, "102", "org {0} does not exist".format(org))
+        names = [d.get("value") for d in req.iter("dn")]
+        for name in names:
+            if org + "/ls-" + name in self.mos and req.get("inErrorOnExisting") == "true":
+                return self.error(req, "105", "service profile {0} already exists".format(name))
+        out = self.response(req)
+        confs = ET.SubElement(out, "outConfigs")
+        for name in names:
+            dn = org + "/ls-" + name
+            self.add("lsServer", dn, name=name, type="instance", srcTemplName=split_dn(template)[1][3:],
+                     assocState="unassociated", pnDn="")
+            # vNICs with addresses from the pool, numbered by the profiles made so far.
+            n = len(self.classes["lsserver"])
+            for i, vnic in enumerate(["eth0", "eth1"]):
+                self.add("vnicEther", dn + "/ether-" + vnic, name=vnic,
+                         addr="00:25:B5:A{0}:{1:02X}:{2:02X}".format(i, n / 256 % 256, n % 256))
+            confs.append(self.mo_elem(dn))
+        return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate a UCS Manager XML API for benchmarking KUBAM.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--blades", type=int, default=16)
+    parser.add_argument("--racks", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds per request")
+    parser.add_argument("--mo-latency", type=float, default=0.0, help="seconds per object returned")
+    parser.add_argument("--fsm-seconds", type=float, default=30.0)
+    args = parser.parse_args()
+    emulator = UCSMEmulator(blades=args.blades, racks=args.racks, fsm_seconds=args.fsm_seconds,
+                            latency=args.latency, jitter=args.jitter, mo_latency=args.mo_latency)
+    port = emulator.start(args.host, args.port)
+    print "UCSM emulator with {0} blades and {1} rack servers on {2}:{3}".format(
+        args.blades, args.racks, args.host, port)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,406 @@
+import re
+import ssl
+import time
+import uuid
+import random
+import threading
+import xml.etree.ElementTree as ET
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+
+def split_dn(dn):
+    """
+    Split a dn into its parent dn and rn.  Slashes inside [] belong to the rn, e.g:
+    "org-root/ls-node1/ipv4-pooled-addr" or "sys/rack-unit-1/mgmt/if-[1/2]"
+    """
+    depth = 0
+    for i in range(len(dn) - 1, -1, -1):
+        c = dn[i]
+        if c == "]":
+            depth += 1
+        elif c == "[":
+            depth -= 1
+        elif c == "/" and depth == 0:
+            return dn[:i], dn[i + 1:]
+    return "", dn
+
+
+def match_filter(f, attrs):
+    """
+    Evaluate an XML API inFilter element (eq, ne, wcard, and, or, not...) against the attributes of a MO.
+    """
+    op = f.tag
+    if op == "and":
+        return all(match_filter(c, attrs) for c in f)
+    if op == "or":
+        return any(match_filter(c, attrs) for c in f)
+    if op == "not":
+        return not any(match_filter(c, attrs) for c in f)
+    value = attrs.get(f.get("property"), "")
+    if op == "eq":
+        return value == f.get("value")
+    if op == "ne":
+        return value != f.get("value")
+    if op == "wcard":
+        return re.search(f.get("value"), value) is not None
+    if op in ["gt", "ge", "lt", "le"]:
+        try:
+            a, b = float(value), float(f.get("value"))
+        except ValueError:
+            a, b = value, f.get("value")
+        return {"gt": a > b, "ge": a >= b, "lt": a < b, "le": a <= b}[op]
+    if op == "bw":
+        return f.get("firstValue") <= value <= f.get("secondValue")
+    if op in ["anybit", "allbits"]:
+        have = set(value.split(","))
+        want = set(f.get("value").split(","))
+        return bool(have & want) if op == "anybit" else want <= have
+    return True
+
+
+class XmlApiEmulator(object):
+    """
+    In-memory stand-in for the Cisco XML API shared by UCS Manager, UCS Central and CIMC.  Managed
+    objects are kept in a dn keyed store with child and class indexes, requests are served over plain
+    http and every response can be delayed to model a remote domain.
+    :param latency: seconds added to every request.
+    :param jitter: up to this many extra seconds, picked at random per request.
+    :param mo_latency: seconds added for every managed object in a response.
+    """
+    PATHS = ["/nuova"]
+    VERSION = ""
+
+    def __init__(self, latency=0.0, jitter=0.0, mo_latency=0.0, user="admin", password="password"):
+        self.latency = latency
+        self.jitter = jitter
+        self.mo_latency = mo_latency
+        self.user = user
+        self.password = password
+        self.lock = threading.RLock()
+        self.mos = {}
+        self.children = {}
+        self.classes = {}
+        self.cookies = set()
+        self.calls = {}
+        # requests being served and the most there were at once.
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # the next this many requests fail with a 503, as a busy or restarting domain does.
+        self.unavailable = 0
+        self.server = None
+        self.methods = {
+            "aaaLogin": self.aaa_login,
+            "aaaRefresh": self.aaa_refresh,
+            "aaaKeepAlive": self.aaa_keep_alive,
+            "aaaLogout": self.aaa_logout,
+            "configResolveDn": self.config_resolve_dn,
+            "configResolveDns": self.config_resolve_dns,
+            "configResolveClass": self.config_resolve_class,
+            "configResolveClasses": self.config_resolve_classes,
+            "configResolveChildren": self.config_resolve_children,
+            "configConfMo": self.config_conf_mo,
+            "configConfMos": self.config_conf_mos,
+        }
+
+    # Managed object store.
+    def add(self, class_id, dn, **attrs):
+        with self.lock:
+            parent, rn = split_dn(dn)
+            attrs["dn"] = dn
+            attrs["rn"] = rn
+            if dn not in self.mos:
+                self.children.setdefault(parent, []).append(dn)
+                self.classes.setdefault(class_id.lower(), []).append(dn)
+            else:
+                old_class = self.mos[dn][0]
+                if old_class.lower() != class_id.lower():
+                    self.classes[old_class.lower()].remove(dn)
+                    self.classes.setdefault(class_id.lower(), []).append(dn)
+                attrs = dict(self.mos[dn][1], **attrs)
+            self.mos[dn] = (class_id, attrs)
+            return attrs
+
+    def remove(self, dn):
+        with self.lock:
+            if dn not in self.mos:
+                return
+            for child in list(self.children.get(dn, [])):
+                self.remove(child)
+            self.children.pop(dn, None)
+            class_id = self.mos.pop(dn)[0]
+            self.classes[class_id.lower()].remove(dn)
+            self.children[split_dn(dn)[0]].remove(dn)
+
+    def get(self, dn):
+        return self.mos.get(dn)
+
+    def live_attrs(self, class_id, dn, attrs):
+        """
+        Hook for attributes computed when an object is read, such as FSM progress.
+        """
+        return attrs
+
+    def on_commit(self, class_id, dn, attrs, status):
+        """
+        Hook called for every object created, modified or deleted through configConfMo(s).
+        """
+        pass
+
+    def mo_elem(self, dn, hierarchical=False):
+        class_id, attrs = self.mos[dn]
+        attrs = self.live_attrs(class_id, dn, attrs)
+        e = ET.Element(class_id, dict((k, str(v)) for k, v in attrs.items()))
+        if hierarchical:
+            for child in self.children.get(dn, []):
+                e.append(self.mo_elem(child, True))
+        return e
+
+    # Responses.
+    @staticmethod
+    def response(req, **attrs):
+        e = ET.Element(req.tag)
+        for k in ["dn", "classId", "cookie"]:
+            if req.get(k) is not None:
+                e.set(k, req.get(k))
+        e.set("response", "yes")
+        for k, v in attrs.items():
+            e.set(k, str(v))
+        return e
+
+    def error(self, req, code, descr):
+        return self.response(req, errorCode=code, invocationResult="unidentified-fail", errorDescr=descr)
+
+    @staticmethod
+    def hierarchical(req):
+        return req.get("inHierarchical", "false") in ["true", "yes"]
+
+    def configs(self, dns, hierarchical, tag="outConfigs"):
+        out = ET.Element(tag)
+        for dn in dns:
+            out.append(self.mo_elem(dn, hierarchical))
+        return out
+
+    # Session methods.
+    def login_attrs(self, cookie):
+        return {"outCookie": cookie, "outRefreshPeriod": "600", "outPriv": "admin,read-only",
+                "outSessionId": "", "outVersion": self.VERSION, "outName": self.user}
+
+    def aaa_login(self, req):
+        if req.get("inName") != self.user or req.get("inPassword") != self.password:
+            return self.error(req, "551", "Authentication failed")
+        cookie = "{0}/{1}".format(int(time.time()), uuid.uuid4())
+        self.cookies.add(cookie)
+        return self.response(req, **self.login_attrs(cookie))
+
+    def aaa_refresh(self, req):
+        if req.get("inCookie") not in self.cookies:
+            return self.error(req, "552", "Authorization required")
+        self.cookies.discard(req.get("inCookie"))
+        req.set("cookie", "")
+        return self.aaa_login(req)
+
+    def aaa_keep_alive(self, req):
+        return self.response(req)
+
+    def aaa_logout(self, req):
+        self.cookies.discard(req.get("inCookie"))
+        return self.response(req, outStatus="success")
+
+    # Query methods.
+    def config_resolve_dn(self, req):
+        out = self.response(req)
+        conf = ET.SubElement(out, "outConfig")
+        dn = req.get("dn", "").rstrip("/")
+        if dn in self.mos:
+            conf.append(self.mo_elem(dn, self.hierarchical(req)))
+        return out
+
+    def config_resolve_dns(self, req):
+        dns = [d.get("value") for d in req.iter("dn")]
+        out = self.response(req)
+        out.append(self.configs([d for d in dns if d in self.mos], self.hierarchical(req)))
+        unresolved = ET.SubElement(out, "outUnresolved")
+        for d in dns:
+            if d not in self.mos:
+                ET.SubElement(unresolved, "dn", value=d)
+        return out
+
+    def resolve_class(self, class_id, in_filter):
+        dns = self.classes.get(class_id.lower(), [])
+        if in_filter is None or len(in_filter) == 0:
+            return list(dns)
+        return [d for d in dns if all(match_filter(f, self.mos[d][1]) for f in in_filter)]
+
+    def config_resolve_class(self, req):
+        out = self.response(req)
+        dns = self.resolve_class(req.get("classId"), req.find("inFilter"))
+        out.append(self.configs(dns, self.hierarchical(req)))
+        return out
+
+    def config_resolve_classes(self, req):
+        dns = []
+        for c in req.iter("classId"):
+            dns.extend(self.resolve_class(c.get("value"), None))
+        out = self.response(req)
+        out.append(self.configs(dns, self.hierarchical(req)))
+        return out
+
+    def config_resolve_children(self, req):
+        dns = self.children.get(req.get("inDn"), [])
+        if req.get("classId"):
+            dns = [d for d in dns if self.mos[d][0].lower() == req.get("classId").lower()]
+        in_filter = req.find("inFilter")
+        if in_filter is not None:
+            dns = [d for d in dns if all(match_filter(f, self.mos[d][1]) for f in in_filter)]
+        out = self.response(req)
+        out.append(self.configs(dns, self.hierarchical(req)))
+        return out
+
+    # Configuration methods.
+    def check_conf(self, e, dn):
+        """
+        :return: error code and description if the object can not be applied, otherwise None
+        """
+        status = e.get("status", "")
+        if "deleted" in status or "removed" in status:
+            return None
+        if dn in self.mos and status == "created":
+            return "103", "can't create; object already exists."
+        if dn not in self.mos and split_dn(dn)[0] not in self.mos:
+            return "102", "can't create; parent object {0} does not exist".format(split_dn(dn)[0])
+        return None
+
+    def apply(self, e, dn):
+        status = e.get("status", "")
+        if "deleted" in status or "removed" in status:
+            class_id = self.mos[dn][0] if dn in self.mos else e.tag
+            self.remove(dn)
+            self.on_commit(class_id, dn, {}, "deleted")
+            return None
+        attrs = dict((k, v) for k, v in e.attrib.items() if k not in ["dn", "rn", "status"])
+        attrs = self.add(e.tag, dn, **attrs)
+        self.on_commit(e.tag, dn, attrs, status or "modified")
+        for child in e:
+            self.apply(child, dn + "/" + child.get("rn", ""))
+        return dn
+
+    def config_conf_mo(self, req):
+        conf = req.find("inConfig")
+        if conf is None or len(conf) == 0:
+            return self.error(req, "101", "missing inConfig")
+        e = conf[0]
+        dn = e.get("dn", req.get("dn"))
+        err = self.check_conf(e, dn)
+        if err:
+            return self.error(req, *err)
+        out = self.response(req)
+        c = ET.SubElement(out, "outConfig")
+        if self.apply(e, dn):
+            c.append(self.mo_elem(dn))
+        return out
+
+    def config_conf_mos(self, req):
+        pairs = [(p.get("key"), p[0]) for p in req.iter("pair") if len(p)]
+        for key, e in pairs:
+            err = self.check_conf(e, e.get("dn", key))
+            if err:
+                return self.error(req, *err)
+        out = self.response(req)
+        confs = ET.SubElement(out, "outConfigs")
+        for key, e in pairs:
+            dn = e.get("dn", key)
+            pair = ET.SubElement(confs, "pair", key=key)
+            if self.apply(e, dn):
+                pair.append(self.mo_elem(dn))
+            else:
+                pair.append(ET.Element(e.tag, dn=dn, status="deleted"))
+        return out
+
+    # Request handling.
+    def dispatch(self, body):
+        """
+        Handle one XML API request document and return the response document.
+        """
+        start = time.time()
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return self.serve(body, start)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def serve(self, body, start):
+        try:
+            req = ET.fromstring(body)
+        except ET.ParseError as err:
+            return ET.tostring(ET.Element("error", response="yes", errorCode="101",
+                                          errorDescr="malformed request: {0}".format(err)))
+        with self.lock:
+            self.calls[req.tag] = self.calls.get(req.tag, 0) + 1
+            method = self.methods.get(req.tag)
+            if method is None:
+                out = self.error(req, "101", "unknown method {0}".format(req.tag))
+            elif not req.tag.startswith("aaa") and req.get("cookie") not in self.cookies:
+                out = self.error(req, "552", "Authorization required")
+            else:
+                out = method(req)
+            count = sum(1 for e in out.iter() if e.get("dn") and e is not out)
+        delay = self.latency + random.uniform(0, self.jitter) + self.mo_latency * count
+        delay -= time.time() - start
+        if delay > 0:
+            time.sleep(delay)
+        return ET.tostring(out)
+
+    def start(self, host="127.0.0.1", port=0, certfile=None):
+        """
+        Serve the emulator on a background thread, over https with certfile, a PEM file with the
+        certificate and its key.
+        :return: the port it listens on, picked by the OS when port is 0.
+        """
+        self.server = ThreadedServer((host, port), RequestHandler)
+        if certfile:
+            self.server.socket = ssl.wrap_socket(self.server.socket, certfile=certfile, server_side=True)
+        self.server.emulator = self
+        t = threading.Thread(target=self.server.serve_forever)
+        t.daemon = True
+        t.start()
+        return self.server.server_address[1]
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class ThreadedServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not any(self.path.startswith(p) for p in self.server.emulator.PATHS):
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.getheader("content-length", 0)))
+        emulator = self.server.emulator
+        with emulator.lock:
+            unavailable = emulator.unavailable > 0
+            if unavailable:
+                emulator.unavailable -= 1
+        if unavailable:
+            self.send_error(503)
+            return
+        out = emulator.dispatch(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
@@ -1 +1,9 @@
 from helper import KubamError
+from lazy import LazyClass
+from domain_cache import DomainCache
+from domain_guard import DomainGuard
+from query_cache import QueryCache
+from xml_engine import XmlEngine, XmlSession, XmlApiError, Return
+from xml_stream import XmlStream
+from server_index import ServerIndex, parse_server_dn, server_name
+from stream import NDJSON, CSV, wants_ndjson, wants_csv, server_records, ndjson_response, csv_response
@@ -0,0 +1,62 @@
+import time
+import threading
+from config import Const
+
+
+class DomainCache(object):
+    """
+    Facts about a UCS domain that rarely change: its firmware version, the orgs known to exist,
+    its service profile templates and VLANs.  They are kept per domain, the platform with the
+    address and port it is reached on, for Const.DOMAIN_CACHE_SECONDS of the fact, and dropped
+    when KUBAM changes them itself.
+    """
+    lock = threading.Lock()
+    # (domain, fact): (expires, value)
+    entries = {}
+
+    @staticmethod
+    def domain(platform, ip, port=None):
+        # without a port both SDKs talk https.
+        return platform, ip, int(port or 443)
+
+    @staticmethod
+    def sg_domain(sg):
+        """
+        The domain of a server group, known without logging in.
+        """
+        credentials = sg.get("credentials", {})
+        return DomainCache.domain(sg.get("type"), credentials.get("ip"), credentials.get("port"))
+
+    @staticmethod
+    def of(handle):
+        """
+        The domain of a handle, set by the platform session when it logs in.  None for handles
+        made some other way, which are not cached.
+        """
+        return getattr(handle, "kubam_domain", None)
+
+    @staticmethod
+    def get(domain, fact, load):
+        """
+        The cached value of the fact, load() when it isn't cached or has expired.
+        """
+        if domain is None:
+            return load()
+        key = (domain, fact)
+        entry = DomainCache.entries.get(key)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
+        value = load()
+        with DomainCache.lock:
+            DomainCache.entries[key] = (time.time() + Const.DOMAIN_CACHE_SECONDS[fact], value)
+        return value
+
+    @staticmethod
+    def invalidate(domain, fact=None):
+        """
+        Forget a fact of the domain, or everything about it.
+        """
+        with DomainCache.lock:
+            for key in list(DomainCache.entries):
+                if key[0] == domain and fact in (None, key[1]):
+                    del DomainCache.entries[key]
@@ -0,0 +1,128 @@
+import time
+import random
+import socket
+import httplib
+import logging
+import threading
+from urllib2 import URLError, HTTPError
+from config import Const
+from helper import KubamError
+
+log = logging.getLogger("kubam.guard")
+
+
+class DomainGuard(object):
+    """
+    Admission control for the UCS Manager, UCS Central and CIMC domains KUBAM talks to.  At most
+    Const.DOMAIN_MAX_CALLS logins, queries and commits are in flight against a domain at once,
+    queries and logins that fail on the network are retried with jittered backoff, and after
+    Const.BREAKER_FAILURES failures in a row the domain is given up on for Const.BREAKER_SECONDS
+    so requests fail at once instead of waiting for socket timeouts.
+    """
+    lock = threading.Lock()
+    guards = {}
+    # calls that only read, so trying them again can't apply anything twice.
+    RETRIED_CALLS = ["query_classid", "query_dn", "query_dns", "query_children"]
+    GUARDED_CALLS = RETRIED_CALLS + ["commit", "process_xml_elem", "rawXML"]
+
+    def __init__(self, domain):
+        self.domain = domain
+        self.calls = threading.Semaphore(Const.DOMAIN_MAX_CALLS)
+        # a thread already holding a call slot, in an SDK call that makes another, keeps it.
+        self.holding = threading.local()
+        self.failures = 0
+        self.open_until = 0
+
+    @staticmethod
+    def of(domain):
+        """
+        The guard of a domain, see DomainCache.domain.
+        """
+        with DomainGuard.lock:
+            guard = DomainGuard.guards.get(domain)
+            if guard is None:
+                guard = DomainGuard(domain)
+                DomainGuard.guards[domain] = guard
+            return guard
+
+    @staticmethod
+    def transient(e):
+        """
+        True for errors of the network or of a busy domain, not of the request.
+        """
+        if isinstance(e, HTTPError):
+            return e.code >= 500
+        return isinstance(e, (socket.error, URLError, httplib.HTTPException))
+
+    def check(self):
+        """
+        :return: why the domain is not tried right now, or None.
+        """
+        wait = self.open_until - time.time()
+        if wait > 0:
+            return "{0} is unreachable, not trying again for {1:.0f}s".format(self.domain[1], wait)
+        return None
+
+    def success(self):
+        with DomainGuard.lock:
+            self.failures = 0
+            self.open_until = 0
+
+    def failure(self):
+        with DomainGuard.lock:
+            self.failures += 1
+            if self.failures >= Const.BREAKER_FAILURES:
+                if self.open_until == 0:
+                    log.warning("%s failed %d times in a row, failing fast for %ds", self.domain[1],
+                                self.failures, Const.BREAKER_SECONDS)
+                # also when a try after the break failed.
+                self.open_until = time.time() + Const.BREAKER_SECONDS
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Call fn within the domain's limit, trying it again on network errors when retry is given.
+        """
+        retry = kwargs.pop("retry", False)
+        attempts = 1 + (Const.DOMAIN_RETRIES if retry else 0)
+        for attempt in range(attempts):
+            msg = self.check()
+            if msg:
+                raise KubamError(msg)
+            try:
+                result = self.limited(fn, *args, **kwargs)
+            except Exception as e:
+                if not DomainGuard.transient(e):
+                    # the domain answered.
+                    self.success()
+                    raise
+                if attempt == attempts - 1:
+                    self.failure()
+                    raise
+                time.sleep(Const.DOMAIN_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+                continue
+            self.success()
+            return result
+
+    def limited(self, fn, *args, **kwargs):
+        if getattr(self.holding, "slot", False):
+            return fn(*args, **kwargs)
+        with self.calls:
+            self.holding.slot = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.holding.slot = False
+
+    def guarded(self, fn, retry):
+        def wrapper(*args, **kwargs):
+            return self.call(fn, *args, retry=retry, **kwargs)
+        return wrapper
+
+    def instrument_handle(self, handle):
+        """
+        Send every query and commit made through this SDK handle through the guard.
+        """
+        for call in DomainGuard.GUARDED_CALLS:
+            if hasattr(handle, call):
+                setattr(handle, call, self.guarded(getattr(handle, call), call in DomainGuard.RETRIED_CALLS))
+        return handle
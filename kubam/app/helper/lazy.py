@@ -0,0 +1,32 @@
+import importlib
+
+
+class LazyClass(object):
+    """
+    Stands in for a class that is imported from its module on first use.  The platform packages
+    export their classes this way so a server that only talks to one kind of UCS never imports
+    the SDKs (and their large metadata) of the others.
+    """
+    def __init__(self, package, module, name):
+        self.__dict__["_path"] = (package + "." + module, name)
+        self.__dict__["_target"] = None
+
+    def load(self):
+        target = self.__dict__["_target"]
+        if target is None:
+            module, name = self.__dict__["_path"]
+            target = getattr(importlib.import_module(module), name)
+            self.__dict__["_target"] = target
+        return target
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.load(), attr, value)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        return "<lazy {0}.{1}>".format(*self.__dict__["_path"])
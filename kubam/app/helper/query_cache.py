@@ -0,0 +1,226 @@
+import copy
+import time
+import inspect
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from config import Const
+from metrics import Metrics
+
+
+class QueryCache(object):
+    """
+    Results of the queries made through UCS Manager and UCS Central handles, shared by every login
+    to the same domain.  A result is kept for Const.QUERY_CACHE_SECONDS of the classes it is about,
+    queries that are already on their way to the domain are waited for instead of sent again, the
+    least recently used results are dropped beyond Const.QUERY_CACHE_BYTES, and a commit through
+    any handle of the domain drops the results of the classes it changes.
+    Every caller gets a copy of the cached result of its own, so the managed objects it is handed
+    can be changed, set or removed through the handle without changing what others are answered.
+    """
+    lock = threading.Lock()
+    # (domain, call, arguments): {"expires", "value", "size", "classes"}, least recently used first.
+    entries = OrderedDict()
+    size = 0
+    # (domain, call, arguments): {"event", "value", "error"} of the queries being made.
+    in_flight = {}
+    # domain: times its results were dropped, results of queries sent before are not kept.
+    generations = {}
+    # set on threads that want what the domain says now, see fresh.
+    bypass = threading.local()
+    CACHED_CALLS = ["query_classid", "query_dn", "query_children"]
+    COMMIT_CALLS = ["commit", "process_xml_elem", "rawXML"]
+    # what else changes when an object of the class is committed: service profiles and their
+    # bindings and power state are reflected on the servers they are associated with.
+    AFFECTS = {
+        "lsserver": ["computeblade", "computerackunit"],
+        "lsbinding": ["computeblade", "computerackunit", "lsserver"],
+        "lspower": ["computeblade", "computerackunit", "lsserver"],
+        "lsrequirement": ["computeblade", "computerackunit", "lsserver"],
+    }
+
+    @staticmethod
+    def ttl(classes):
+        if not classes:
+            return 0
+        return min(Const.QUERY_CACHE_SECONDS.get(c, 0) for c in classes)
+
+    @staticmethod
+    def mo_size(mo):
+        """
+        Rough size of a managed object or record: its string properties and some overhead.
+        """
+        props = mo if isinstance(mo, dict) else vars(mo)
+        return 256 + sum(len(k) + len(v) for k, v in props.items() if isinstance(v, basestring))
+
+    @staticmethod
+    def result_mos(value):
+        if value is None:
+            return []
+        if isinstance(value, list):
+            return value
+        return [value]
+
+    @staticmethod
+    def query_key(domain, call, fn, args, kwargs):
+        """
+        The key of a query, the same however its arguments were passed, and the class it asks for.
+        None for queries of the raw response, which are not cached.
+        """
+        arguments = inspect.getcallargs(fn, *args, **kwargs)
+        arguments.pop("self", None)
+        if arguments.get("need_response"):
+            return None, None
+        in_mo = arguments.pop("in_mo", None)
+        if in_mo is not None:
+            arguments["in_dn"] = in_mo.dn
+        class_id = arguments.get("class_id")
+        return (domain, call, repr(sorted(arguments.items()))), class_id and class_id.lower()
+
+    @staticmethod
+    @contextmanager
+    def fresh():
+        """
+        Send the queries made within to the domain, and cache what it says, for those watching it
+        change.
+        """
+        before = getattr(QueryCache.bypass, "on", False)
+        QueryCache.bypass.on = True
+        try:
+            yield
+        finally:
+            QueryCache.bypass.on = before
+
+    @staticmethod
+    def get(key, class_id, load):
+        """
+        The cached result of the query, or load() it.  Queries of a class get the time to live of
+        the class, others that of the classes of the objects they return.
+        """
+        fresh = getattr(QueryCache.bypass, "on", False)
+        with QueryCache.lock:
+            entry = QueryCache.entries.pop(key, None)
+            if entry is not None and entry["expires"] > time.time() and not fresh:
+                QueryCache.entries[key] = entry
+                Metrics.inc("kubam_query_cache_total", result="hit")
+                return copy.deepcopy(entry["value"])
+            if entry is not None:
+                QueryCache.size -= entry["size"]
+            generation = QueryCache.generations.get(key[0], 0)
+            waiting = QueryCache.in_flight.get(key)
+            # a query that was sent before this one may not have what the domain says now.
+            if waiting is None or fresh:
+                waiting = QueryCache.in_flight[key] = {"event": threading.Event(), "value": None, "error": None}
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            Metrics.inc("kubam_query_cache_total", result="coalesced")
+            waiting["event"].wait()
+            if waiting["error"] is not None:
+                raise waiting["error"]
+            return copy.deepcopy(waiting["value"])
+        Metrics.inc("kubam_query_cache_total", result="miss")
+        started = time.time()
+        try:
+            value = load()
+        except Exception as e:
+            waiting["error"] = e
+            raise
+        else:
+            # the result loaded is the caller's, what is kept is a copy of it.
+            waiting["value"] = shared = copy.deepcopy(value)
+            mos = QueryCache.result_mos(shared)
+            classes = set(getattr(mo, "_class_id", "").lower() for mo in mos)
+            ttl = QueryCache.ttl([class_id] if class_id else classes)
+            if class_id:
+                classes.add(class_id)
+            if ttl > 0:
+                QueryCache.put(key, generation, {"expires": started + ttl, "value": shared, "classes": classes,
+                                                 "size": sum(QueryCache.mo_size(mo) for mo in mos)})
+            return value
+        finally:
+            with QueryCache.lock:
+                if QueryCache.in_flight.get(key) is waiting:
+                    del QueryCache.in_flight[key]
+            waiting["event"].set()
+
+    @staticmethod
+    def put(key, generation, entry):
+        with QueryCache.lock:
+            if QueryCache.generations.get(key[0], 0) != generation:
+                return
+            old = QueryCache.entries.pop(key, None)
+            if old is not None:
+                QueryCache.size -= old["size"]
+            QueryCache.entries[key] = entry
+            QueryCache.size += entry["size"]
+            while QueryCache.size > Const.QUERY_CACHE_BYTES and QueryCache.entries:
+                e = QueryCache.entries.popitem(last=False)[1]
+                QueryCache.size -= e["size"]
+
+    @staticmethod
+    def invalidate(domain, classes=None):
+        """
+        Drop the results of the domain that are about any of the classes, or all of them.
+        """
+        with QueryCache.lock:
+            QueryCache.generations[domain] = QueryCache.generations.get(domain, 0) + 1
+            for key, entry in list(QueryCache.entries.items()):
+                if key[0] == domain and (classes is None or entry["classes"] & classes):
+                    del QueryCache.entries[key]
+                    QueryCache.size -= entry["size"]
+
+    @staticmethod
+    def committed_classes(handle):
+        """
+        The classes that the next commit of the handle changes, from the SDK's commit buffer.
+        None when they are not known.
+        """
+        for name, buf in vars(handle).items():
+            if name.endswith("__commit_buf") and isinstance(buf, dict):
+                classes = set()
+                for mo in buf.values():
+                    c = getattr(mo, "_class_id", "").lower()
+                    classes.add(c)
+                    classes.update(QueryCache.AFFECTS.get(c, []))
+                return classes
+        return None
+
+    @staticmethod
+    def cached(handle, domain, call, fn):
+        method = getattr(type(handle), call)
+
+        def wrapper(*args, **kwargs):
+            key, class_id = QueryCache.query_key(domain, call, method, (handle,) + args, kwargs)
+            if key is None:
+                return fn(*args, **kwargs)
+            return QueryCache.get(key, class_id, lambda: fn(*args, **kwargs))
+        return wrapper
+
+    @staticmethod
+    def invalidating(handle, domain, call, fn):
+        def wrapper(*args, **kwargs):
+            # method elements, and commits of handles without a buffer, may change anything.
+            classes = QueryCache.committed_classes(handle) if call == "commit" else None
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                QueryCache.invalidate(domain, classes)
+        return wrapper
+
+    @staticmethod
+    def instrument_handle(handle):
+        """
+        Cache the queries made through this SDK handle, see DomainCache.of for its domain.
+        """
+        domain = getattr(handle, "kubam_domain", None)
+        if domain is None:
+            return handle
+        for call in QueryCache.CACHED_CALLS:
+            if hasattr(handle, call):
+                setattr(handle, call, QueryCache.cached(handle, domain, call, getattr(handle, call)))
+        for call in QueryCache.COMMIT_CALLS:
+            if hasattr(handle, call):
+                setattr(handle, call, QueryCache.invalidating(handle, domain, call, getattr(handle, call)))
+        return handle
@@ -0,0 +1,103 @@
+from collections import namedtuple
+from helper import KubamError
+
+# The parts of a server dn, None where the dn doesn't have them:
+#   sys/chassis-1/blade-12             -> ServerDn(None, "1", "12", None)
+#   compute/sys-1009/rack-unit-3       -> ServerDn("1009", None, None, "3")
+ServerDn = namedtuple("ServerDn", ["domain", "chassis", "slot", "rack"])
+
+# dns are parsed over and over for the same servers, so keep the results.  The cache is dropped
+# when it gets this big so it can't grow without bound.
+MAX_CACHED_DNS = 65536
+_dn_cache = {}
+
+_PREFIXES = [("sys-", "domain"), ("chassis-", "chassis"), ("blade-", "slot"), ("rack-unit-", "rack")]
+
+
+def parse_server_dn(dn):
+    """
+    Split a UCS Manager or UCS Central server dn (or the dn of anything under a server) into
+    its domain, chassis, slot and rack ids.
+    :return: ServerDn
+    """
+    parsed = _dn_cache.get(dn)
+    if parsed is not None:
+        return parsed
+    parts = {}
+    for rn in dn.split("/"):
+        for prefix, field in _PREFIXES:
+            if rn.startswith(prefix) and field not in parts:
+                parts[field] = rn[len(prefix):]
+                break
+    parsed = ServerDn(parts.get("domain"), parts.get("chassis"), parts.get("slot"), parts.get("rack"))
+    if len(_dn_cache) >= MAX_CACHED_DNS:
+        _dn_cache.clear()
+    _dn_cache[dn] = parsed
+    return parsed
+
+
+def server_name(dn, domains=False):
+    """
+    The name the API uses for the server with this dn: chassis/slot for blades and the rack id
+    for rack servers, both prefixed with the domain id for UCS Central (domains=True).
+    :return: ("blades" or "rack_servers", name)
+    """
+    s = parse_server_dn(dn)
+    if s.chassis is not None and s.slot is not None:
+        kind, parts = "blades", [s.chassis, s.slot]
+    elif s.rack is not None:
+        kind, parts = "rack_servers", [s.rack]
+    else:
+        raise KubamError("{0} is not the dn of a server.".format(dn))
+    if domains:
+        if s.domain is None:
+            raise KubamError("{0} is not the dn of a UCS Central server.".format(dn))
+        parts.insert(0, s.domain)
+    return kind, "/".join(parts)
+
+
+class ServerIndex(object):
+    """
+    Index of the servers listed from a UCS by the names the API uses for them: chassis/slot
+    for blades and the rack id for rack servers, prefixed with the domain id for UCS Central
+    (domains=True).  Lets a selection of servers be looked up in one pass over the inventory.
+    """
+
+    def __init__(self, servers, domains=False):
+        self.domains = domains
+        self.blades = {}
+        self.rack_servers = {}
+        for s in servers:
+            if "chassis_id" in s:
+                key = (s["chassis_id"], s["slot"])
+                index = self.blades
+            elif "rack_id" in s:
+                key = (s["rack_id"],)
+                index = self.rack_servers
+            else:
+                continue
+            if domains:
+                key = (s["domain_id"],) + key
+            index.setdefault(tuple(str(k) for k in key), []).append(s)
+
+    def find(self, kind, name):
+        """
+        :param kind: "blades" or "rack_servers"
+        :param name: the API name of the server, e.g. "1/2" for a UCS Manager blade
+        :return: the servers with that name, an empty list if there are none
+        """
+        return getattr(self, kind).get(tuple(str(name).split("/")), [])
+
+    def select(self, servers):
+        """
+        Takes the servers we get from the API like {"blades": ["1/1", "2/1"], "rack_servers": ["1", ...]}
+        :return: the matching inventory servers, in the order they were asked for
+        """
+        selected = []
+        for kind in ["blades", "rack_servers"]:
+            for name in servers.get(kind, []):
+                found = self.find(kind, name)
+                if not found:
+                    raise KubamError("server {0} does not exist.".format(name))
+                selected.extend(found)
+        return selected
@@ -0,0 +1,74 @@
+import csv
+from StringIO import StringIO
+from flask import Response, json, request, stream_with_context
+from helper import KubamError
+from server_index import server_name
+
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+
+
+def wants_ndjson():
+    """
+    True when the client asked for a streamed response, with ?stream=ndjson or by accepting
+    application/x-ndjson over application/json.
+    """
+    if request.args.get("stream") == "ndjson":
+        return True
+    return request.accept_mimetypes[NDJSON] > request.accept_mimetypes["application/json"]
+
+
+def wants_csv():
+    """
+    True when the client asked for CSV, with ?format=csv or by accepting text/csv over
+    application/json.
+    """
+    if request.args.get("format") == "csv":
+        return True
+    return request.accept_mimetypes[CSV] > request.accept_mimetypes["application/json"]
+
+
+def server_records(servers, field, fn=None, domains=False):
+    """
+    One record per server: {"kind": "blades", "server": "1/1", field: fn(server)}, named the
+    way dn_hash_to_out names them.  fn is called as the records are written.
+    """
+    for s in servers:
+        kind, name = server_name(s["dn"], domains)
+        yield {"kind": kind, "server": name, field: fn(s) if fn else s}
+
+
+def ndjson_response(records, close=None):
+    """
+    Stream the records as newline delimited JSON, each written as soon as it is produced.  An
+    error part way through ends the stream with an {"error": ...} record.  close is called once
+    the stream is done, e.g. to log out of the UCS the records come from.
+    """
+    def generate():
+        try:
+            for r in records:
+                yield json.dumps(r) + "\n"
+        except KubamError as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+        finally:
+            if close:
+                close()
+    return Response(stream_with_context(generate()), mimetype=NDJSON)
+
+
+def csv_response(columns, rows, filename=None):
+    """
+    Stream a header of the columns and then the rows, lists of values in the same order, as CSV,
+    each row written as soon as it is produced.
+    """
+    def line(values):
+        out = StringIO()
+        csv.writer(out).writerow([u"" if v is None else unicode(v).encode("utf-8") for v in values])
+        return out.getvalue()
+
+    def generate():
+        yield line(columns)
+        for r in rows:
+            yield line(r)
+    headers = {"Content-Disposition": "attachment; filename=" + filename} if filename else None
+    return Response(stream_with_context(generate()), mimetype=CSV, headers=headers)
@@ -0,0 +1,507 @@
+import ssl
+import time
+import errno
+import heapq
+import types
+import random
+import select
+import socket
+import logging
+import xml.etree.ElementTree as ET
+from collections import deque
+from urllib2 import HTTPError
+from config import Const
+from helper import KubamError
+from domain_cache import DomainCache
+from domain_guard import DomainGuard
+
+log = logging.getLogger("kubam.xml_engine")
+
+
+class Return(Exception):
+    """
+    Raised by a coroutine to finish with a value, a Python 2 generator can't return one.
+    """
+    def __init__(self, value=None):
+        Exception.__init__(self)
+        self.value = value
+
+
+class XmlApiError(KubamError):
+    """
+    An error response of the XML API, with its errorCode.
+    """
+    def __init__(self, code, msg):
+        KubamError.__init__(self, msg)
+        self.code = code
+
+
+class Future(object):
+    """
+    A result coroutines can wait for by yielding it, set once.
+    """
+    def __init__(self):
+        self.done = False
+        self.value = None
+        self.error = None
+        self.callbacks = []
+
+    def set(self, value=None, error=None):
+        self.done = True
+        self.value = value
+        self.error = error
+        for callback in self.callbacks:
+            callback(value, error)
+        self.callbacks = []
+
+
+class XmlRequest(object):
+    """
+    One XML API method sent to a domain.
+    :param retry: whether it only reads, so it can be sent again when it failed on the network.
+    """
+    def __init__(self, domain, path, elem, retry=False):
+        self.domain = domain
+        self.path = path
+        self.method = elem.tag
+        self.body = ET.tostring(elem)
+        self.retry = retry
+
+
+class Connection(object):
+    """
+    A non-blocking HTTP/1.0 exchange of one XmlRequest, https when the domain is on one of the
+    HTTPS_PORTS.  The engine knows it by the file descriptor of its socket, which stays the same
+    when the socket is wrapped for TLS.
+    """
+    HTTPS_PORTS = set([443])
+
+    def __init__(self, request):
+        self.request = request
+        self.url = "{0}://{1}:{2}{3}".format(self.scheme(), request.domain[1], request.domain[2], request.path)
+        self.out = ("POST {0} HTTP/1.0\r\nHost: {1}\r\nContent-Type: application/x-www-form-urlencoded\r\n"
+                    "Content-Length: {2}\r\n\r\n{3}").format(request.path, request.domain[1],
+                                                           len(request.body), request.body)
+        self.chunks = []
+        self.sock = None
+        self.fd = None
+        self.finished = False
+        self.state = None
+        # what the socket has to be for the exchange to go on: "r" readable or "w" writable.
+        self.want = "w"
+        self.deadline = time.time() + Const.XML_API_TIMEOUT
+
+    def scheme(self):
+        return "https" if self.request.domain[2] in Connection.HTTPS_PORTS else "http"
+
+    def open(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setblocking(0)
+        self.fd = self.sock.fileno()
+        err = self.sock.connect_ex((self.request.domain[1], self.request.domain[2]))
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            raise socket.error(err, "{0} is not reachable".format(self.request.domain[1]))
+        self.state = "connecting"
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+
+    def ready(self):
+        """
+        Go on with the exchange now that the socket is ready.
+        :return: the response element when it is done, else None.
+        """
+        try:
+            return self.advance()
+        except ssl.SSLWantReadError:
+            self.want = "r"
+        except ssl.SSLWantWriteError:
+            self.want = "w"
+        return None
+
+    def advance(self):
+        if self.state == "connecting":
+            err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err != 0:
+                raise socket.error(err, "{0} is not reachable".format(self.request.domain[1]))
+            self.state = "sending"
+            if self.scheme() == "https":
+                # UCS domains have self signed certificates, as the SDKs KUBAM logs in with.
+                context = ssl._create_unverified_context()
+                self.sock = context.wrap_socket(self.sock, server_hostname=self.request.domain[1],
+                                                do_handshake_on_connect=False)
+                self.state = "handshake"
+        if self.state == "handshake":
+            self.sock.do_handshake()
+            self.state = "sending"
+        if self.state == "sending":
+            self.want = "w"
+            sent = self.sock.send(self.out)
+            self.out = self.out[sent:]
+            if self.out:
+                return None
+            self.state = "receiving"
+            self.want = "r"
+            return None
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except ssl.SSLError as e:
+                # servers that close without a TLS close_notify, an HTTP/1.0 response ends there.
+                if e.errno != ssl.SSL_ERROR_EOF and "unexpected eof" not in str(e).lower():
+                    raise
+                data = ""
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return None
+                raise
+            if not data:
+                return self.response()
+            self.chunks.append(data)
+
+    def response(self):
+        head, _, body = "".join(self.chunks).partition("\r\n\r\n")
+        status = head.split("\r\n", 1)[0].split(" ", 2)
+        if len(status) < 2 or not status[1].isdigit():
+            raise HTTPError(self.url, 502, "bad response", None, None)
+        if int(status[1]) != 200:
+            raise HTTPError(self.url, int(status[1]), status[2] if len(status) > 2 else "", None, None)
+        out = ET.fromstring(body)
+        if out.get("errorCode"):
+            raise XmlApiError(out.get("errorCode"), out.get("errorDescr", ""))
+        return out
+
+
+class XmlEngine(object):
+    """
+    Sends XML API requests to many UCS domains at once from a single thread.  Work is written as
+    coroutines, generators that yield an XmlRequest, a Future, another coroutine or a list of
+    them, and are sent back the response element, the value or the list of values.  A coroutine
+    finishes with raise Return(value).
+    Requests wait for a call slot of their domain's DomainGuard, shared with the threads using the
+    SDKs, fail at once while its breaker is open and, when they only read, are sent again after a
+    network error like the guard does.
+    """
+    def __init__(self):
+        self.connections = {}
+        # (request, callback, attempt) waiting for a call slot.
+        self.queued = deque()
+        # callbacks to run on the next turn of the loop.
+        self.soon = deque()
+        # (when, sequence, callback) to run later.
+        self.timers = []
+        self.sequence = 0
+
+    def run(self, item):
+        """
+        Run a coroutine, a request or a list of them until it is done.
+        :return: its value, its error is raised.
+        """
+        out = {}
+
+        def done(value, error):
+            out["value"], out["error"] = value, error
+        self.start(item, done)
+        while "error" not in out:
+            if not (self.soon or self.connections or self.timers or self.queued):
+                raise RuntimeError("nothing left to wait for")
+            self.turn()
+        if out["error"] is not None:
+            raise out["error"]
+        return out["value"]
+
+    def call_soon(self, callback, value=None, error=None):
+        self.soon.append(lambda: callback(value, error))
+
+    def call_later(self, seconds, fn):
+        self.sequence += 1
+        heapq.heappush(self.timers, (time.time() + seconds, self.sequence, fn))
+
+    def start(self, item, callback):
+        if isinstance(item, XmlRequest):
+            self.send(item, callback, 0)
+        elif isinstance(item, types.GeneratorType):
+            self.soon.append(lambda: self.resume(item, callback, None, None))
+        elif isinstance(item, (list, tuple)):
+            self.gather(item, callback)
+        elif isinstance(item, Future):
+            if item.done:
+                self.call_soon(callback, item.value, item.error)
+            else:
+                item.callbacks.append(lambda value, error: self.call_soon(callback, value, error))
+        else:
+            self.call_soon(callback, error=TypeError("can't wait for {0!r}".format(item)))
+
+    def resume(self, gen, callback, value, error):
+        try:
+            item = gen.throw(error) if error is not None else gen.send(value)
+        except StopIteration:
+            callback(None, None)
+        except Return as r:
+            callback(r.value, None)
+        except Exception as e:
+            callback(None, e)
+        else:
+            self.start(item, lambda v, e: self.resume(gen, callback, v, e))
+
+    def gather(self, items, callback):
+        """
+        Start all items and call back with their values once all are done, or the first error.
+        """
+        results = [None] * len(items)
+        state = {"left": len(items), "error": None}
+        if not items:
+            self.call_soon(callback, [])
+
+        def done(i, value, error):
+            results[i] = value
+            if error is not None and state["error"] is None:
+                state["error"] = error
+            state["left"] -= 1
+            if state["left"] == 0:
+                callback(results if state["error"] is None else None, state["error"])
+        for i, item in enumerate(items):
+            self.start(item, lambda value, error, i=i: done(i, value, error))
+
+    def send(self, request, callback, attempt):
+        guard = DomainGuard.of(request.domain)
+        msg = guard.check()
+        if msg:
+            self.call_soon(callback, error=KubamError(msg))
+            return
+        if len(self.connections) >= Const.XML_ENGINE_CONNECTIONS or not guard.calls.acquire(False):
+            self.queued.append((request, callback, attempt))
+            return
+        conn = Connection(request)
+        conn.callback = callback
+        conn.attempt = attempt
+        try:
+            conn.open()
+        except socket.error as e:
+            self.finish(conn, None, e)
+            return
+        self.connections[conn.fd] = conn
+
+    def admit(self):
+        """
+        Send the queued requests that can get a call slot now, in the order they came.
+        """
+        for _ in range(len(self.queued)):
+            self.send(*self.queued.popleft())
+
+    def finish(self, conn, value, error):
+        # a connection gives back its call slot and calls back once.
+        if conn.finished:
+            return
+        conn.finished = True
+        self.connections.pop(conn.fd, None)
+        conn.close()
+        request = conn.request
+        guard = DomainGuard.of(request.domain)
+        guard.calls.release()
+        if error is None or not DomainGuard.transient(error):
+            # the domain answered.
+            guard.success()
+        elif request.retry and conn.attempt < Const.DOMAIN_RETRIES:
+            delay = Const.DOMAIN_BACKOFF * 2 ** conn.attempt * random.uniform(0.5, 1.5)
+            self.call_later(delay, lambda: self.send(request, conn.callback, conn.attempt + 1))
+            return
+        else:
+            guard.failure()
+            log.warning("%s to %s failed: %s", request.method, request.domain[1], error)
+        self.call_soon(conn.callback, value, error)
+
+    def turn(self):
+        """
+        Run what is ready, then wait for sockets, timers or call slots.
+        """
+        while self.soon:
+            self.soon.popleft()()
+        self.admit()
+        if self.soon or not (self.connections or self.timers or self.queued):
+            return
+        now = time.time()
+        timeout = Const.XML_API_TIMEOUT
+        if self.timers:
+            timeout = min(timeout, self.timers[0][0] - now)
+        if self.connections:
+            timeout = min(timeout, min(c.deadline for c in self.connections.values()) - now)
+        if self.queued:
+            # slots are given back by threads too, they don't wake the loop.
+            timeout = min(timeout, 0.01)
+        timeout = max(0, timeout)
+        readable = [fd for fd, c in self.connections.items() if c.want == "r"]
+        writable = [fd for fd, c in self.connections.items() if c.want == "w"]
+        if readable or writable:
+            try:
+                readable, writable, _ = select.select(readable, writable, [], timeout)
+            except select.error as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+                readable, writable = [], []
+        else:
+            time.sleep(timeout)
+        for fd in set(readable + writable):
+            conn = self.connections.get(fd)
+            if conn is None:
+                continue
+            try:
+                out = conn.ready()
+            except Exception as e:
+                self.finish(conn, None, e)
+                continue
+            if out is not None:
+                self.finish(conn, out, None)
+        now = time.time()
+        for conn in [c for c in self.connections.values() if c.deadline <= now]:
+            self.finish(conn, None, socket.timeout("{0} timed out".format(conn.request.method)))
+        while self.timers and self.timers[0][0] <= now:
+            heapq.heappop(self.timers)[2]()
+
+
+class XmlSession(object):
+    """
+    A login to a UCS Manager or UCS Central for an XmlEngine.  Its methods are coroutines, the
+    login is made by the first call and refreshed half way through its refresh period, calls
+    that find it timed out log in again once.
+    """
+    PATHS = {"ucsm": "/nuova", "ucsc": "/xmlIM/central-mgr"}
+
+    def __init__(self, platform, ip, username, password, port=None):
+        self.domain = DomainCache.domain(platform, ip, port)
+        self.username = username
+        self.password = password
+        self.cookie = None
+        self.refresh_at = 0
+        self.version = None
+        # the login or refresh on its way, calls made meanwhile wait for it.
+        self.pending = None
+
+    def codec(self):
+        if self.domain[0] == "ucsc":
+            from ucscsdk import ucscxmlcodec
+            return ucscxmlcodec
+        from ucsmsdk import ucsxmlcodec
+        return ucsxmlcodec
+
+    def request(self, elem, retry):
+        return XmlRequest(self.domain, XmlSession.PATHS[self.domain[0]], elem, retry)
+
+    def session_cookie(self):
+        if self.cookie is not None and time.time() < self.refresh_at:
+            raise Return(self.cookie)
+        if self.pending is not None:
+            cookie = yield self.pending
+            raise Return(cookie)
+        pending = self.pending = Future()
+        try:
+            if self.cookie is not None:
+                try:
+                    out = yield self.request(ET.Element("aaaRefresh", inName=self.username, inPassword=self.password,
+                                                        inCookie=self.cookie), False)
+                except XmlApiError:
+                    out = None
+            if self.cookie is None or out is None:
+                out = yield self.request(ET.Element("aaaLogin", inName=self.username, inPassword=self.password),
+                                         True)
+        except Exception as e:
+            self.pending = None
+            pending.set(error=e)
+            raise
+        self.cookie = out.get("outCookie")
+        self.refresh_at = time.time() + int(out.get("outRefreshPeriod") or 600) / 2
+        self.version = out.get("outVersion")
+        self.pending = None
+        pending.set(self.cookie)
+        raise Return(self.cookie)
+
+    def call(self, elem, retry=True):
+        """
+        Send a method of the session.
+        :return: the response element
+        """
+        for attempt in range(2):
+            cookie = yield self.session_cookie()
+            elem.set("cookie", cookie)
+            try:
+                out = yield self.request(elem, retry)
+            except XmlApiError as e:
+                # 552: the session timed out or was logged out.
+                if e.code != "552" or attempt == 1:
+                    raise
+                if self.cookie == cookie:
+                    self.cookie = None
+                continue
+            raise Return(out)
+
+    def mos(self, out):
+        """
+        The managed objects of a response, as the SDK of the platform makes them.
+        """
+        response = self.codec().from_xml_str(ET.tostring(out))
+        configs = getattr(response, "out_config", None) or getattr(response, "out_configs", None)
+        return list(configs.child) if configs is not None else []
+
+    def resolve_class(self, class_id, in_filter=None, hierarchical=False):
+        """
+        :param in_filter: a filter element, e.g. <eq class="computeBlade" property="operPower" value="on"/>
+        """
+        elem = ET.Element("configResolveClass", classId=class_id, inHierarchical=str(hierarchical).lower())
+        if in_filter is not None:
+            ET.SubElement(elem, "inFilter").append(in_filter)
+        out = yield self.call(elem)
+        raise Return(self.mos(out))
+
+    def resolve_records(self, class_id, fields, in_filter=None):
+        """
+        The objects of a class as records of fields, (XML property, key) pairs as XmlStream has
+        them, without making the SDK's objects.
+        """
+        elem = ET.Element("configResolveClass", classId=class_id, inHierarchical="false")
+        if in_filter is not None:
+            ET.SubElement(elem, "inFilter").append(in_filter)
+        out = yield self.call(elem)
+        wanted = class_id.lower()
+        raise Return([dict((key, e.get(prop)) for prop, key in fields) for e in out.iter() if e.tag.lower() == wanted])
+
+    def resolve_dn(self, dn, hierarchical=False):
+        """
+        :return: the managed object, None when there is none.
+        """
+        out = yield self.call(ET.Element("configResolveDn", dn=dn, inHierarchical=str(hierarchical).lower()))
+        mos = self.mos(out)
+        raise Return(mos[0] if mos else None)
+
+    def resolve_dns(self, dns, hierarchical=False):
+        elem = ET.Element("configResolveDns", inHierarchical=str(hierarchical).lower())
+        in_dns = ET.SubElement(elem, "inDns")
+        for dn in dns:
+            ET.SubElement(in_dns, "dn", value=dn)
+        out = yield self.call(elem)
+        raise Return(self.mos(out))
+
+    def conf_mos(self, mos):
+        """
+        Create or change managed objects made with the SDK of the platform in one configConfMos.
+        It is not sent again on network errors.
+        :return: the managed objects as the domain has them now.
+        """
+        codec = self.codec()
+        elem = ET.Element("configConfMos", inHierarchical="false")
+        configs = ET.SubElement(elem, "inConfigs")
+        for mo in mos:
+            ET.SubElement(configs, "pair", key=mo.dn).append(ET.fromstring(codec.to_xml_str(mo.to_xml())))
+        out = yield self.call(elem, retry=False)
+        configs = out.find("outConfigs")
+        pairs = [ET.tostring(p[0]) for p in (configs if configs is not None else []) if len(p)]
+        raise Return([codec.from_xml_str(p) for p in pairs])
+
+    def logout(self):
+        if self.cookie is None:
+            return
+        cookie, self.cookie = self.cookie, None
+        try:
+            yield self.request(ET.Element("aaaLogout", inCookie=cookie), False)
+        except (KubamError, socket.error, HTTPError) as e:
+            log.warning("logging out of %s failed: %s", self.domain[1], e)
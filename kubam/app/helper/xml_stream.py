@@ -0,0 +1,105 @@
+import xml.etree.cElementTree as cET
+from domain_cache import DomainCache
+from domain_guard import DomainGuard
+from query_cache import QueryCache
+from xml_engine import XmlApiError
+
+
+class XmlStream(object):
+    """
+    Class queries decoded while the response is read, for the large ones like every blade or
+    every disk of a UCS Central.  Instead of the SDK's document and a managed object per element,
+    each element becomes a record of the whitelisted properties as soon as it has been read and
+    is then dropped, so memory is bounded by the records and not by the response.
+    """
+    # (XML property, record key) of servers, as server_to_api has them.
+    SERVER_FIELDS = [
+        ("dn", "dn"), ("usrLbl", "label"), ("chassisId", "chassis_id"), ("model", "model"),
+        ("association", "association"), ("assignedToDn", "service_profile"), ("operPower", "oper_power"),
+        ("memorySpeed", "ram_speed"), ("totalMemory", "ram"), ("numOfCpus", "num_cpus"), ("numOfCores", "num_cores"),
+    ]
+    DISK_FIELDS = [
+        ("dn", "dn"), ("id", "id"), ("model", "model"), ("vendor", "vendor"), ("serial", "serial"),
+        ("size", "size"), ("diskState", "disk_state"), ("connectionProtocol", "connection_protocol"),
+        ("deviceType", "device_type"), ("operability", "operability"), ("presence", "presence"),
+        ("linkSpeed", "link_speed"),
+    ]
+    # FSM status of servers, as UCSMonitor.get_status has it.
+    FSM_FIELDS = [
+        ("dn", "dn"), ("fsmStatus", "fsm_status"), ("sacl", "sacl"), ("currentFsm", "current_fsm"),
+        ("progress", "progress"), ("completionTime", "completion_time"),
+    ]
+
+    @staticmethod
+    def iter_attributes(source, class_id):
+        """
+        The properties of every class_id element of the configResolveClass response read from
+        source, a file.  An error response raises XmlApiError.
+        """
+        wanted = class_id.lower()
+        parents = []
+        for event, elem in cET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if not parents and elem.get("errorCode"):
+                    raise XmlApiError(elem.get("errorCode"), elem.get("errorDescr", ""))
+                parents.append(elem)
+                continue
+            parents.pop()
+            if elem.tag.lower() == wanted:
+                yield dict(elem.attrib)
+                # the elements read so far, this one with what it contains, are not needed again.
+                if parents:
+                    parents[-1].clear()
+
+    @staticmethod
+    def post_class(handle, platform, class_id, filter_str=None):
+        """
+        Send a configResolveClass through the handle of the platform.
+        :return: the response, a file to read it from.
+        """
+        if platform == "ucsc":
+            from ucscsdk import ucscxmlcodec as xc
+            from ucscsdk.ucsccoreutils import find_class_id_in_mo_meta_ignore_case
+            from ucscsdk.ucscfilter import generate_infilter
+            from ucscsdk.ucscmethodfactory import config_resolve_class
+        else:
+            from ucsmsdk import ucsxmlcodec as xc
+            from ucsmsdk.ucscoreutils import find_class_id_in_mo_meta_ignore_case
+            from ucsmsdk.ucsfilter import generate_infilter
+            from ucsmsdk.ucsmethodfactory import config_resolve_class
+        meta_class_id = find_class_id_in_mo_meta_ignore_case(class_id)
+        in_filter = None
+        if filter_str:
+            in_filter = generate_infilter(meta_class_id or class_id, filter_str, meta_class_id is not None)
+        elem = config_resolve_class(cookie=handle.cookie, class_id=meta_class_id or class_id, in_filter=in_filter,
+                                    in_hierarchical=False)
+        domain = DomainCache.of(handle)
+        post = lambda: handle.post_xml(xc.to_xml_str(elem), read=False)
+        if domain is None:
+            return post()
+        return DomainGuard.of(domain).call(post, retry=True)
+
+    @staticmethod
+    def iter_records(handle, platform, class_id, fields, filter_str=None):
+        """
+        The objects of a class as records of fields, each one as soon as it has been read.  The
+        query is sent when the first record is asked for and is not cached.
+        """
+        response = XmlStream.post_class(handle, platform, class_id, filter_str)
+        try:
+            for attrs in XmlStream.iter_attributes(response, class_id):
+                yield dict((key, attrs.get(prop)) for prop, key in fields)
+        finally:
+            response.close()
+
+    @staticmethod
+    def records(handle, platform, class_id, fields, filter_str=None):
+        """
+        The objects of a class as records of fields, cached like the queries of the handle.
+        """
+        load = lambda: list(XmlStream.iter_records(handle, platform, class_id, fields, filter_str))
+        domain = DomainCache.of(handle)
+        if domain is None:
+            return load()
+        return QueryCache.get((domain, "records", repr((class_id.lower(), filter_str, fields))),
+                              class_id.lower(), load)
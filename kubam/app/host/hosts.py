@@ -1,6 +1,6 @@
 from flask import jsonify, request, Blueprint
 from flask_cors import cross_origin
-from db import YamlDB
+from db import YamlDB, config_cached
 from config import Const
 
 hosts = Blueprint("hosts", __name__)
@@ -67,6 +67,7 @@ class Hosts(object):
 
 @hosts.route(Const.API_ROOT2 + "/hosts", methods=['GET', 'POST', 'PUT', 'DELETE'])
 @cross_origin()
+@config_cached
 def host_handler():
     if request.method == 'POST':
         j, rc = Hosts.create_hosts(request.json)
@@ -1,3 +1,6 @@
-from imc_session import IMCSession
-from imc_util import IMCUtil
-from imc_server import IMCServer
+from helper import LazyClass
+
+# imcsdk is only imported once one of these is used.
+IMCSession = LazyClass(__name__, "imc_session", "IMCSession")
+IMCUtil = LazyClass(__name__, "imc_util", "IMCUtil")
+IMCServer = LazyClass(__name__, "imc_server", "IMCServer")
@@ -1,6 +1,6 @@
 from imcsdk.imchandle import ImcHandle, ImcException
 from imcsdk.imcexception import ImcOperationError
-from helper import KubamError
+from helper import KubamError, DomainCache, DomainGuard
 import socket
 from urllib2 import HTTPError
 
@@ -18,21 +18,31 @@ class IMCSession(object):
             return None
         return "Unsupported UCS firmware version: {0}. Please update to at least 3.0".format(version)
     # Get the current firmware version.  Returns something like: 3.1(2b)
-    def login(self, username, password, server):
+    # A port other than 443 is spoken to over plain http.
+    def login(self, username, password, server, port=None):
         # Test if the server reachable
+        port = int(port or 443)
+        guard = DomainGuard.of(DomainCache.domain("imc", server, port))
+        msg = guard.check()
+        if msg:
+            return None, msg
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.settimeout(10)
         try:
-            result = s.connect_ex((server, 443))
+            result = s.connect_ex((server, port))
             if result != 0:
-                return None, "{0} on port 443 is not reachable".format(server)
+                guard.failure()
+                return None, "{0} on port {1} is not reachable".format(server, port)
             s.close()
         except socket.error as err:
+            guard.failure()
             return None, "IMC Login Error: {0} {1}".format(server, err.strerror)
 
-        handle = ImcHandle(server, username, password, auto_refresh=True, force=True)
+        handle = ImcHandle(server, username, password, port=port, secure=port == 443, auto_refresh=True, force=True)
         try:
-            handle.login()
+            guard.call(handle.login, retry=True)
+        except KubamError as err:
+            return None, str(err)
         except ImcException as err:
             print "Login Error: " + err.error_descr
             return None, err.error_descr
@@ -45,7 +55,8 @@ class IMCSession(object):
             return None, "Issue logging in. Please check that all parameters are correct."
         #TODO: get the right version of IMC firmware.  Tested on 3.0(4a)
         #msg = self.ensure_version(handle)
-        return handle, None
+        handle.kubam_domain = guard.domain
+        return guard.instrument_handle(handle), None
 
     @staticmethod
     def logout(handle):
@@ -1,8 +1,11 @@
+import time
 from imcsdk.imcexception import ImcException
 from imc_session import IMCSession
 from db import YamlDB
 from config import Const
 from helper import KubamError
+from metrics import Metrics
+from tracing import Tracer
 
 
 class IMCUtil(object):
@@ -23,11 +26,15 @@ class IMCUtil(object):
                 if err == 1:
                     raise KubamError(msg)
 
-                h, msg = imc_session.login(credentials['user'], password, credentials['ip'])
+                start = time.time()
+                h, msg = imc_session.login(credentials['user'], password, credentials['ip'], credentials.get('port'))
+                Metrics.observe("kubam_login_seconds", time.time() - start, platform="imc",
+                                server_group=server_group.get("name", ""), result="error" if msg or not h else "ok")
                 if msg:
                     raise KubamError(msg)
                 if h:
-                    return h
+                    h = Metrics.instrument_handle(h, "imc", server_group.get("name", ""))
+                    return Tracer.instrument_handle(h)
                 else:
                     raise KubamError("Not logged in into IMC")
             else:
@@ -62,7 +69,7 @@ class IMCUtil(object):
         if ip == "":
             raise KubamError("Please enter a valid IMCM IP address.")
         imc_session = IMCSession()
-        h, err = imc_session.login(user, pw, ip)
+        h, err = imc_session.login(user, pw, ip, request['credentials'].get('port'))
         if not h:
             raise KubamError(err)
         IMCSession.logout(h)
@@ -1,8 +1,8 @@
 from flask import Blueprint, jsonify, request
 from flask_cors import cross_origin
-from db import YamlDB
+from db import YamlDB, config_cached
 from config import Const
-from autoinstall import Builder, IsoMaker
+from autoinstall import Builder, IsoMaker, IsoCatalog
 
 isos = Blueprint("isos", __name__)
 
@@ -11,10 +11,14 @@ isos = Blueprint("isos", __name__)
 @isos.route(Const.API_ROOT + "/isos", methods=['GET'])
 @cross_origin()
 def get_isos():
-    err, iso_images = IsoMaker.list_isos("/kubam")
+    """
+    List the ISO images in /kubam.  'isos' keeps the plain list of names, 'catalog' has
+    the size, hash, detected OS and extraction state of each one.
+    """
+    err, msg, catalog = IsoCatalog().refresh()
     if err != 0:
-        return jsonify({'error': iso_images})
-    return jsonify({'isos': iso_images}), 200
+        return jsonify({'error': msg})
+    return jsonify({'isos': [x['name'] for x in catalog], 'catalog': catalog}), 200
 
 
 
@@ -45,6 +49,7 @@ def mkboot_iso():
 # Map the ISO images to OS versions
 @isos.route(Const.API_ROOT + "/isos/map", methods=['GET'])
 @cross_origin()
+@config_cached
 def get_iso_map():
     db = YamlDB()
     err, msg, iso_images = db.get_iso_map(Const.KUBAM_CFG)
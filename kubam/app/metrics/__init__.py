@@ -0,0 +1,2 @@
+from registry import Metrics
+from metrics import metrics
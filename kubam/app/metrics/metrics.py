@@ -0,0 +1,34 @@
+import time
+from flask import Blueprint, Response, g, request
+from registry import Metrics
+
+metrics = Blueprint("metrics", __name__)
+
+
+@metrics.before_app_request
+def start_request():
+    g.metrics_start = time.time()
+    Metrics.inc("kubam_http_requests_in_flight")
+
+
+@metrics.after_app_request
+def end_request(response):
+    if "metrics_start" in g:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        Metrics.observe(
+            "kubam_http_request_duration_seconds", time.time() - g.metrics_start,
+            route=route, method=request.method, status=response.status_code
+        )
+    return response
+
+
+@metrics.teardown_app_request
+def teardown_request(exc):
+    if "metrics_start" in g:
+        Metrics.inc("kubam_http_requests_in_flight", -1)
+
+
+# Prometheus scrape endpoint
+@metrics.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(Metrics.render(), mimetype="text/plain; version=0.0.4")
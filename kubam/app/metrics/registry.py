@@ -0,0 +1,124 @@
+import time
+import threading
+from contextlib import contextmanager
+
+
+class Metrics(object):
+    """
+    Process wide registry of counters, gauges and histograms rendered in the Prometheus
+    text exposition format by the /metrics endpoint.
+    """
+    lock = threading.Lock()
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    SLOW_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0)
+    # name: (type, help, buckets)
+    DEFINITIONS = {
+        "kubam_http_request_duration_seconds": (
+            "histogram", "API request latency by route, method and status.", BUCKETS),
+        "kubam_http_requests_in_flight": (
+            "gauge", "API requests currently being served.", None),
+        "kubam_login_seconds": (
+            "histogram", "UCSM, UCS Central and IMC login time by platform, server group and result.", BUCKETS),
+        "kubam_sdk_call_seconds": (
+            "histogram", "UCS SDK query and commit latency by platform, server group and call.", BUCKETS),
+        "kubam_sdk_call_errors_total": (
+            "counter", "UCS SDK calls that raised an exception.", None),
+        "kubam_query_cache_total": (
+            "counter", "UCS queries answered from the query cache, waited for or sent, by result.", None),
+        "kubam_config_seconds": (
+            "histogram", "Time spent parsing and writing kubam.yaml.", BUCKETS),
+        "kubam_image_build_seconds": (
+            "histogram", "Duration of the image build stages.", SLOW_BUCKETS),
+        "kubam_deploy_stage_seconds": (
+            "histogram", "Duration of the deploy pipeline tasks by stage and result.", SLOW_BUCKETS),
+    }
+    SDK_CALLS = ["query_classid", "query_dn", "query_dns", "query_children", "commit", "process_xml_elem", "rawXML"]
+    values = {}
+
+    @staticmethod
+    def labels_key(labels):
+        return tuple(sorted(labels.items()))
+
+    @staticmethod
+    def inc(name, amount=1, **labels):
+        key = (name, Metrics.labels_key(labels))
+        with Metrics.lock:
+            Metrics.values[key] = Metrics.values.get(key, 0) + amount
+
+    @staticmethod
+    def observe(name, value, **labels):
+        buckets = Metrics.DEFINITIONS[name][2]
+        key = (name, Metrics.labels_key(labels))
+        with Metrics.lock:
+            h = Metrics.values.get(key)
+            if h is None:
+                h = Metrics.values[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, b in enumerate(buckets):
+                if value <= b:
+                    h["buckets"][i] += 1
+            h["sum"] += value
+            h["count"] += 1
+
+    @staticmethod
+    @contextmanager
+    def timer(name, **labels):
+        start = time.time()
+        try:
+            yield
+        finally:
+            Metrics.observe(name, time.time() - start, **labels)
+
+    @staticmethod
+    def timed(fn, platform, server_group, call):
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                Metrics.inc("kubam_sdk_call_errors_total", platform=platform, server_group=server_group, call=call)
+                raise
+            finally:
+                Metrics.observe("kubam_sdk_call_seconds", time.time() - start,
+                                platform=platform, server_group=server_group, call=call)
+        return wrapper
+
+    @staticmethod
+    def instrument_handle(handle, platform, server_group):
+        """
+        Time every query and commit made through this SDK handle.
+        """
+        for call in Metrics.SDK_CALLS:
+            if hasattr(handle, call):
+                setattr(handle, call, Metrics.timed(getattr(handle, call), platform, server_group, call))
+        return handle
+
+    @staticmethod
+    def format_labels(labels, extra=None):
+        items = list(labels) + (extra or [])
+        if not items:
+            return ""
+        escape = lambda v: str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        return "{" + ",".join("{0}=\"{1}\"".format(k, escape(v)) for k, v in items) + "}"
+
+    @staticmethod
+    def render():
+        with Metrics.lock:
+            values = dict((k, v if not isinstance(v, dict) else dict(v, buckets=list(v["buckets"])))
+                          for k, v in Metrics.values.items())
+        lines = []
+        for name in sorted(Metrics.DEFINITIONS):
+            kind, text, buckets = Metrics.DEFINITIONS[name]
+            lines.append("# HELP {0} {1}".format(name, text))
+            lines.append("# TYPE {0} {1}".format(name, kind))
+            for (n, labels), v in sorted(values.items()):
+                if n != name:
+                    continue
+                if kind != "histogram":
+                    lines.append("{0}{1} {2}".format(name, Metrics.format_labels(labels), v))
+                    continue
+                for b, count in zip(buckets, v["buckets"]):
+                    lines.append("{0}_bucket{1} {2}".format(name, Metrics.format_labels(labels, [("le", b)]), count))
+                lines.append("{0}_bucket{1} {2}".format(name, Metrics.format_labels(labels, [("le", "+Inf")]), v["count"]))
+                lines.append("{0}_sum{1} {2}".format(name, Metrics.format_labels(labels), v["sum"]))
+                lines.append("{0}_count{1} {2}".format(name, Metrics.format_labels(labels), v["count"]))
+        return "\n".join(lines) + "\n"
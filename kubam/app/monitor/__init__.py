@@ -1,2 +1,4 @@
 from monitor import monitor
 from monitor import ucsc_fsm, ucs_fsm
+from fleet import FleetStatus
+from inventory import Inventory
@@ -0,0 +1,162 @@
+from collections import OrderedDict
+from config import Const
+from db import YamlDB
+from helper import KubamError, XmlEngine, XmlSession, Return, server_name
+from ucs import UCSUtil, UCSServer
+from ucsc import UCSCUtil, UCSCServer
+
+
+class FleetStatus(object):
+    """
+    The servers of every UCS Manager and UCS Central server group, asked for from all the domains
+    at once by one XmlEngine instead of one login after the other.
+    """
+    # the util and server classes of each platform, looked up when used so the SDKs load on use.
+    PLATFORMS = {
+        "ucsm": (UCSUtil, UCSServer),
+        "ucsc": (UCSCUtil, UCSCServer),
+    }
+    # (XML property, key) of what identifies a server, the ports of its adapters and the vNICs
+    # of service profiles.
+    IDENTITY_FIELDS = [
+        ("dn", "dn"), ("serial", "serial"), ("uuid", "uuid"), ("model", "model"),
+        ("association", "association"), ("assignedToDn", "service_profile"),
+    ]
+    PORT_FIELDS = [("dn", "dn"), ("mac", "mac")]
+    VNIC_FIELDS = [("dn", "dn"), ("name", "name"), ("addr", "mac")]
+    # the columns of the CSV export of the identities.
+    IDENTITY_COLUMNS = ["server_group", "kind", "server", "dn", "serial", "uuid", "model", "association",
+                        "service_profile", "macs", "vnics", "error"]
+
+    @staticmethod
+    def server_groups():
+        err, msg, groups = YamlDB().list_server_group(Const.KUBAM_CFG)
+        if err != 0:
+            raise KubamError(msg)
+        return [sg for sg in groups or [] if sg.get("type") in FleetStatus.PLATFORMS]
+
+    @staticmethod
+    def session(sg):
+        """
+        :return: (error, XmlSession of the server group)
+        """
+        credentials = sg.get("credentials", {})
+        try:
+            err, msg, password = YamlDB().decrypt_password(credentials.get("password", ""))
+        except Exception as e:
+            err, msg = 1, "can't decrypt the password of {0}: {1}".format(sg["name"], e)
+        if err != 0:
+            return msg, None
+        return None, XmlSession(sg["type"], credentials.get("ip"), credentials.get("user"), password,
+                                credentials.get("port"))
+
+    @staticmethod
+    def sg_servers(sg):
+        """
+        Coroutine listing the blades and rack servers of a server group.
+        :return: (error, servers as the server API has them)
+        """
+        util, server = FleetStatus.PLATFORMS[sg["type"]]
+        err, session = FleetStatus.session(sg)
+        if err:
+            raise Return((err, None))
+        try:
+            blades, racks = yield [session.resolve_class("computeBlade"), session.resolve_class("computeRackUnit")]
+        except KubamError as e:
+            raise Return((e.msg, None))
+        except Exception as e:
+            raise Return(("{0} is not reachable: {1}".format(sg.get("credentials", {}).get("ip"), e), None))
+        finally:
+            yield session.logout()
+        raise Return((None, [s for s in (server.server_to_api(mo) for mo in blades + racks) if s]))
+
+    @staticmethod
+    def sg_identities(sg):
+        """
+        Coroutine getting what identifies each server of a server group, with one query per class.
+        :return: (error, identity records as in identities)
+        """
+        err, session = FleetStatus.session(sg)
+        if err:
+            raise Return((err, None))
+        try:
+            blades, racks, ports, vnics = yield [
+                session.resolve_records("computeBlade", FleetStatus.IDENTITY_FIELDS),
+                session.resolve_records("computeRackUnit", FleetStatus.IDENTITY_FIELDS),
+                session.resolve_records("adaptorHostEthIf", FleetStatus.PORT_FIELDS),
+                session.resolve_records("vnicEther", FleetStatus.VNIC_FIELDS),
+            ]
+        except KubamError as e:
+            raise Return((e.msg, None))
+        except Exception as e:
+            raise Return(("{0} is not reachable: {1}".format(sg.get("credentials", {}).get("ip"), e), None))
+        finally:
+            yield session.logout()
+        # the ports by server and the vNICs by service profile.
+        server_macs = {}
+        for p in ports:
+            server_macs.setdefault(p["dn"].split("/adaptor-")[0], []).append(p["mac"])
+        profile_vnics = {}
+        for v in vnics:
+            profile_vnics.setdefault(v["dn"].rsplit("/ether-", 1)[0], {})[v["name"]] = v["mac"]
+        records = []
+        for s in blades + racks:
+            kind, name = server_name(s["dn"], sg["type"] == "ucsc")
+            records.append(dict(s, server_group=sg["name"], kind=kind, server=name,
+                                macs=sorted(server_macs.get(s["dn"], [])),
+                                vnics=profile_vnics.get(s["service_profile"], {}) if s["service_profile"] else {}))
+        raise Return((None, records))
+
+    @staticmethod
+    def servers():
+        """
+        :return: server group name -> (server group, error, servers) for every UCS server group.
+        """
+        groups = FleetStatus.server_groups()
+        results = XmlEngine().run([FleetStatus.sg_servers(sg) for sg in groups])
+        return OrderedDict((sg["name"], (sg, r[0], r[1])) for sg, r in zip(groups, results))
+
+    @staticmethod
+    def status():
+        """
+        :return: server group name -> its servers by kind and name, or the error getting them.
+        """
+        out = OrderedDict()
+        for name, (sg, err, servers) in FleetStatus.servers().items():
+            util = FleetStatus.PLATFORMS[sg["type"]][0]
+            out[name] = {"error": err} if err else {"servers": util.dn_hash_to_out(dict((s["dn"], s) for s in servers))}
+        return out
+
+    @staticmethod
+    def powerstat():
+        """
+        :return: server group name -> the power state of its servers, or the error getting them.
+        """
+        out = OrderedDict()
+        for name, (sg, err, servers) in FleetStatus.servers().items():
+            util = FleetStatus.PLATFORMS[sg["type"]][0]
+            out[name] = {"error": err} if err else util.objects_to_servers(servers, ["oper_power"])
+        return out
+
+    @staticmethod
+    def identities():
+        """
+        The serial, UUID, adapter MACs and service profile with its vNIC MACs of every server of
+        every UCS server group, asked for from all the domains at once.  A server group that could
+        not be asked has one {"server_group", "error"} record instead.
+        """
+        groups = FleetStatus.server_groups()
+        results = XmlEngine().run([FleetStatus.sg_identities(sg) for sg in groups])
+        out = []
+        for sg, (err, records) in zip(groups, results):
+            out.extend([{"server_group": sg["name"], "error": err}] if err else records)
+        return out
+
+    @staticmethod
+    def identity_row(record):
+        """
+        An identity record as a CSV row of IDENTITY_COLUMNS, the MACs separated by spaces.
+        """
+        row = dict(record, macs=" ".join(record.get("macs", [])),
+                   vnics=" ".join("{0}={1}".format(k, v) for k, v in sorted(record.get("vnics", {}).items())))
+        return [row.get(c) for c in FleetStatus.IDENTITY_COLUMNS]
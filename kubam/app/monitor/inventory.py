@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import logging
+import threading
+from config import Const
+from helper import KubamError, QueryCache, XmlStream, server_name
+from ucs import UCSUtil, UCSServer, UCSMonitor
+from ucsc import UCSCUtil, UCSCServer, UCSCMonitor
+
+log = logging.getLogger("kubam.inventory")
+
+
+class Inventory(object):
+    """
+    The last known inventory of each UCS server group: its servers with their power, association,
+    FSM status and disks.  It is written to the kubam directory after every refresh and read back
+    when KUBAM starts, so it can be served at once, with its age, while a refresh runs in the
+    background.
+    """
+    lock = threading.Lock()
+    # snapshot file: {"snapshot", "thread" refreshing it, "error" of the last refresh}
+    groups = {}
+    # the util, login and logout, server and monitor classes of each platform, and whether the
+    # server names include the domain.  Looked up on refresh so the SDKs load on use.
+    PLATFORMS = {
+        "ucsm": (UCSUtil, "ucs_login", "ucs_logout", UCSServer, UCSMonitor, False),
+        "ucsc": (UCSCUtil, "ucsc_login", "ucsc_logout", UCSCServer, UCSCMonitor, True),
+    }
+
+    @staticmethod
+    def directory():
+        return os.path.join(Const.KUBAM_DIR, ".inventory")
+
+    @staticmethod
+    def path(name):
+        return os.path.join(Inventory.directory(), name + ".json")
+
+    @staticmethod
+    def load(path):
+        try:
+            with open(path, "r") as f:
+                snapshot = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if not isinstance(snapshot, dict) or "refreshed" not in snapshot:
+            return None
+        return snapshot
+
+    @staticmethod
+    def save(path, snapshot):
+        tmp_file = path + ".tmp"
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(tmp_file, "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.rename(tmp_file, path)
+        except (IOError, OSError) as err:
+            return 1, "{0} {1}".format(err.strerror, path)
+        return 0, None
+
+    @staticmethod
+    def group(path):
+        """
+        The state kept for a snapshot file, read from it the first time.  Call with the lock held.
+        """
+        group = Inventory.groups.get(path)
+        if group is None:
+            group = Inventory.groups[path] = {"snapshot": Inventory.load(path), "thread": None, "error": None}
+        return group
+
+    @staticmethod
+    def warm():
+        """
+        Read every saved snapshot, on start.
+        :return: the number of snapshots read.
+        """
+        try:
+            files = [f for f in os.listdir(Inventory.directory()) if f.endswith(".json")]
+        except OSError:
+            return 0
+        with Inventory.lock:
+            for f in files:
+                Inventory.group(os.path.join(Inventory.directory(), f))
+        return len(files)
+
+    @staticmethod
+    def collect(sg, handle):
+        """
+        :return: the inventory of the server group, from the domain and not from the query cache.
+        """
+        util, login, logout, server, monitor, domains = Inventory.PLATFORMS[sg["type"]]
+        with QueryCache.fresh():
+            servers = server.list_servers(handle)
+            # the disks of every server in one query, rather than one per server.
+            disks = {}
+            for d in XmlStream.records(handle, sg["type"], "storageLocalDisk", XmlStream.DISK_FIELDS):
+                disks.setdefault(d["dn"].split("/board/")[0], []).append(d)
+            fsms = monitor.fsm_status(handle, servers)
+        out = {"blades": {}, "rack_servers": {}}
+        for s in servers:
+            kind, name = server_name(s["dn"], domains)
+            out[kind][name] = dict(s, fsm=fsms.get(s["dn"]), disks=disks.get(s["dn"], []))
+        return {"server_group": sg["name"], "type": sg["type"], "refreshed": time.time(), "servers": out}
+
+    @staticmethod
+    def refresh(sg):
+        """
+        Take the inventory of the server group and save it.
+        :return: (err, msg)
+        """
+        if sg["type"] not in Inventory.PLATFORMS:
+            return 1, "server group {0} is not a supported type".format(sg["type"])
+        util, login, logout = Inventory.PLATFORMS[sg["type"]][:3]
+        path = Inventory.path(sg["name"])
+        try:
+            handle = getattr(util, login)(sg)
+            try:
+                snapshot = Inventory.collect(sg, handle)
+            finally:
+                getattr(util, logout)(handle)
+        except Exception as e:
+            msg = e.msg if isinstance(e, KubamError) else str(e)
+            log.warning("taking the inventory of %s failed: %s", sg["name"], msg)
+            with Inventory.lock:
+                Inventory.group(path)["error"] = msg
+            return 1, msg
+        err, msg = Inventory.save(path, snapshot)
+        if err != 0:
+            log.warning("saving the inventory of %s failed: %s", sg["name"], msg)
+        with Inventory.lock:
+            group = Inventory.group(path)
+            group["snapshot"] = snapshot
+            group["error"] = None
+        return 0, None
+
+    @staticmethod
+    def background(sg, path):
+        try:
+            Inventory.refresh(sg)
+        finally:
+            with Inventory.lock:
+                Inventory.group(path)["thread"] = None
+
+    @staticmethod
+    def get(sg):
+        """
+        The last known inventory of the server group, with how old it is.  One older than
+        Const.INVENTORY_SECONDS, or none at all, is refreshed in the background.
+        :return: (the snapshot with its age, or None while there is none yet, {"refreshing", "error"
+        of the last refresh})
+        """
+        if sg["type"] not in Inventory.PLATFORMS:
+            raise KubamError("server group {0} is not a supported type".format(sg["type"]))
+        path = Inventory.path(sg["name"])
+        with Inventory.lock:
+            group = Inventory.group(path)
+            snapshot = group["snapshot"]
+            age = None if snapshot is None else max(0.0, time.time() - snapshot["refreshed"])
+            stale = age is None or age > Const.INVENTORY_SECONDS
+            if stale and group["thread"] is None:
+                group["thread"] = threading.Thread(target=Inventory.background, args=(sg, path),
+                                                   name="inventory " + sg["name"])
+                group["thread"].daemon = True
+                group["thread"].start()
+            state = {"refreshing": group["thread"] is not None, "error": group["error"]}
+        if snapshot is None:
+            return None, state
+        return dict(snapshot, age=round(age, 1), stale=stale), state
@@ -1,14 +1,56 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 from flask_cors import cross_origin
 from ucs import UCSUtil, UCSMonitor, UCSServer
 from ucsc import UCSCUtil, UCSCMonitor, UCSCServer
 from db import YamlDB
 from config import Const
-from helper import KubamError
+from helper import KubamError, wants_ndjson, server_records, ndjson_response
+from watcher import Watcher
+from fleet import FleetStatus
+from inventory import Inventory
 
 monitor = Blueprint("monitor", __name__)
 
 
+# Get the status of the servers of every server group at once
+@monitor.route(Const.API_ROOT2 + "/servers/status", methods=["GET"])
+@cross_origin()
+def get_fleet_status():
+    """
+    The status of the servers of every UCS Manager and UCS Central server group, asked for from
+    all the domains at once.  A server group that could not be asked has an error instead:
+    { server_groups: { ucs01: { servers: { blades: {...}, rack_servers: {...} }}, ucs02: { error: ...}}}
+    """
+    try:
+        out = FleetStatus.status()
+    except KubamError as e:
+        return jsonify({"error": str(e)}), Const.HTTP_SERVER_ERROR
+    return jsonify({"server_groups": out}), Const.HTTP_OK
+
+
+# Get the last known inventory of a server group without waiting for UCS
+@monitor.route(Const.API_ROOT2 + "/servers/<server_group>/inventory", methods=["GET"])
+@cross_origin()
+def get_server_inventory(server_group):
+    """
+    The servers of the server group with their power, association, FSM status and disks as they
+    were last seen, and how many seconds ago that was:
+    { server_group: ucs01, refreshed: 1539000000.0, age: 12.5, stale: false, refreshing: false,
+      servers: { blades: { 1/1: { oper_power: off, fsm: {...}, disks: [...], ...}}, rack_servers: {...}}}
+    A stale inventory is refreshed in the background.  Until there is one the answer is 202 with
+    { refreshing: true }.
+    """
+    try:
+        db = YamlDB()
+        sg = db.get_server_group(Const.KUBAM_CFG, server_group)
+        snapshot, state = Inventory.get(sg)
+    except KubamError as e:
+        return jsonify({"error": str(e)}), Const.HTTP_BAD_REQUEST
+    if snapshot is None:
+        return jsonify(state), Const.HTTP_ACCEPTED
+    return jsonify(dict(snapshot, **state)), Const.HTTP_OK
+
+
 # Get the overall status of the server from UCSM FSM
 @monitor.route(Const.API_ROOT2 + "/servers/<server_group>/status", methods=["GET"])
 @cross_origin()
@@ -18,6 +60,8 @@ def get_server_status(server_group):
     Expects { servers: { blade: [ 1/1, 1/2, ...], rack_server: [ 1, 2, 3] }}
     (with quotes of course for proper json)
     if nothing is passed, returns everything. 
+    With ?stream=ndjson (or Accept: application/x-ndjson) each server is streamed as a
+    {"kind": "blades", "server": "1/1", "status": {...}} line.
     """
     wanted = "all"
     try:
@@ -48,9 +92,10 @@ def get_server_status_ucsm(sg, wanted):
         return jsonify({"error": str(e)}), Const.HTTP_BAD_REQUEST
 
     try:
-        all_servers = UCSServer.list_servers(handle)
-        if not wanted == "all":
-            all_servers = UCSUtil.servers_to_objects(all_servers, wanted)
+        if wants_ndjson():
+            all_servers = UCSServer.stream_selected_servers(handle, wanted)
+            return ndjson_response(server_records(all_servers, "status"), lambda: UCSUtil.ucs_logout(handle))
+        all_servers = UCSServer.list_selected_servers(handle, wanted)
         # put in dn name format
         status = {}
         for i in all_servers:
@@ -70,9 +115,11 @@ def get_server_status_ucsc(sg, wanted):
         return jsonify({"error": str(e)}), Const.HTTP_BAD_REQUEST
 
     try:
-        all_servers = UCSCServer.list_servers(handle)
-        if not wanted == "all":
-            all_servers = UCSCUtil.servers_to_objects(all_servers, wanted)
+        if wants_ndjson():
+            all_servers = UCSCServer.stream_selected_servers(handle, wanted)
+            return ndjson_response(server_records(all_servers, "status", domains=True),
+                                   lambda: UCSCUtil.ucsc_logout(handle))
+        all_servers = UCSCServer.list_selected_servers(handle, wanted)
         # put in dn name format
         status = {}
         for i in all_servers:
@@ -116,9 +163,12 @@ def ucs_fsm(sg, wanted):
         return jsonify({"error": str(e)}), Const.HTTP_BAD_REQUEST
 
     try:
-        all_servers = UCSServer.list_servers(handle)
-        if not wanted == "all":
-            all_servers = UCSUtil.servers_to_objects(all_servers, wanted)
+        if wants_ndjson():
+            # each server's fsm is fetched as its record is written.
+            all_servers = UCSServer.stream_selected_servers(handle, wanted)
+            return ndjson_response(server_records(all_servers, "fsm", lambda i: UCSMonitor.get_fsm(handle, i)),
+                                   lambda: UCSUtil.ucs_logout(handle))
+        all_servers = UCSServer.list_selected_servers(handle, wanted)
         # put in dn name format
         status = {}
         for i in all_servers:
@@ -142,9 +192,12 @@ def ucsc_fsm(sg, wanted):
         return jsonify({"error": str(e)}), Const.HTTP_BAD_REQUEST
 
     try:
-        all_servers = UCSCServer.list_servers(handle)
-        if not wanted == "all":
-            all_servers = UCSCUtil.servers_to_objects(all_servers, wanted)
+        if wants_ndjson():
+            # each server's fsm is fetched as its record is written.
+            all_servers = UCSCServer.stream_selected_servers(handle, wanted)
+            return ndjson_response(server_records(all_servers, "fsm", lambda i: UCSCMonitor.get_fsm(handle, i),
+                                                  domains=True), lambda: UCSCUtil.ucsc_logout(handle))
+        all_servers = UCSCServer.list_selected_servers(handle, wanted)
         # put in dn name format
         status = {}
         for i in all_servers:
@@ -156,3 +209,22 @@ def ucsc_fsm(sg, wanted):
     
     UCSCUtil.ucsc_logout(handle)
     return jsonify({"servers" : out }), Const.HTTP_OK
+
+
+# Push the install progress of the servers instead of polling status and fsm
+@monitor.route(Const.API_ROOT2 + "/servers/<server_group>/events", methods=["GET"])
+@cross_origin()
+def server_events(server_group):
+    """
+    Server-sent events with the progress of the servers in the server group: a snapshot event
+    with every server first, then power, association, fsm and stage events as they change.
+    All the clients watching a server group share one background poller.
+    """
+    try:
+        db = YamlDB()
+        sg = db.get_server_group(Const.KUBAM_CFG, server_group)
+        watcher, q = Watcher.subscribe(sg)
+    except KubamError as e:
+        return jsonify({"error": str(e)}), Const.HTTP_BAD_REQUEST
+    return Response(Watcher.events(watcher, q), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,194 @@
+import json
+import Queue
+import logging
+import threading
+from collections import OrderedDict
+from config import Const
+from helper import KubamError, DomainCache, QueryCache, server_name
+from ucs import UCSUtil, UCSServer, UCSMonitor
+from ucsc import UCSCUtil, UCSCServer, UCSCMonitor
+
+log = logging.getLogger("kubam.watcher")
+
+
+class Watcher(object):
+    """
+    Polls the servers of one UCS domain on a background thread and pushes what changed, power,
+    association, FSM status and FSM stages, to every client watching a server group of it.  There
+    is one watcher per domain however many server groups point at it and however many clients
+    watch them, it logs in once, with the credentials of a server group still watched, and stops
+    when the last client goes away.
+    """
+    lock = threading.Lock()
+    watchers = {}
+    # the util, login and logout, server and monitor classes of each platform, and whether the
+    # server names include the domain.  Looked up when a watcher starts so the SDKs load on use.
+    PLATFORMS = {
+        "ucsm": (UCSUtil, "ucs_login", "ucs_logout", UCSServer, UCSMonitor, False),
+        "ucsc": (UCSCUtil, "ucsc_login", "ucsc_logout", UCSCServer, UCSCMonitor, True),
+    }
+    QUEUE_SIZE = 1000
+
+    def __init__(self, sg):
+        if sg["type"] not in Watcher.PLATFORMS:
+            raise KubamError("server group {0} is not a supported type".format(sg["type"]))
+        self.key = DomainCache.sg_domain(sg)
+        self.name = "{0} {1}:{2}".format(*self.key)
+        util, login, logout, server, monitor, domains = Watcher.PLATFORMS[sg["type"]]
+        # login, logout, list the servers, get the FSM status of all of them, get the FSM stages of
+        # one, domain names.
+        self.platform = (getattr(util, login), getattr(util, logout), server.list_servers, monitor.fsm_status,
+                         monitor.get_fsm, domains)
+        # server group name: {"sg", "queues" of its clients}
+        self.groups = OrderedDict()
+        self.state = None
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="watch " + self.name)
+        self.thread.daemon = True
+
+    @staticmethod
+    def subscribe(sg):
+        """
+        Start watching the server group, sharing the watcher already running for its domain.
+        :return: (watcher, queue the events are put on)
+        """
+        key = DomainCache.sg_domain(sg)
+        with Watcher.lock:
+            watcher = Watcher.watchers.get(key)
+            if watcher is None:
+                watcher = Watcher(sg)
+                Watcher.watchers[key] = watcher
+                watcher.thread.start()
+            return watcher, watcher.add(sg)
+
+    def add(self, sg):
+        q = Queue.Queue(Watcher.QUEUE_SIZE)
+        if self.state is not None:
+            q.put(("snapshot", self.snapshot()))
+        self.groups.setdefault(sg["name"], {"sg": sg, "queues": []})["queues"].append(q)
+        return q
+
+    def unsubscribe(self, q):
+        with Watcher.lock:
+            for name, group in self.groups.items():
+                if q in group["queues"]:
+                    group["queues"].remove(q)
+                if not group["queues"]:
+                    del self.groups[name]
+            if not self.groups:
+                self.wakeup.set()
+
+    def subscribers(self):
+        return [q for group in self.groups.values() for q in group["queues"]]
+
+    def publish(self, event, data):
+        for q in self.subscribers():
+            try:
+                q.put_nowait((event, data))
+            except Queue.Full:
+                # a client that doesn't read misses events rather than holding up the others.
+                pass
+
+    def snapshot(self):
+        return [dict(s, server=name) for name, s in sorted(self.state.items())]
+
+    def poll(self, handle):
+        """
+        :return: server name -> its power, association, FSM status and, while an FSM runs, its stages.
+        """
+        login, logout, list_servers, fsm_status, get_fsm, domains = self.platform
+        state = {}
+        with QueryCache.fresh():
+            servers = list_servers(handle)
+            fsms = fsm_status(handle, servers)
+        for s in servers:
+            kind, name = server_name(s["dn"], domains)
+            fsm = fsms.get(s["dn"])
+            before = (self.state or {}).get(name, {})
+            stages = {}
+            # stages are only fetched while an FSM runs and once more when it has finished.
+            if fsm and (fsm["fsm_status"] != "nop" or (before.get("fsm") or {}).get("fsm_status", "nop") != "nop"):
+                stages = dict((st["name"], st["stage_status"]) for st in (get_fsm(handle, s) or {}).get("stages", []))
+            state[name] = {"kind": kind, "oper_power": s["oper_power"], "association": s["association"],
+                           "service_profile": s["service_profile"], "fsm": fsm, "stages": stages}
+        return state
+
+    def changes(self, state):
+        """
+        :return: the (event, data) pairs that take the last state to this one.
+        """
+        events = []
+        for name, s in sorted(state.items()):
+            before = self.state.get(name)
+            if before is None:
+                events.append(("server", dict(s, server=name)))
+                continue
+            if s["oper_power"] != before["oper_power"]:
+                events.append(("power", {"server": name, "oper_power": s["oper_power"],
+                                         "was": before["oper_power"]}))
+            if (s["association"], s["service_profile"]) != (before["association"], before["service_profile"]):
+                events.append(("association", {"server": name, "association": s["association"],
+                                               "service_profile": s["service_profile"]}))
+            if s["fsm"] != before["fsm"] and s["fsm"] is not None:
+                events.append(("fsm", dict(s["fsm"], server=name)))
+            for stage, status in sorted(s["stages"].items()):
+                if before["stages"].get(stage) != status:
+                    events.append(("stage", {"server": name, "name": stage, "stage_status": status}))
+        for name in sorted(set(self.state) - set(state)):
+            events.append(("removed", {"server": name}))
+        return events
+
+    def run(self):
+        login = self.platform[0]
+        handle = None
+        while True:
+            with Watcher.lock:
+                if not self.groups:
+                    del Watcher.watchers[self.key]
+                    break
+                sg = self.groups.values()[0]["sg"]
+            try:
+                if handle is None:
+                    handle = login(sg)
+                state = self.poll(handle)
+                with Watcher.lock:
+                    if self.state is None:
+                        self.state = state
+                        self.publish("snapshot", self.snapshot())
+                    else:
+                        for event, data in self.changes(state):
+                            self.publish(event, data)
+                        self.state = state
+            except Exception as e:
+                log.warning("watching %s failed: %s", self.name, e)
+                self.publish("error", {"error": str(e)})
+                self.logout(handle)
+                handle = None
+            self.wakeup.wait(Const.WATCH_SECONDS)
+            self.wakeup.clear()
+        self.logout(handle)
+
+    def logout(self, handle):
+        if handle is None:
+            return
+        try:
+            self.platform[1](handle)
+        except Exception as e:
+            log.warning("logging out of %s failed: %s", self.name, e)
+
+    @staticmethod
+    def events(watcher, q):
+        """
+        The server-sent events for one client, with a comment line every Const.WATCH_KEEPALIVE
+        seconds so proxies keep the connection open.  Stops watching when the client goes away.
+        """
+        try:
+            while True:
+                try:
+                    event, data = q.get(timeout=Const.WATCH_KEEPALIVE)
+                except Queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "event: {0}\ndata: {1}\n\n".format(event, json.dumps(data))
+        finally:
+            watcher.unsubscribe(q)
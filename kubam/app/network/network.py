@@ -1,6 +1,6 @@
 from flask import jsonify, request, current_app, Blueprint
 from flask_cors import cross_origin
-from db import YamlDB
+from db import YamlDB, config_cached
 from config import Const
 from helper import KubamError
 
@@ -63,6 +63,7 @@ class Network(object):
 
 @networks.route(Const.API_ROOT2 + "/networks", methods=["GET", "POST", "PUT", "DELETE"])
 @cross_origin()
+@config_cached
 def network_handler():
     try:
         if request.method == "GET":
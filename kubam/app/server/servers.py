@@ -3,9 +3,10 @@ from flask_cors import cross_origin
 from ucs import UCSServer, UCSTemplate, UCSUtil
 from ucsc import UCSCServer, UCSCTemplate, UCSCUtil
 from imc import IMCServer, IMCUtil
-from db import YamlDB
+from db import YamlDB, config_cached
 from config import Const
-from helper import KubamError
+from helper import KubamError, DomainCache, wants_ndjson, wants_csv, ndjson_response, csv_response
+from monitor import FleetStatus
 
 
 servers = Blueprint("servers", __name__)
@@ -99,19 +100,30 @@ class Servers(object):
 
 class Templates(object):
     @staticmethod
-    def get_templates(server_group):
-        ucs_templates = []
+    def get_templates(server_group, wanted=None):
+        """
+        The service profile templates of the server group, only logged in for when they are not
+        cached for its domain or the wanted template is not among the cached ones.
+        """
         db = YamlDB()
         sg = db.get_server_group(Const.KUBAM_CFG, server_group)
-        if sg['type'] == "ucsc":
-            handle = UCSCUtil.ucsc_login(sg)
-            ucs_templates = UCSCTemplate.list_templates(handle)
-            UCSCUtil.ucsc_logout(handle)
-        elif sg['type'] == "ucsm":
-            handle = UCSUtil.ucs_login(sg)
-            ucs_templates = UCSTemplate.list_templates(handle)
-            UCSUtil.ucs_logout(handle)
 
+        def load():
+            ucs_templates = []
+            if sg['type'] == "ucsc":
+                handle = UCSCUtil.ucsc_login(sg)
+                ucs_templates = UCSCTemplate.list_templates(handle)
+                UCSCUtil.ucsc_logout(handle)
+            elif sg['type'] == "ucsm":
+                handle = UCSUtil.ucs_login(sg)
+                ucs_templates = UCSTemplate.list_templates(handle)
+                UCSUtil.ucs_logout(handle)
+            return ucs_templates
+        domain = DomainCache.sg_domain(sg)
+        ucs_templates = DomainCache.get(domain, "templates", load)
+        if wanted is not None and not any(t["name"] == wanted for t in ucs_templates):
+            DomainCache.invalidate(domain, "templates")
+            ucs_templates = DomainCache.get(domain, "templates", load)
         return ucs_templates
 
     def list_templates(self, server_group):
@@ -122,13 +134,13 @@ class Templates(object):
         return {"templates": ucs_templates}, Const.HTTP_OK
 
     def update_templates(self, server_group, req):
-        ucs_templates = self.get_templates(server_group)
+        ucs_templates = self.get_templates(server_group, req.get("sp_template") if isinstance(req, dict) else None)
         db = YamlDB()
         msg = db.assign_template(Const.KUBAM_CFG, req, server_group, ucs_templates)
         return {"status": msg}, Const.HTTP_CREATED
 
     def delete_templates(self, server_group, req):
-        ucs_templates = self.get_templates(server_group)
+        ucs_templates = self.get_templates(server_group, req.get("sp_template") if isinstance(req, dict) else None)
         db = YamlDB()
         msg = db.delete_template(Const.KUBAM_CFG, req, server_group, ucs_templates)
         return {"status": msg}, Const.HTTP_NO_CONTENT
@@ -136,6 +148,7 @@ class Templates(object):
 
 @servers.route(Const.API_ROOT2 + "/servers", methods=["GET", "POST", "PUT", "DELETE"])
 @cross_origin()
+@config_cached
 def server_handler():
     try:
         if request.method == "GET":
@@ -188,6 +201,7 @@ def get_servers(server_group):
     1. Make call to UCS to grab the servers. 
     2. Make call to database to see which ones are selected.
     3. Call servers_to_api which merges the two adding 'selected: true' to the servers that are selected.
+    With ?stream=ndjson (or Accept: application/x-ndjson) the servers are streamed one per line.
     """
     db = YamlDB()
     try:
@@ -195,32 +209,34 @@ def get_servers(server_group):
     except KubamError as e:
         return jsonify({"error": str(e)}), Const.HTTP_BAD_REQUEST
 
+    # Gets a hash of severs of form:
+    # {blades: ["1/1", "1/2",..], rack: ["6", "7"]}
+    err, msg, db_servers = db.get_ucs_servers(Const.KUBAM_CFG, server_group)
+    if err != 0:
+        return jsonify({"error": msg}), Const.HTTP_BAD_REQUEST
+
     if sg['type'] == "ucsm":
         try:
             handle = UCSUtil.ucs_login(sg)
         except KubamError as e:
             return jsonify({"error": str(e)}), Const.HTTP_UNAUTHORIZED
-        ucs_servers = UCSServer.list_servers(handle)
-        UCSUtil.ucs_logout(handle)
+        ucs_servers = UCSServer.iter_servers(handle, wants_ndjson())
+        logout = UCSUtil.ucs_logout
     elif sg['type'] == 'ucsc':
         try:
             handle = UCSCUtil.ucsc_login(sg)
         except KubamError as e:
             return jsonify({"error": str(e)}), Const.HTTP_UNAUTHORIZED
-        ucs_servers = UCSCServer.list_servers(handle)
-        UCSCUtil.ucsc_logout(handle)
-
-    # Gets a hash of severs of form:
-    # {blades: ["1/1", "1/2",..], rack: ["6", "7"]}
-    err, msg, db_servers = db.get_ucs_servers(Const.KUBAM_CFG, server_group)
-    if err != 0:
-        return jsonify({"error": msg}), Const.HTTP_BAD_REQUEST
-    if db_servers is None:
-        return jsonify({"servers": ucs_servers})
-
-    ucs_servers = UCSUtil.servers_to_api(ucs_servers, db_servers)
-    if err != 0:
-        return jsonify({"error": msg}), Const.HTTP_BAD_REQUEST
+        ucs_servers = UCSCServer.iter_servers(handle, wants_ndjson())
+        logout = UCSCUtil.ucsc_logout
+
+    if db_servers is not None:
+        ucs_servers = UCSUtil.mark_selected(ucs_servers, db_servers)
+    if wants_ndjson():
+        # one server per line, the handle is logged out when the stream is done.
+        return ndjson_response(ucs_servers, lambda: logout(handle))
+    ucs_servers = list(ucs_servers)
+    logout(handle)
     return jsonify({"servers": ucs_servers}), Const.HTTP_OK
 
 
@@ -418,8 +434,7 @@ def servers_to_objects(handle, servers):
     Get the servers from the API and turn them into the UCS objects
     So we can do operations on them. 
     """
-    ucs_servers = UCSServer.list_servers(handle)
-    return UCSUtil.servers_to_objects(ucs_servers, servers)
+    return UCSServer.list_selected_servers(handle, servers)
     
     
 def ucsc_servers_to_objects(handle, servers):
@@ -427,8 +442,7 @@ def ucsc_servers_to_objects(handle, servers):
     Get the servers from the API and turn them into the UCS objects
     So we can do operations on them. 
     """
-    ucs_servers = UCSCServer.list_servers(handle)
-    return UCSCUtil.servers_to_objects(ucs_servers, servers)
+    return UCSCServer.list_selected_servers(handle, servers)
     
 
 
@@ -526,6 +540,36 @@ def power_operation(server_group, method):
     else:
         return jsonify({"error": "power method {0} is not supported. Use: on, off, hardreset, softreset".format(method)}), Const.HTTP_BAD_REQUEST
 
+@servers.route(Const.API_ROOT2 + "/servers/powerstat", methods=['GET'])
+@cross_origin()
+def fleet_powerstat():
+    """
+    Get the power stat of the servers of every UCS Manager and UCS Central server group at once.
+    """
+    try:
+        powerstat = FleetStatus.powerstat()
+    except KubamError as e:
+        return jsonify({"error": str(e)}), Const.HTTP_SERVER_ERROR
+    return jsonify({"status": powerstat}), Const.HTTP_OK
+
+@servers.route(Const.API_ROOT2 + "/servers/identities", methods=['GET'])
+@cross_origin()
+def fleet_identities():
+    """
+    Export the serial, UUID, adapter MACs and service profile with its vNIC MACs of every server
+    of every UCS Manager and UCS Central server group, one server per line as NDJSON or, with
+    ?format=csv (or Accept: text/csv), as CSV.  A server group that could not be asked has a line
+    with its error instead.
+    """
+    try:
+        records = FleetStatus.identities()
+    except KubamError as e:
+        return jsonify({"error": str(e)}), Const.HTTP_SERVER_ERROR
+    if wants_csv():
+        return csv_response(FleetStatus.IDENTITY_COLUMNS, (FleetStatus.identity_row(r) for r in records),
+                            "identities.csv")
+    return ndjson_response(records)
+
 @servers.route(Const.API_ROOT2 + "/servers/<server_group>/powerstat", methods=['GET'])
 @cross_origin()
 def powerstat(server_group):
@@ -561,9 +605,7 @@ def powerstat_ucsm(sg, wanted_servers):
     except KubamError as e:
         return jsonify({"error": str(e)}), Const.HTTP_UNAUTHORIZED
     try: 
-        powerstat = UCSServer.list_servers(handle)
-        if not wanted_servers == "all":
-            powerstat = UCSUtil.servers_to_objects(powerstat, wanted_servers)
+        powerstat = UCSServer.list_selected_servers(handle, wanted_servers)
         powerstat = UCSUtil.objects_to_servers(powerstat, ["oper_power"])
     except KubamError as e:
         UCSUtil.ucs_logout(handle)
@@ -580,9 +622,7 @@ def powerstat_ucsc(sg, wanted_servers):
     except KubamError as e:
         return jsonify({"error": str(e)}), Const.HTTP_UNAUTHORIZED
     try: 
-        powerstat = UCSCServer.list_servers(handle)
-        if not wanted_servers == "all":
-            powerstat = UCSCUtil.servers_to_objects(powerstat, wanted_servers)
+        powerstat = UCSCServer.list_selected_servers(handle, wanted_servers)
         powerstat = UCSCUtil.objects_to_servers(powerstat, ["oper_power"])
     except KubamError as e:
         UCSCUtil.ucsc_logout(handle)
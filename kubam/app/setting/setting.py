@@ -1,7 +1,7 @@
 from flask import Blueprint, jsonify, request
 from flask_cors import cross_origin
 from config import Const
-from db import YamlDB
+from db import YamlDB, config_cached
 
 setting = Blueprint("setting", __name__)
 db = YamlDB()
@@ -18,6 +18,7 @@ def get_catalog():
 # Get the Kubam IP address
 @setting.route(Const.API_ROOT + "/ip", methods=["GET"])
 @cross_origin()
+@config_cached
 def get_kubam_ip():
     err, msg, kubam_ip = db.get_kubam_ip(Const.KUBAM_CFG)
     if err != 0:
@@ -44,6 +45,7 @@ def update_kubam_ip():
 # Get the public keys
 @setting.route(Const.API_ROOT + "/keys", methods=["GET"])
 @cross_origin()
+@config_cached
 def get_public_keys():
     err, msg, keys = db.get_public_keys(Const.KUBAM_CFG)
     if err != 0:
@@ -153,6 +153,31 @@ class FlaskTestCase(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 201)
 
+    def test_etag(self):
+        tester = app.test_client(self)
+        response = tester.get(Const.API_ROOT2 + '/networks', content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        assert(response.headers['Last-Modified'])
+        # nothing changed, so a 304 and the same body again without the header.
+        response = tester.get(Const.API_ROOT2 + '/networks', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, "")
+        cached = tester.get(Const.API_ROOT2 + '/networks')
+        self.assertEqual(cached.headers['ETag'], etag)
+        # any write changes the version.
+        response = tester.post(
+            Const.API_ROOT2+'/networks', content_type='application/json', data=json.dumps(self.newnet)
+        )
+        self.assertEqual(response.status_code, 201)
+        response = tester.get(Const.API_ROOT2 + '/networks', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        assert(response.headers['ETag'] != etag)
+        assert(self.newnet['name'] in [n['name'] for n in json.loads(response.data)['networks']])
+        response = tester.delete(
+            Const.API_ROOT2 + '/networks', content_type='application/json', data=json.dumps({"name": self.newnet['name']})
+        )
+        self.assertEqual(response.status_code, 201)
 
 
 if __name__ == '__main__':
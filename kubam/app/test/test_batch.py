@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import unittest
+import subprocess
+from StringIO import StringIO
+from benchmark import ApiBenchmark
+from cli import Batch
+from cli.batch import main
+from config import Const
+from db import YamlDB
+from helper import KubamError
+
+
+class BatchUnitTests(unittest.TestCase):
+    """Tests for the batch command line against an emulated UCS domain."""
+
+    def setUp(self):
+        # one UCS Manager emulator with 16 blades behind a scratch kubam.yaml, image tools stubbed.
+        self.bench = ApiBenchmark("small")
+        self.bench.setup()
+        self.emulator = self.bench.emulators[0]
+        self.emulator.add("lsServer", "org-root/ls-kubam", name="kubam", type="initial-template")
+        config = self.bench.config
+        # the first 4 hosts are installed on blades 1/1 - 1/4, the 5th has a template that is not there.
+        for i, h in enumerate(config["hosts"][:5]):
+            h["service_profile_template"] = "org-root/ls-kubam"
+            h["server"] = "1/{0}".format(i + 1)
+        config["hosts"][4]["service_profile_template"] = "org-root/ls-missing"
+        err, msg = YamlDB().write_config(config, Const.KUBAM_CFG)
+        assert(err == 0)
+        self.progress = StringIO()
+        self.batch = Batch(4, self.progress)
+
+    def tearDown(self):
+        self.bench.teardown()
+
+    def test_images(self):
+        self.batch.images()
+        summary = self.batch.summary("images", 1.0)
+        assert(summary["status"] == "done")
+        assert(summary["tasks"] == {"done": 18})
+        assert(sorted(r["name"] for r in summary["results"] if r["task"] == "boot") ==
+               sorted(set(h["os"] for h in self.bench.config["hosts"])))
+        # a line of progress for every task as it finished.
+        lines = self.progress.getvalue().splitlines()
+        assert(len(lines) == 18)
+        assert(lines[-1].startswith("[16/16] image kube"))
+
+    def test_deploy(self):
+        hosts = ["kube000{0}".format(i) for i in range(1, 6)]
+        self.batch.deploy(hosts)
+        summary = self.batch.summary("deploy", 1.0)
+        assert(summary["status"] == "failed")
+        deploy = [r for r in summary["results"] if r["task"] == "deploy"]
+        assert(len(deploy) == 1 and deploy[0]["name"] == "ucs01")
+        assert(deploy[0]["error"] == "1 of 5 hosts failed")
+        status = dict((h["name"], h["status"]) for h in deploy[0]["hosts"])
+        assert(status == {"kube0001": "done", "kube0002": "done", "kube0003": "done", "kube0004": "done",
+                          "kube0005": "failed"})
+        for slot in range(1, 5):
+            blade = self.emulator.get("sys/chassis-1/blade-{0}".format(slot))[1]
+            assert(blade["association"] == "associated")
+            assert(blade["operPower"] == "on")
+
+        batch = Batch(4, None)
+        batch.power("off", hosts[:4])
+        assert(batch.summary("power", 1.0)["status"] == "done")
+        assert(batch.results[0]["hosts"].keys() == hosts[:4])
+        for slot in range(1, 5):
+            assert(self.emulator.get("sys/chassis-1/blade-{0}".format(slot))[1]["operPower"] == "off")
+        # all the logins of the workers were logged out.
+        assert(self.emulator.calls["aaaLogout"] == self.emulator.calls["aaaLogin"])
+
+    def test_main(self):
+        output = os.path.join(os.path.dirname(Const.KUBAM_CFG), "results.json")
+        assert(main(["vmedia", "--config", Const.KUBAM_CFG, "--output", output, "--quiet"]) == 0)
+        with open(output) as f:
+            summary = json.load(f)
+        assert(summary["command"] == "vmedia")
+        assert(summary["results"][0]["name"] == "ucs01")
+        assert(summary["results"][0]["oses"] == sorted(set(h["os"] for h in self.bench.config["hosts"])))
+        assert(main(["images", "--config", Const.KUBAM_CFG, "--host", "nothere", "--quiet"]) == 2)
+        self.assertRaises(KubamError, self.batch.power, "sideways")
+        self.assertRaises(KubamError, self.batch.vmedia, None, ["nothere"])
+
+    def test_stdout(self):
+        # what the workers and the SDK print goes to standard error, standard output is the JSON alone.
+        app = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        child = subprocess.Popen([sys.executable, "-m", "cli.batch", "vmedia", "--config", Const.KUBAM_CFG],
+                                 cwd=app, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = child.communicate()
+        assert(child.returncode == 0)
+        summary = json.loads(out)
+        assert(summary["command"] == "vmedia" and summary["status"] == "done")
+        assert("[1/1] vmedia ucs01: done" in err)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from benchmark import Fleet, ApiBenchmark, ImageBenchmark, StartupBenchmark
+from config import Const
+
+
+class BenchmarkUnitTests(unittest.TestCase):
+    """Tests for the API, image build and start up benchmarks."""
+
+    def test_fleet(self):
+        config = Fleet.config(20, server_groups=3, network_groups=2, ports=[8001, 8002, 8003])
+        assert(len(config["hosts"]) == 20)
+        assert(len(set(h["ip"] for h in config["hosts"])) == 20)
+        assert(config["hosts"][0]["role"] == "k8s master")
+        assert([sg["credentials"]["port"] for sg in config["server_groups"]] == [8001, 8002, 8003])
+        # hosts that don't divide evenly go to the last group.
+        pools = [sg["server_pool"]["blades"] for sg in config["server_groups"]]
+        assert([len(p) for p in pools] == [6, 6, 8])
+        assert(pools[2][-1] == "1/8")
+        nets = [n["name"] for n in config["network_groups"]]
+        assert(all(h["network_group"] in nets for h in config["hosts"]))
+        assert(sorted(i["os"] for i in config["iso_map"]) == sorted(Fleet.OSES))
+
+    def test_percentile(self):
+        values = range(1, 101)
+        assert(ApiBenchmark.percentile(values, 50) == 50)
+        assert(ApiBenchmark.percentile(values, 95) == 95)
+        assert(ApiBenchmark.percentile(values, 99) == 99)
+        assert(ApiBenchmark.percentile([0.2], 99) == 0.2)
+        assert(ApiBenchmark.percentile([], 50) == 0.0)
+
+    def test_compare(self):
+        base = {"GET /hosts": {"errors": 0, "rps": 100.0, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0,
+                               "rss_mb": 80.0}}
+        same = {"GET /hosts": dict(base["GET /hosts"], p95_ms=24.0)}
+        assert(ApiBenchmark.compare(same, base, 0.25) == [])
+        worse = {"GET /hosts": dict(base["GET /hosts"], p95_ms=26.0, rps=70.0)}
+        regressions = ApiBenchmark.compare(worse, base, 0.25)
+        assert(len(regressions) == 2)
+        assert("p95_ms" in regressions[0])
+        assert("rps" in regressions[1])
+
+    def test_run(self):
+        cfg = Const.KUBAM_CFG
+        results = ApiBenchmark("small", clients=2, requests=4).run()
+        assert(Const.KUBAM_CFG == cfg)
+        assert("POST /deploy/images" in results)
+        for name, r in results.items():
+            assert(r["requests"] == 4)
+            assert(r["errors"] == 0)
+
+    def test_stages(self):
+        trace = {"spans": [
+            {"name": "exec cp", "depth": 1, "offset": 0.2, "duration": 0.1},
+            {"name": "build_boot_image", "depth": 0, "offset": 0.1, "duration": 0.5},
+            {"name": "exec cp", "depth": 1, "offset": 0.4, "duration": 0.3},
+            {"name": "exec cp", "depth": 0, "offset": 0.7, "duration": 0.2},
+        ]}
+        stages = ImageBenchmark.stages(trace)
+        assert([(s["depth"], s["name"], s["count"]) for s in stages] ==
+               [(0, "build_boot_image", 1), (1, "exec cp", 2), (0, "exec cp", 1)])
+        assert(stages[1]["seconds"] == 0.4)
+        assert(stages[1]["max_ms"] == 300.0)
+        assert(stages[1]["mean_ms"] == 200.0)
+
+    def test_images(self):
+        kubam_dir = Const.KUBAM_DIR
+        results = ImageBenchmark(hosts=6, tree_mb=1).run()
+        assert(Const.KUBAM_DIR == kubam_dir)
+        images = results["host_images"]
+        assert(images["error"] is None)
+        assert(images["bytes_written"] > 0)
+        assert(images["peak_disk_bytes"] >= images["bytes_written"])
+        counts = dict((s["name"], s["count"]) for s in images["stages"] if s["depth"] == 0)
+        assert(counts["build_template"] == 6)
+        assert(counts["build_boot_image"] == 6)
+        assert(ImageBenchmark.compare(results, results) == [])
+
+    def test_startup(self):
+        results = StartupBenchmark(runs=1, platforms=["ucsm"]).run()
+        # none of the SDKs are imported until a platform is used.
+        assert(results["startup"]["sdks"] == [])
+        assert(results["startup + ucsm"]["sdks"] == ["ucsmsdk"])
+        assert(results["startup + ucsm"]["modules"] > results["startup"]["modules"])
+
+
+if __name__ == '__main__':
+    unittest.main()
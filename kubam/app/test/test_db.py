@@ -66,6 +66,22 @@ class DBUnitTests(unittest.TestCase):
         err, msg, config = self.db.open_config("/tmp/foo.yaml")
         assert(err == 0)
 
+    def test_config_version(self):
+        err, msg = self.db.write_config(self.cfg, "/tmp/foo.yaml")
+        assert(err == 0)
+        version, mtime = YamlDB.config_version("/tmp/foo.yaml")
+        # the same in another process, which has not seen the file before.
+        YamlDB.versions.clear()
+        assert(YamlDB.config_version("/tmp/foo.yaml") == (version, mtime))
+        # a write of the same size with the same modification time still changes it.
+        with open("/tmp/foo.yaml") as f:
+            data = f.read()
+        with open("/tmp/foo.yaml", "w") as f:
+            f.write(data.replace("foonode2", "barnode2"))
+        os.utime("/tmp/foo.yaml", (mtime, mtime))
+        assert(YamlDB.config_version("/tmp/foo.yaml")[0] != version)
+        assert(YamlDB.config_version("/tmp/nothere.yaml") == (None, None))
+
     def test_get_network(self):
         err, msg, network = self.db.get_network("/tmp/bfoo.yaml")
         assert(err == 0)
@@ -0,0 +1,106 @@
+import json
+import time
+import unittest
+from app import app
+from benchmark import ApiBenchmark
+from config import Const
+from db import YamlDB
+
+
+class DeployUnitTests(unittest.TestCase):
+    """Tests for the deploy pipeline against an emulated UCS domain."""
+
+    def setUp(self):
+        # one UCS Manager emulator with 16 blades behind a scratch kubam.yaml, image tools stubbed.
+        self.bench = ApiBenchmark("small")
+        self.bench.setup()
+        self.emulator = self.bench.emulators[0]
+        self.emulator.add("lsServer", "org-root/ls-kubam", name="kubam", type="initial-template")
+        config = self.bench.config
+        # the first 4 hosts are installed on blades 1/1 - 1/4, the 5th has a template that is not there.
+        for i, h in enumerate(config["hosts"][:5]):
+            h["service_profile_template"] = "org-root/ls-kubam"
+            h["server"] = "1/{0}".format(i + 1)
+        config["hosts"][4]["service_profile_template"] = "org-root/ls-missing"
+        err, msg = YamlDB().write_config(config, Const.KUBAM_CFG)
+        assert(err == 0)
+        self.app = app.test_client()
+
+    def tearDown(self):
+        self.bench.teardown()
+
+    def wait(self, deployment_id):
+        for _ in range(300):
+            response = self.app.get(Const.API_ROOT2 + "/deploy/" + deployment_id)
+            assert(response.status_code == 200)
+            d = json.loads(response.data)["deployment"]
+            if d["status"] != "running":
+                return d
+            time.sleep(0.1)
+        self.fail("deployment did not finish")
+
+    def test_deploy(self):
+        response = self.app.post(Const.API_ROOT2 + "/deploy")
+        assert(response.status_code == 202)
+        d = self.wait(json.loads(response.data)["deployment"]["id"])
+        assert(d["status"] == "failed")
+        assert(d["hosts_total"] == 16)
+        assert(d["hosts_done"] == 15)
+        assert(d["first_host_seconds"] is not None)
+        # both operating systems are extracted and get a boot ISO and a vMedia policy once.
+        assert(d["stages"]["boot_iso"] == {"done": 2})
+        assert(d["stages"]["vmedia"] == {"done": 2})
+        assert(d["stages"]["image"] == {"done": 16})
+        assert(d["stages"]["power"] == {"done": 4, "blocked": 1})
+        hosts = dict((h["name"], h) for h in d["hosts"])
+        assert(hosts["kube0001"]["status"] == "done")
+        assert(hosts["kube0001"]["stages"]["power"] == "done")
+        assert(hosts["kube0005"]["stages"]["profile"] == "failed")
+        assert(hosts["kube0005"]["stages"]["associate"] == "blocked")
+        assert("error" in hosts["kube0005"])
+        # hosts without a service profile template only get their image.
+        assert(hosts["kube0006"]["status"] == "done")
+        assert(hosts["kube0006"]["stages"]["profile"] == "skipped")
+        for slot in range(1, 5):
+            blade = self.emulator.get("sys/chassis-1/blade-{0}".format(slot))[1]
+            assert(blade["association"] == "associated")
+            assert(blade["operPower"] == "on")
+        assert(self.emulator.get("sys/chassis-1/blade-5")[1]["association"] == "none")
+        # a few logins shared by all the tasks, all logged out again.
+        for _ in range(50):
+            if self.emulator.calls.get("aaaLogout", 0) == self.emulator.calls["aaaLogin"]:
+                break
+            time.sleep(0.1)
+        assert(self.emulator.calls["aaaLogin"] <= Const.DEPLOY_SESSIONS)
+        assert(self.emulator.calls["aaaLogout"] == self.emulator.calls["aaaLogin"])
+        listed = json.loads(self.app.get(Const.API_ROOT2 + "/deploy").data)["deployments"]
+        assert(d["id"] in [l["id"] for l in listed])
+        assert("hosts" not in listed[0])
+
+    def test_login_refused(self):
+        # more vMedia tasks at once than logins, and every login refused: the tasks that wait for
+        # a login are not left waiting when the ones being made fail.
+        self.emulator.password = "wrong"
+        saved = Const.DEPLOY_SESSIONS
+        Const.DEPLOY_SESSIONS = 1
+        try:
+            response = self.app.post(Const.API_ROOT2 + "/deploy")
+            assert(response.status_code == 202)
+            d = self.wait(json.loads(response.data)["deployment"]["id"])
+        finally:
+            Const.DEPLOY_SESSIONS = saved
+        assert(d["status"] == "failed")
+        assert(d["stages"]["vmedia"] == {"failed": 2})
+        assert(d["stages"]["power"] == {"blocked": 5})
+        assert(d["stages"]["image"] == {"done": 16})
+
+    def test_errors(self):
+        response = self.app.get(Const.API_ROOT2 + "/deploy/nothere")
+        assert(response.status_code == 404)
+        response = self.app.post(Const.API_ROOT2 + "/deploy", content_type="application/json",
+                                 data=json.dumps(["kube0001", "nothere"]))
+        assert(response.status_code == 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
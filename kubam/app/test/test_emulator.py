@@ -0,0 +1,280 @@
+import time
+import socket
+import unittest
+import threading
+from StringIO import StringIO
+import xml.etree.ElementTree as ET
+from emulator import UCSMEmulator, UCSCEmulator, IMCEmulator
+from emulator.xml_api import split_dn, match_filter
+from ucs import UCSServer, UCSSession, UCSMonitor, UCSNet, UCSUtil
+from ucsc import UCSCServer, UCSCSession, UCSCMonitor
+from imc import IMCServer, IMCSession
+from helper import KubamError, DomainCache, DomainGuard, QueryCache, XmlStream, XmlApiError
+from config import Const
+
+
+class EmulatorUnitTests(unittest.TestCase):
+    """Tests for the UCS Manager emulator."""
+
+    def setUp(self):
+        self.emulator = UCSMEmulator(blades=10, racks=2, fsm_seconds=1)
+        port = self.emulator.start()
+        self.handle, err = UCSSession().login("admin", "password", "127.0.0.1", port)
+        assert(err is None)
+
+    def tearDown(self):
+        UCSSession.logout(self.handle)
+        self.emulator.stop()
+
+    def test_split_dn(self):
+        assert(split_dn("sys/chassis-1/blade-2") == ("sys/chassis-1", "blade-2"))
+        assert(split_dn("sys/rack-unit-1/mgmt/if-[1/2]") == ("sys/rack-unit-1/mgmt", "if-[1/2]"))
+        assert(split_dn("sys") == ("", "sys"))
+
+    def test_filter(self):
+        f = ET.fromstring('<and><wcard property="dn" value="blade-1$"/><eq property="operPower" value="off"/></and>')
+        assert(match_filter(f, {"dn": "sys/chassis-2/blade-1", "operPower": "off"}))
+        assert(not match_filter(f, {"dn": "sys/chassis-2/blade-1", "operPower": "on"}))
+
+    def test_bad_login(self):
+        h, err = UCSSession().login("admin", "wrong", "127.0.0.1", self.emulator.server.server_address[1])
+        assert(h is None)
+        assert(err == "Authentication failed")
+
+    def test_servers(self):
+        servers = UCSServer.list_servers(self.handle)
+        assert(len(servers) == 12)
+        assert(servers[9]["dn"] == "sys/chassis-2/blade-2")
+        assert(servers[-1]["rack_id"] == "2")
+        disks = UCSServer.list_disks(self.handle, servers[0])
+        assert(len(disks) == 2)
+
+    def test_selected_servers(self):
+        calls = dict(self.emulator.calls)
+        servers = UCSServer.list_selected_servers(self.handle, {"blades": ["2/2", "1/8"], "rack_servers": ["1"]})
+        assert([s["dn"] for s in servers] == ["sys/chassis-2/blade-2", "sys/chassis-1/blade-8", "sys/rack-unit-1"])
+        # one configResolveDns, no class queries.
+        assert(self.emulator.calls["configResolveDns"] - calls.get("configResolveDns", 0) == 1)
+        assert(self.emulator.calls.get("configResolveClass", 0) == calls.get("configResolveClass", 0))
+        assert(servers[0] == UCSServer.list_servers(self.handle)[9])
+        self.assertRaises(KubamError, UCSServer.list_selected_servers, self.handle, {"blades": ["9/9"]})
+        self.assertRaises(KubamError, UCSServer.list_selected_servers, self.handle, {"blades": ["1"]})
+        assert(len(UCSServer.list_selected_servers(self.handle, "all")) == 12)
+        max_dns = Const.SERVER_QUERY_MAX_DNS
+        Const.SERVER_QUERY_MAX_DNS = 2
+        try:
+            servers = UCSServer.list_selected_servers(self.handle, {"blades": ["2/2", "1/8"], "rack_servers": ["1"]})
+        finally:
+            Const.SERVER_QUERY_MAX_DNS = max_dns
+        assert([s["dn"] for s in servers] == ["sys/chassis-2/blade-2", "sys/chassis-1/blade-8", "sys/rack-unit-1"])
+
+    def test_associate(self):
+        err, msg = UCSServer.create_service_profile_template(self.handle, "org-root")
+        assert(err == 0)
+        err, msg = UCSServer.create_server(self.handle, "org-root/ls-KUBAM", "node1", "org-root")
+        assert(err == 0)
+        err, msg = UCSServer.associate_server(self.handle, "org-root", {"server": "1/3", "name": "node1"})
+        assert(err == 0)
+        server = {"dn": "sys/chassis-1/blade-3"}
+        status = UCSMonitor.get_status(self.handle, [server])[server["dn"]]
+        assert(status["current_fsm"] == "Associate")
+        assert(int(status["progress"]) < 100)
+        time.sleep(1)
+        stages = UCSMonitor.get_fsm(self.handle, server)["stages"]
+        assert(all(s["stage_status"] == "success" for s in stages))
+        blade = UCSServer.list_blade(self.handle, "1/3")
+        assert(blade.assigned_to_dn == "org-root/ls-node1")
+
+    def test_domain_cache(self):
+        domain = self.handle.kubam_domain
+        assert(domain == ("ucsm", "127.0.0.1", self.emulator.server.server_address[1]))
+        assert(UCSSession.get_version(self.handle) == UCSMEmulator.VERSION)
+        # the version comes with the login, the only dn the login resolves is the SDK's own sys lookup.
+        calls = dict(self.emulator.calls)
+        handle, err = UCSSession().login("admin", "password", "127.0.0.1", domain[2])
+        assert(err is None)
+        UCSSession.logout(handle)
+        assert(self.emulator.calls["configResolveDn"] - calls.get("configResolveDn", 0) == 1)
+        # VLANs are queried once.
+        calls = dict(self.emulator.calls)
+        UCSNet.list_vlans(self.handle)
+        UCSNet.list_vlans(self.handle)
+        assert(self.emulator.calls["configResolveClass"] - calls.get("configResolveClass", 0) == 1)
+        # an org is created once and forgotten when it is deleted.
+        err, msg = UCSUtil.create_org(self.handle, "kubam")
+        assert(err == 0)
+        assert("kubam" in DomainCache.get(domain, "orgs", set))
+        UCSUtil.delete_org(self.handle, "org-root/org-kubam")
+        assert("kubam" not in DomainCache.get(domain, "orgs", set))
+        # templates are dropped when KUBAM creates one.
+        DomainCache.get(domain, "templates", list)
+        err, msg = UCSServer.create_service_profile_template(self.handle, "org-root")
+        assert(err == 0)
+        assert((domain, "templates") not in DomainCache.entries)
+
+    def test_query_cache(self):
+        domain = self.handle.kubam_domain
+        QueryCache.invalidate(domain)
+        calls = dict(self.emulator.calls)
+        servers = UCSServer.list_servers(self.handle)
+        assert(UCSServer.list_servers(self.handle) == servers)
+        # blades and rack servers are asked for once.
+        assert(self.emulator.calls["configResolveClass"] - calls.get("configResolveClass", 0) == 2)
+        # what a caller does to the objects it got is not seen by the others.
+        blade = self.handle.query_dn("sys/chassis-1/blade-1")
+        blade.usr_lbl = "changed"
+        XmlStream.records(self.handle, "ucsm", "computeBlade", XmlStream.SERVER_FIELDS)[0]["oper_power"] = "changed"
+        assert(self.handle.query_dn("sys/chassis-1/blade-1").usr_lbl != "changed")
+        assert(UCSServer.list_servers(self.handle) == servers)
+        # queries of other logins made at the same time wait for the one on its way.
+        QueryCache.invalidate(domain)
+        self.emulator.latency = 0.1
+        port = self.emulator.server.server_address[1]
+        handles = [UCSSession().login("admin", "password", "127.0.0.1", port)[0] for _ in range(4)]
+        calls = dict(self.emulator.calls)
+        threads = [threading.Thread(target=UCSServer.list_servers, args=(h,)) for h in handles]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.emulator.latency = 0
+        for h in handles:
+            UCSSession.logout(h)
+        assert(self.emulator.calls["configResolveClass"] - calls.get("configResolveClass", 0) == 2)
+        # a commit of a service profile drops what is cached about servers.
+        err, msg = UCSServer.create_service_profile_template(self.handle, "org-root")
+        assert(err == 0)
+        assert(not [k for k, e in QueryCache.entries.items() if k[0] == domain and "computeblade" in e["classes"]])
+        # the least recently used results are dropped beyond the budget.
+        budget = Const.QUERY_CACHE_BYTES
+        Const.QUERY_CACHE_BYTES = 1
+        try:
+            UCSServer.list_servers(self.handle)
+        finally:
+            Const.QUERY_CACHE_BYTES = budget
+        assert(len([k for k in QueryCache.entries if k[0] == domain]) <= 1)
+        assert(QueryCache.size >= 0)
+
+    def test_stream_decode(self):
+        # the servers decoded from the response are what the SDK's objects make.
+        mos = self.handle.query_classid("ComputeBlade") + self.handle.query_classid("ComputeRackUnit")
+        assert(UCSServer.list_servers(self.handle) == [UCSServer.server_to_api(mo) for mo in mos])
+        server = UCSServer.list_servers(self.handle)[0]
+        disks = UCSServer.disk_records(self.handle, server)
+        assert([d["dn"] for d in disks] == [d.dn for d in UCSServer.list_disks(self.handle, server)])
+        assert(disks[0]["disk_state"] == "unconfigured-good")
+        assert(sorted(disks[0]) == sorted(k for _, k in XmlStream.DISK_FIELDS))
+        error = '<configResolveClass response="yes" errorCode="552" errorDescr="Authorization required"/>'
+        self.assertRaises(XmlApiError, list, XmlStream.iter_attributes(StringIO(error), "computeBlade"))
+
+    def test_guard(self):
+        guard = DomainGuard.of(self.handle.kubam_domain)
+        # at most 2 calls at once.
+        guard.calls = threading.Semaphore(2)
+        self.emulator.latency = 0.05
+        self.emulator.max_in_flight = 0
+        port = self.emulator.server.server_address[1]
+
+        def query():
+            # a handle of its own, the SDK sends one request of a handle at a time, and not answered
+            # from the query cache.
+            h, err = UCSSession().login("admin", "password", "127.0.0.1", port)
+            with QueryCache.fresh():
+                UCSServer.list_blade(h, "1/1")
+            UCSSession.logout(h)
+        threads = [threading.Thread(target=query) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert(self.emulator.max_in_flight == 2)
+        self.emulator.latency = 0
+        backoff = Const.DOMAIN_BACKOFF
+        Const.DOMAIN_BACKOFF = 0.01
+        try:
+            # queries are tried again, commits are not.
+            self.emulator.unavailable = 2
+            assert(len(UCSServer.list_servers(self.handle)) == 12)
+            self.emulator.unavailable = 1
+            err, msg = UCSServer.create_service_profile_template(self.handle, "org-root")
+            assert(err == 1)
+        finally:
+            Const.DOMAIN_BACKOFF = backoff
+        # the failed commit counts towards giving up on the domain until a call gets through.
+        assert(guard.failures == 1)
+        UCSServer.list_blade(self.handle, "1/1")
+        assert(guard.failures == 0)
+        # a domain that can't be reached is given up on for a while.
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+        s.close()
+        for _ in range(Const.BREAKER_FAILURES):
+            h, err = UCSSession().login("admin", "password", "127.0.0.1", port)
+            assert(err == "127.0.0.1 is not reachable")
+        h, err = UCSSession().login("admin", "password", "127.0.0.1", port)
+        assert(h is None)
+        assert(err.startswith("127.0.0.1 is unreachable, not trying again"))
+
+
+class UCSCEmulatorUnitTests(unittest.TestCase):
+    """Tests for the UCS Central emulator."""
+
+    def setUp(self):
+        self.emulator = UCSCEmulator(domains=3, blades=4, racks=1, fsm_seconds=1)
+        port = self.emulator.start()
+        self.handle, err = UCSCSession().login("admin", "password", "127.0.0.1", port)
+        assert(err is None)
+
+    def tearDown(self):
+        UCSCSession.logout(self.handle)
+        self.emulator.stop()
+
+    def test_servers(self):
+        servers = UCSCServer.list_servers(self.handle)
+        assert(len(servers) == 15)
+        assert(sorted(set(s["domain_id"] for s in servers)) == ["1001", "1002", "1003"])
+        assert(len(UCSCServer.list_disks(self.handle, servers[0])) == 2)
+
+    def test_selected_servers(self):
+        servers = UCSCServer.list_selected_servers(self.handle, {"blades": ["1003/1/4"], "rack_servers": ["1001/1"]})
+        assert([s["dn"] for s in servers] == ["compute/sys-1003/chassis-1/blade-4", "compute/sys-1001/rack-unit-1"])
+        assert(servers[0]["domain_id"] == "1003")
+        self.assertRaises(KubamError, UCSCServer.list_selected_servers, self.handle, {"blades": ["1/4"]})
+
+    def test_associate(self):
+        self.emulator.add("lsServer", "org-root/ls-tmpl", name="tmpl", type="initial-template")
+        assert(UCSCServer.list_templates(self.handle) == [{"name": "tmpl"}])
+        err, msg = UCSCServer.create_server(self.handle, "org-root/ls-tmpl", "node1", "org-root")
+        assert(err == 0)
+        err, msg = UCSCServer.associate_server(self.handle, "org-root", {"server": "1002/1/2", "name": "node1"})
+        assert(err == 0)
+        server = [s for s in UCSCServer.list_servers(self.handle) if s["dn"] == "compute/sys-1002/chassis-1/blade-2"][0]
+        assert(server["service_profile"] == "org-root/ls-node1")
+        UCSCServer.power_server(self.handle, server, "on")
+        status = UCSCMonitor.get_status(self.handle, [server])[server["dn"]]
+        assert(status["current_fsm"] == "Associate")
+        stages = UCSCMonitor.get_fsm(self.handle, server)["stages"]
+        assert(len(stages) == len(UCSCEmulator.FSM_STAGES))
+        server = [s for s in UCSCServer.list_servers(self.handle) if s["dn"] == server["dn"]][0]
+        assert(server["oper_power"] == "on")
+
+
+class IMCEmulatorUnitTests(unittest.TestCase):
+    """Tests for the CIMC emulator."""
+
+    def test_mount_media(self):
+        emulator = IMCEmulator(mount_seconds=0)
+        port = emulator.start()
+        handle, err = IMCSession().login("admin", "password", "127.0.0.1", port)
+        assert(err is None)
+        IMCServer.mount_media(handle, "10.0.0.1", "node1", "centos7.4")
+        vmedia = handle.query_dn("sys/svc-ext/vmedia-svc/vmmap-c")
+        assert(vmedia.remote_file == "centos7.4-boot.iso")
+        assert(vmedia.mapping_status == "OK")
+        IMCSession.logout(handle)
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import os
+import csv
+import json
+import time
+import socket
+import datetime
+import tempfile
+import unittest
+from app import app
+from benchmark import ApiBenchmark
+from config import Const
+from db import YamlDB
+from emulator import UCSCEmulator
+from helper import XmlEngine, XmlSession, XmlApiError, Return, DomainGuard
+from helper.xml_engine import Connection
+
+
+class FleetUnitTests(unittest.TestCase):
+    """Tests for the XML engine and the fleet wide views against emulated UCS domains."""
+
+    def setUp(self):
+        # four UCS Manager emulators, 64 blades each, with a tenth of a second to answer.
+        self.bench = ApiBenchmark("medium", latency=0.1)
+        self.bench.setup()
+        self.ports = [e.server.server_address[1] for e in self.bench.emulators]
+        self.app = app.test_client()
+
+    def tearDown(self):
+        self.bench.teardown()
+
+    def test_engine(self):
+        engine = XmlEngine()
+        sessions = [XmlSession("ucsm", "127.0.0.1", "admin", "password", port) for port in self.ports]
+
+        def power(session, slot):
+            blade = yield session.resolve_dn("sys/chassis-1/blade-{0}".format(slot))
+            raise Return(blade.oper_power)
+        # 5 queries to each domain at once, from one thread, with one login each.
+        start = time.time()
+        states = engine.run([power(s, slot) for s in sessions for slot in range(1, 6)])
+        assert(time.time() - start < 1.0)
+        assert(states == ["off"] * 20)
+        for e in self.bench.emulators:
+            assert(e.calls["aaaLogin"] == 1)
+            assert(e.calls["configResolveDn"] == 5)
+            assert(e.max_in_flight == 5)
+
+        def blades(session):
+            mos = yield session.resolve_class("computeBlade")
+            raise Return(len(mos))
+        assert(engine.run(blades(sessions[0])) == 64)
+        assert(engine.run(sessions[0].resolve_dn("sys/chassis-9/blade-9")) is None)
+        assert(len(engine.run(sessions[0].resolve_dns(["sys/chassis-1/blade-1", "sys/chassis-1/blade-2"]))) == 2)
+        # a session that was logged out logs in again.
+        self.bench.emulators[0].cookies.clear()
+        assert(engine.run(blades(sessions[0])) == 64)
+        assert(self.bench.emulators[0].calls["aaaLogin"] == 2)
+        # configConfMos with objects made by the SDK.
+        from ucsmsdk.mometa.org.OrgOrg import OrgOrg
+        mos = engine.run(sessions[0].conf_mos([OrgOrg(parent_mo_or_dn="org-root", name="fleet")]))
+        assert(mos[0].dn == "org-root/org-fleet")
+        assert(self.bench.emulators[0].get("org-root/org-fleet")[1]["name"] == "fleet")
+        engine.run([s.logout() for s in sessions])
+        assert(all(not e.cookies for e in self.bench.emulators))
+
+    def test_errors(self):
+        engine = XmlEngine()
+        bad = XmlSession("ucsm", "127.0.0.1", "admin", "wrong", self.ports[0])
+        self.assertRaises(XmlApiError, engine.run, bad.resolve_class("computeBlade"))
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+        s.close()
+        gone = XmlSession("ucsm", "127.0.0.1", "admin", "password", port)
+        self.assertRaises(socket.error, engine.run, gone.resolve_class("computeBlade"))
+
+    @staticmethod
+    def self_signed(path):
+        """
+        Write a throwaway self signed certificate and its key to path.
+        """
+        from cryptography import x509
+        from cryptography.x509.oid import NameOID
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        key = rsa.generate_private_key(65537, 2048, default_backend())
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, u"127.0.0.1")])
+        now = datetime.datetime.utcnow()
+        cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key()) \
+            .serial_number(1).not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1)) \
+            .sign(key, hashes.SHA256(), default_backend())
+        with open(path, "wb") as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                                      serialization.NoEncryption()))
+            f.write(cert.public_bytes(serialization.Encoding.PEM))
+
+    def test_tls(self):
+        fd, certfile = tempfile.mkstemp(suffix=".pem")
+        os.close(fd)
+        ucs = UCSCEmulator(domains=1, blades=4, fsm_seconds=0)
+        try:
+            self.self_signed(certfile)
+            port = ucs.start(certfile=certfile)
+            Connection.HTTPS_PORTS.add(port)
+            session = XmlSession("ucsc", "127.0.0.1", "admin", "password", port)
+            guard = DomainGuard.of(session.domain)
+            engine = XmlEngine()
+            blades = engine.run(session.resolve_class("computeBlade"))
+            assert(len(blades) == 4)
+            engine.run(session.logout())
+            # every request gave its call slot back once, and nothing is left behind.
+            assert(engine.connections == {})
+            assert(ucs.calls["aaaLogin"] == 1 and ucs.calls["aaaLogout"] == 1)
+            acquired = 0
+            while guard.calls.acquire(False):
+                acquired += 1
+            for _ in range(acquired):
+                guard.calls.release()
+            assert(acquired == Const.DOMAIN_MAX_CALLS)
+        finally:
+            Connection.HTTPS_PORTS.discard(ucs.server.server_address[1] if ucs.server else None)
+            ucs.stop()
+            os.remove(certfile)
+
+    def test_fleet(self):
+        ucsc = UCSCEmulator(domains=2, blades=4, fsm_seconds=0)
+        try:
+            config = self.bench.config
+            central = dict(config["server_groups"][0], name="central", type="ucsc", id=YamlDB.new_uuid())
+            central["credentials"] = dict(central["credentials"], port=ucsc.start())
+            config["server_groups"].append(central)
+            config["server_groups"][1]["credentials"]["password"] = "not encrypted"
+            err, msg = YamlDB().write_config(config, Const.KUBAM_CFG)
+            assert(err == 0)
+            response = self.app.get(Const.API_ROOT2 + "/servers/status")
+            assert(response.status_code == 200)
+            # the blades and rack servers of a domain are asked for at once.
+            assert(all(e.max_in_flight == 2 for e in self.bench.emulators if e.calls.get("aaaLogin")))
+            groups = json.loads(response.data)["server_groups"]
+            assert(len(groups["ucs01"]["servers"]["blades"]) == 64)
+            assert(groups["ucs01"]["servers"]["blades"]["1/1"]["oper_power"] == "off")
+            assert("error" in groups["ucs02"])
+            assert(len(groups["central"]["servers"]["blades"]) == 8)
+            response = self.app.get(Const.API_ROOT2 + "/servers/powerstat")
+            assert(response.status_code == 200)
+            status = json.loads(response.data)["status"]
+            assert("1/1: off" in status["ucs03"]["blades"])
+            assert(len(status["central"]["blades"]) == 8)
+            for e in self.bench.emulators + [ucsc]:
+                assert(e.calls.get("aaaLogout", 0) == e.calls.get("aaaLogin", 0))
+        finally:
+            ucsc.stop()
+
+    def test_identities(self):
+        emulator = self.bench.emulators[0]
+        emulator.add("lsServer", "org-root/ls-kube0001", name="kube0001", assocState="associated",
+                     pnDn="sys/chassis-1/blade-2")
+        emulator.add("vnicEther", "org-root/ls-kube0001/ether-eth0", name="eth0", addr="00:25:B5:A0:00:01")
+        emulator.add("computeBlade", "sys/chassis-1/blade-2", association="associated",
+                     assignedToDn="org-root/ls-kube0001")
+        config = self.bench.config
+        config["server_groups"][3]["credentials"]["password"] = "not encrypted"
+        err, msg = YamlDB().write_config(config, Const.KUBAM_CFG)
+        assert(err == 0)
+        response = self.app.get(Const.API_ROOT2 + "/servers/identities")
+        assert(response.status_code == 200)
+        assert(response.mimetype == "application/x-ndjson")
+        records = [json.loads(l) for l in response.data.splitlines()]
+        assert(len(records) == 3 * 64 + 1)
+        assert(records[-1]["server_group"] == "ucs04" and "error" in records[-1])
+        blade = [r for r in records if r["server_group"] == "ucs01" and r["server"] == "1/2"][0]
+        assert(blade["serial"] == "FCH0000002")
+        assert(blade["uuid"].endswith("000000000002"))
+        assert(blade["macs"] == ["00:25:B5:01:00:02", "00:25:B5:02:00:02"])
+        assert(blade["service_profile"] == "org-root/ls-kube0001")
+        assert(blade["vnics"] == {"eth0": "00:25:B5:A0:00:01"})
+        # four class queries to each domain, however many servers it has.
+        for e in self.bench.emulators[:3]:
+            assert(e.calls["configResolveClass"] == 4)
+            assert("configResolveDn" not in e.calls)
+
+        response = self.app.get(Const.API_ROOT2 + "/servers/identities?format=csv")
+        assert(response.mimetype == "text/csv")
+        rows = list(csv.reader(response.data.splitlines()))
+        assert(rows[0][:4] == ["server_group", "kind", "server", "dn"])
+        assert(len(rows) == 1 + 3 * 64 + 1)
+        row = dict(zip(rows[0], rows[2]))
+        assert(row["server"] == "1/2")
+        assert(row["macs"] == "00:25:B5:01:00:02 00:25:B5:02:00:02")
+        assert(row["vnics"] == "eth0=00:25:B5:A0:00:01")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,138 @@
+import os
+import gzip
+import shutil
+import struct
+import tempfile
 import unittest
-from autoinstall import IsoMaker
+from autoinstall import IsoMaker, IsoCatalog
+from autoinstall.rpm_payload import RpmPayload
+
+
+def make_rpm(rpm_file, members):
+    """
+    Write a bare bones rpm: empty lead and signature, a main header with only the
+    payload compressor and a gzip'd newc cpio archive of members.
+    """
+    cpio = ""
+    for name, data in members + [("TRAILER!!!", "")]:
+        hdr = "070701" + "".join("%08x" % v for v in [0, 0100644, 0, 0, 1, 0, len(data), 0, 0, 0, 0, len(name) + 1, 0])
+        cpio += hdr + name + "\0"
+        cpio += "\0" * ((4 - len(cpio) % 4) % 4)
+        cpio += data
+        cpio += "\0" * ((4 - len(cpio) % 4) % 4)
+    store = "gzip\0"
+    with open(rpm_file, "wb") as f:
+        f.write("\0" * 96)
+        f.write(RpmPayload.HEADER_MAGIC + "\0" * 4 + struct.pack(">II", 0, 0))
+        f.write(RpmPayload.HEADER_MAGIC + "\0" * 4 + struct.pack(">II", 1, len(store)))
+        f.write(struct.pack(">iiii", RpmPayload.PAYLOADCOMPRESSOR, 6, 0, 1) + store)
+    g = gzip.open(rpm_file + ".gz", "wb")
+    g.write(cpio)
+    g.close()
+    with open(rpm_file, "ab") as f, open(rpm_file + ".gz", "rb") as g:
+        f.write(g.read())
 
 
 class IsoUnitTests(unittest.TestCase):
     """Tests for `iso_maker.py`."""
 
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.os_dir = os.path.join(self.tmp, "centos7.4")
+        os.makedirs(os.path.join(self.os_dir, "isolinux"))
+        os.makedirs(os.path.join(self.os_dir, "LiveOS"))
+        os.makedirs(os.path.join(self.os_dir, "images", "pxeboot"))
+        for f in ["isolinux/isolinux.bin", ".discinfo", "LiveOS/squashfs.img", "images/pxeboot/vmlinuz"]:
+            with open(os.path.join(self.os_dir, f), "w") as fh:
+                fh.write(f)
+        self.cfg = os.path.join(self.tmp, "isolinux.cfg")
+        with open(self.cfg, "w") as fh:
+            fh.write("default vesamenu.c32\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
     def test_list_isos(self):
         err, isos = IsoMaker.list_isos("/asdf/asd/e/e/efasdf")
         assert(err == 1)
         assert type(isos) is str
 
+    def test_link_tree(self):
+        stage = os.path.join(self.tmp, "stage")
+        os.makedirs(stage)
+        err, msg = IsoMaker.link_tree(os.path.join(self.os_dir, "images"), os.path.join(stage, "images"))
+        assert(err == 0)
+        src = os.stat(os.path.join(self.os_dir, "images", "pxeboot", "vmlinuz"))
+        dst = os.stat(os.path.join(stage, "images", "pxeboot", "vmlinuz"))
+        assert(src.st_ino == dst.st_ino)
+        err, msg = IsoMaker.link_tree(os.path.join(self.os_dir, ".discinfo"), os.path.join(stage, ".discinfo"))
+        assert(err == 0)
+        assert(os.path.isfile(os.path.join(stage, ".discinfo")))
+
+    def test_boot_fingerprint(self):
+        first = IsoMaker.boot_fingerprint(self.os_dir, self.cfg)
+        assert(first == IsoMaker.boot_fingerprint(self.os_dir, self.cfg))
+        with open(self.cfg, "a") as fh:
+            fh.write("timeout 60\n")
+        second = IsoMaker.boot_fingerprint(self.os_dir, self.cfg)
+        assert(first != second)
+        with open(os.path.join(self.os_dir, "LiveOS", "squashfs.img"), "a") as fh:
+            fh.write("more")
+        assert(second != IsoMaker.boot_fingerprint(self.os_dir, self.cfg))
+
+    def test_rpm_payload(self):
+        rpm_file = os.path.join(self.tmp, "redhat-virtualization-host-image-update.rpm")
+        squash = "squash" * 1000
+        make_rpm(rpm_file, [
+            ("./usr/share/doc/README", "readme"),
+            ("./usr/share/redhat-virtualization-host/image/rhvh-4.1.squashfs.img", squash)
+        ])
+        dest = os.path.join(self.tmp, "squashfs.img")
+        err, msg = RpmPayload(rpm_file).extract("squashfs.img", dest, lambda done, total: None)
+        assert(err == 0)
+        with open(dest) as f:
+            assert(f.read() == squash)
+        err, msg = RpmPayload(rpm_file).extract("missing.img", dest)
+        assert(err == 1)
+
+    def test_catalog_refresh(self):
+        detected = []
+
+        class FakeCatalog(IsoCatalog):
+            @staticmethod
+            def detect(iso):
+                detected.append(os.path.basename(iso))
+                return ["centos7.4"]
+
+        with open(os.path.join(self.tmp, "CentOS-7.iso"), "w") as fh:
+            fh.write("iso")
+        with open(os.path.join(self.tmp, "notes.txt"), "w") as fh:
+            fh.write("txt")
+        catalog = FakeCatalog(self.tmp, os.path.join(self.tmp, "catalog.yaml"))
+        err, msg, isos = catalog.refresh()
+        assert(err == 0)
+        assert([x["name"] for x in isos] == ["CentOS-7.iso"])
+        assert(isos[0]["os"] == ["centos7.4"])
+        assert(isos[0]["extracted"])
+        # unchanged images are not looked at again, changed ones are.
+        err, msg, isos = catalog.refresh()
+        assert(detected == ["CentOS-7.iso"])
+        with open(os.path.join(self.tmp, "CentOS-7.iso"), "a") as fh:
+            fh.write("more")
+        err, msg, isos = catalog.refresh()
+        assert(detected == ["CentOS-7.iso", "CentOS-7.iso"])
+        os.remove(os.path.join(self.tmp, "CentOS-7.iso"))
+        err, msg, isos = catalog.refresh()
+        assert(isos == [])
+        # a catalog that can't be written is an error, without a temporary file left behind.
+        catalog = FakeCatalog(self.tmp, os.path.join(self.tmp, "catalog"))
+        os.mkdir(catalog.catalog_file)
+        with open(os.path.join(self.tmp, "CentOS-7.iso"), "w") as fh:
+            fh.write("iso")
+        err, msg, isos = catalog.refresh()
+        assert(err == 1)
+        assert(not os.path.exists(catalog.catalog_file + ".tmp"))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from app import app
+from metrics import Metrics
+
+
+class MetricsUnitTests(unittest.TestCase):
+    """Tests for the /metrics endpoint."""
+
+    def test_histogram(self):
+        Metrics.observe("kubam_config_seconds", 0.02, op="test")
+        Metrics.observe("kubam_config_seconds", 20, op="test")
+        out = Metrics.render()
+        assert('kubam_config_seconds_bucket{op="test",le="0.025"} 1' in out)
+        assert('kubam_config_seconds_bucket{op="test",le="+Inf"} 2' in out)
+        assert('kubam_config_seconds_count{op="test"} 2' in out)
+
+    def test_instrument_handle(self):
+        class Handle(object):
+            def query_dn(self, dn):
+                return dn
+
+            def commit(self):
+                raise ValueError("commit failed")
+
+        h = Metrics.instrument_handle(Handle(), "ucsm", "sg1")
+        assert(h.query_dn("sys") == "sys")
+        self.assertRaises(ValueError, h.commit)
+        out = Metrics.render()
+        assert('kubam_sdk_call_seconds_count{call="query_dn",platform="ucsm",server_group="sg1"} 1' in out)
+        assert('kubam_sdk_call_errors_total{call="commit",platform="ucsm",server_group="sg1"} 1' in out)
+
+    def test_endpoint(self):
+        tester = app.test_client(self)
+        tester.get('/', content_type='application/json')
+        response = tester.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        out = response.get_data(as_text=True)
+        assert('kubam_http_request_duration_seconds_count{method="GET",route="/",status="200"}' in out)
+        assert("# TYPE kubam_http_requests_in_flight gauge" in out)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from helper import KubamError, ServerIndex, parse_server_dn
+from ucs import UCSUtil
+from ucsc import UCSCUtil
+
+
+def blade(chassis, slot, domain=None):
+    dn = "sys/chassis-{0}/blade-{1}".format(chassis, slot)
+    s = {"type": "blade", "chassis_id": chassis, "slot": slot, "oper_power": "on"}
+    if domain:
+        s["domain_id"] = domain
+        dn = "compute/sys-{0}/{1}".format(domain, dn[4:])
+    s["dn"] = dn
+    return s
+
+
+def rack(rack_id, domain=None):
+    dn = "sys/rack-unit-{0}".format(rack_id)
+    s = {"type": "rack", "rack_id": rack_id, "oper_power": "off"}
+    if domain:
+        s["domain_id"] = domain
+        dn = "compute/sys-{0}/{1}".format(domain, dn[4:])
+    s["dn"] = dn
+    return s
+
+
+class ServerIndexUnitTests(unittest.TestCase):
+    """Tests for the server dn parser and inventory index."""
+
+    def test_parse(self):
+        s = parse_server_dn("sys/chassis-12/blade-8/board/storage-SAS-1")
+        assert((s.domain, s.chassis, s.slot, s.rack) == (None, "12", "8", None))
+        s = parse_server_dn("compute/sys-10091/rack-unit-14")
+        assert((s.domain, s.chassis, s.slot, s.rack) == ("10091", None, None, "14"))
+        assert(parse_server_dn("compute/sys-10091/rack-unit-14") is s)
+
+    def test_ucsm(self):
+        servers = [blade("1", "1"), blade("1", "10"), blade("12", "3"), rack("1"), rack("11")]
+        selected = UCSUtil.servers_to_objects(servers, {"blades": ["12/3", "1/10"], "rack_servers": ["11"]})
+        assert([s["dn"] for s in selected] == ["sys/chassis-12/blade-3", "sys/chassis-1/blade-10",
+                                               "sys/rack-unit-11"])
+        assert(UCSUtil.servers_to_objects(servers, "all") == servers)
+        self.assertRaises(KubamError, UCSUtil.servers_to_objects, servers, {"blades": ["1/2"]})
+        self.assertRaises(KubamError, UCSUtil.servers_to_objects, servers, {"rack_servers": ["2"]})
+        out = UCSUtil.objects_to_servers(selected, ["oper_power"])
+        assert(out == {"blades": ["12/3: on", "1/10: on"], "rack_servers": ["11: off"]})
+        out = UCSUtil.dn_hash_to_out(dict((s["dn"], s["oper_power"]) for s in selected))
+        assert(out == {"blades": {"12/3": "on", "1/10": "on"}, "rack_servers": {"11": "off"}})
+        servers = UCSUtil.servers_to_api(servers, {"blades": ["1/10"], "rack_servers": ["1"]})
+        assert([s["dn"] for s in servers if s.get("selected")] == ["sys/chassis-1/blade-10", "sys/rack-unit-1"])
+
+    def test_ucsc(self):
+        servers = [blade("1", "1", "1009"), blade("1", "1", "10010"), blade("2", "12", "1009"),
+                   rack("3", "1009"), rack("3", "10010")]
+        selected = UCSCUtil.servers_to_objects(servers, {"blades": ["10010/1/1", "1009/2/12"],
+                                                         "rack_servers": ["10010/3"]})
+        assert([s["dn"] for s in selected] == ["compute/sys-10010/chassis-1/blade-1",
+                                               "compute/sys-1009/chassis-2/blade-12",
+                                               "compute/sys-10010/rack-unit-3"])
+        self.assertRaises(KubamError, UCSCUtil.servers_to_objects, servers, {"blades": ["1/1"]})
+        out = UCSCUtil.objects_to_servers(selected, ["oper_power"])
+        assert(out == {"blades": ["10010/1/1: on", "1009/2/12: on"], "rack_servers": ["10010/3: off"]})
+        out = UCSCUtil.dn_hash_to_out(dict((s["dn"], s["oper_power"]) for s in selected))
+        assert(out == {"blades": {"10010/1/1": "on", "1009/2/12": "on"}, "rack_servers": {"10010/3": "off"}})
+
+    def test_index(self):
+        index = ServerIndex([blade("1", "2"), rack("5"), {"dn": "sys/switch-A"}])
+        assert(len(index.find("blades", "1/2")) == 1)
+        assert(len(index.find("rack_servers", 5)) == 1)
+        assert(index.find("blades", "2/1") == [])
+        self.assertRaises(KubamError, UCSUtil.dn_hash_to_out, {"sys/switch-A": {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+import json
+import time
+import unittest
+from app import app
+from benchmark import ApiBenchmark
+from config import Const
+from db import YamlDB
+from monitor.watcher import Watcher
+from monitor import Inventory
+from emulator import UCSMEmulator
+
+
+class StreamUnitTests(unittest.TestCase):
+    """
+    Tests for the NDJSON streaming of the server listings, the server-sent install events and the
+    saved inventory.
+    """
+
+    def setUp(self):
+        # one UCS Manager emulator with 16 blades behind a scratch kubam.yaml.
+        self.bench = ApiBenchmark("small")
+        self.bench.setup()
+        self.sg = self.bench.config["server_groups"][0]["name"]
+        self.app = app.test_client()
+
+    def tearDown(self):
+        self.bench.teardown()
+
+    def get(self, path, body=None, **kwargs):
+        return self.app.get(Const.API_ROOT2 + "/servers/" + self.sg + path, content_type="application/json",
+                            data=json.dumps(body) if body else None, **kwargs)
+
+    @staticmethod
+    def records(response):
+        assert(response.status_code == 200)
+        assert(response.mimetype == "application/x-ndjson")
+        return [json.loads(l) for l in response.data.splitlines()]
+
+    def test_servers(self):
+        emulator = self.bench.emulators[0]
+        logouts = emulator.calls.get("aaaLogout", 0)
+        servers = self.records(self.get("/servers?stream=ndjson"))
+        assert(len(servers) == 16)
+        assert(servers[0]["dn"] == "sys/chassis-1/blade-1")
+        assert(servers[0]["selected"])
+        # logged out once the stream was read.
+        assert(emulator.calls["aaaLogout"] == logouts + 1)
+        plain = json.loads(self.get("/servers").data)["servers"]
+        assert(plain == servers)
+
+    def test_status(self):
+        wanted = {"servers": {"blades": ["2/1", "1/2"]}}
+        status = self.records(self.get("/status", wanted, headers={"Accept": "application/x-ndjson"}))
+        assert([(r["kind"], r["server"]) for r in status] == [("blades", "2/1"), ("blades", "1/2")])
+        assert(status[0]["status"]["dn"] == "sys/chassis-2/blade-1")
+        fsm = self.records(self.get("/fsm?stream=ndjson", wanted))
+        assert([r["server"] for r in fsm] == ["2/1", "1/2"])
+        assert("fsm" in fsm[0])
+        disks = self.records(self.get("/disks?stream=ndjson", wanted))
+        assert([len(r["disks"]) for r in disks] == [2, 2])
+        # an unknown server is still a plain 400.
+        response = self.get("/status?stream=ndjson", {"servers": {"blades": ["9/9"]}})
+        assert(response.status_code == 400)
+        # json unless streaming was asked for.
+        response = self.get("/status", wanted, headers={"Accept": "*/*"})
+        assert(response.mimetype == "application/json")
+
+    def test_first_record(self):
+        # the first server is written as soon as it has been read, before the rack servers are
+        # asked for, and streams are read from the domain rather than from the query cache.
+        emulator = self.bench.emulators[0]
+        sent = []
+        for _ in range(2):
+            before = emulator.calls.get("configResolveClass", 0)
+            response = self.get("/status?stream=ndjson", {"servers": "all"}, buffered=False)
+            lines = iter(response.response)
+            assert(json.loads(next(lines))["server"] == "1/1")
+            first = emulator.calls["configResolveClass"]
+            assert(len(list(lines)) == 15)
+            assert(emulator.calls["configResolveClass"] == first + 1)
+            sent.append(emulator.calls["configResolveClass"] - before)
+            response.close()
+        assert(sent[0] == sent[1])
+        # the fsm and disks of each server are asked for while the servers are still being read.
+        fsm = self.records(self.get("/fsm?stream=ndjson", {"servers": "all"}))
+        assert(len(fsm) == 16 and all("stages" in r["fsm"] for r in fsm))
+        disks = self.records(self.get("/disks?stream=ndjson", {"servers": "all"}))
+        assert(len(disks) == 16 and len(disks[0]["disks"]) == 2)
+
+    @staticmethod
+    def next_event(events):
+        for chunk in events:
+            if not chunk.startswith(":"):
+                lines = chunk.splitlines()
+                return lines[0][len("event: "):], json.loads(lines[1][len("data: "):])
+        return None, None
+
+    def test_events(self):
+        emulator = self.bench.emulators[0]
+        saved = Const.WATCH_SECONDS, Const.WATCH_KEEPALIVE
+        Const.WATCH_SECONDS, Const.WATCH_KEEPALIVE = 0.1, 0.5
+        logins = emulator.calls.get("aaaLogin", 0)
+        calls = sum(emulator.calls.values())
+        try:
+            first = self.get("/events", buffered=False)
+            assert(first.mimetype == "text/event-stream")
+            events = iter(first.response)
+            event, snapshot = self.next_event(events)
+            assert(event == "snapshot")
+            assert(len(snapshot) == 16)
+            # the FSMs of all the servers took a query per class, not one per server.
+            assert(sum(emulator.calls.values()) - calls < 16)
+            assert(snapshot[0]["server"] == "1/1")
+            # a second client, of another server group of the same domain, shares the watcher and
+            # its login.
+            config = dict(self.bench.config)
+            config["server_groups"] = config["server_groups"] + [dict(config["server_groups"][0], name="other")]
+            assert(YamlDB().write_config(config, Const.KUBAM_CFG)[0] == 0)
+            second = self.app.get(Const.API_ROOT2 + "/servers/other/events", buffered=False)
+            event, other = self.next_event(iter(second.response))
+            assert(event == "snapshot" and other == snapshot)
+            assert(len(Watcher.watchers) == 1)
+            assert(emulator.calls["aaaLogin"] == logins + 1)
+            second.close()
+
+            # longer FSMs, with the finished Discover FSMs left as they were.
+            for fsm in emulator.fsms.values():
+                fsm["start"] -= 0.5
+            emulator.fsm_seconds = 0.5
+            emulator.add("computeBlade", "sys/chassis-1/blade-3", operPower="on")
+            emulator.start_fsm("computeBlade", "sys/chassis-1/blade-3", "Associate")
+            seen = {}
+            stages = {}
+            deadline = time.time() + 10
+            while time.time() < deadline and not (len(stages) == len(UCSMEmulator.FSM_STAGES) and
+                                                  set(stages.values()) == set(["success"]) and
+                                                  seen.get("fsm", {}).get("fsm_status") == "nop"):
+                event, data = self.next_event(events)
+                assert(data["server"] == "1/3")
+                if event == "stage":
+                    assert(data["stage_status"] in ["nop", "inProgress", "success"])
+                    stages[data["name"]] = data["stage_status"]
+                seen[event] = data
+            assert(seen["power"] == {"server": "1/3", "oper_power": "on", "was": "off"})
+            assert(seen["fsm"]["current_fsm"] == "Associate")
+            assert(seen["fsm"]["fsm_status"] == "nop")
+            assert(set(stages.values()) == set(["success"]))
+            first.close()
+            deadline = time.time() + 5
+            while Watcher.watchers and time.time() < deadline:
+                time.sleep(0.1)
+            # the last client left and the watcher stopped.
+            assert(Watcher.watchers == {})
+        finally:
+            Const.WATCH_SECONDS, Const.WATCH_KEEPALIVE = saved
+
+    def wait_inventory(self):
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            response = self.get("/inventory")
+            inventory = json.loads(response.data)
+            if not inventory["refreshing"]:
+                return response.status_code, inventory
+            time.sleep(0.05)
+        assert(False)
+
+    def test_inventory(self):
+        emulator = self.bench.emulators[0]
+        saved = Const.INVENTORY_SECONDS
+        try:
+            # nothing is known yet, the inventory is taken in the background.
+            response = self.get("/inventory")
+            assert(response.status_code == 202)
+            assert(json.loads(response.data)["refreshing"])
+            status, inventory = self.wait_inventory()
+            assert(status == 200)
+            assert(not inventory["stale"] and inventory["error"] is None)
+            blades = inventory["servers"]["blades"]
+            assert(len(blades) == 16)
+            assert(blades["1/1"]["oper_power"] == "off")
+            assert(blades["1/1"]["fsm"]["fsm_status"] == "nop")
+            assert([d["id"] for d in blades["2/3"]["disks"]] == ["1", "2"])
+            assert(blades["2/3"]["disks"][0]["dn"].startswith("sys/chassis-2/blade-3/board/"))
+            # the disks and FSMs of all the servers took a query per class, not one per server.
+            assert(sum(emulator.calls.values()) < 16)
+
+            # a restart serves the saved inventory without asking the domain.
+            Inventory.groups.clear()
+            assert(Inventory.warm() == 1)
+            logins = emulator.calls["aaaLogin"]
+            response = self.get("/inventory")
+            assert(response.status_code == 200)
+            assert(json.loads(response.data)["servers"] == inventory["servers"])
+            assert(emulator.calls["aaaLogin"] == logins)
+
+            # one that is too old is served as it is while it is refreshed.
+            Const.INVENTORY_SECONDS = 0
+            emulator.add("computeBlade", "sys/chassis-1/blade-1", operPower="on")
+            response = json.loads(self.get("/inventory").data)
+            assert(response["stale"] and response["refreshing"])
+            assert(response["servers"]["blades"]["1/1"]["oper_power"] == "off")
+            Const.INVENTORY_SECONDS = saved
+            status, inventory = self.wait_inventory()
+            assert(inventory["servers"]["blades"]["1/1"]["oper_power"] == "on")
+            assert(emulator.calls["aaaLogin"] == logins + 1)
+        finally:
+            Const.INVENTORY_SECONDS = saved
+            Inventory.groups.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
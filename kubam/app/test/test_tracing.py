@@ -0,0 +1,48 @@
+import json
+import unittest
+from app import app
+from tracing import Tracer
+
+
+class TracingUnitTests(unittest.TestCase):
+    """Tests for request tracing."""
+
+    def test_spans(self):
+        Tracer.begin("test")
+        with Tracer.span("outer", host="node1"):
+            with Tracer.span("inner"):
+                pass
+        assert(Tracer.call(["true"]) == 0)
+        trace = Tracer.end(status=200)
+        assert([s["name"] for s in trace["spans"]] == ["inner", "outer", "exec true"])
+        assert(trace["spans"][0]["depth"] == 1)
+        assert(trace["spans"][1]["args"] == {"host": "node1"})
+        assert(Tracer.get(trace["id"]) is trace)
+
+    def test_instrument_handle(self):
+        class Handle(object):
+            def query_classid(self, class_id):
+                return []
+
+        Tracer.begin("test")
+        h = Tracer.instrument_handle(Handle())
+        h.query_classid("computeBlade")
+        trace = Tracer.end()
+        assert(trace["spans"][0]["name"] == "sdk query_classid")
+        assert("computeBlade" in trace["spans"][0]["args"]["argv"])
+
+    def test_api(self):
+        tester = app.test_client(self)
+        response = tester.get('/', content_type='application/json')
+        trace_id = response.headers.get("X-Kubam-Trace-Id")
+        assert(trace_id)
+        response = tester.get('/api/v2/traces/' + trace_id)
+        self.assertEqual(response.status_code, 200)
+        trace = json.loads(response.data)["trace"]
+        assert(trace["name"] == "GET /")
+        response = tester.get('/api/v2/traces/nosuchtrace')
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
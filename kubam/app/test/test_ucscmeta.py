@@ -0,0 +1,70 @@
+import os
+import sys
+import imp
+import shutil
+import tempfile
+import importlib
+import unittest
+import ucscsdk.ucsccoremeta
+
+PATCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "patches", "ucscsdk")
+
+
+class UcscMetaUnitTests(unittest.TestCase):
+    """Tests for the compact ucscmeta index built from the patched UCS Central metadata."""
+
+    def setUp(self):
+        # a bare package with just the core meta module, the patched metadata as ucscmeta_full
+        # and the lazy ucscmeta, like the docker images install them.
+        self.work = tempfile.mkdtemp()
+        self.pkg = os.path.join(self.work, "kubam_ucscmeta_test")
+        os.mkdir(self.pkg)
+        open(os.path.join(self.pkg, "__init__.py"), "w").close()
+        shutil.copy(ucscsdk.ucsccoremeta.__file__.replace(".pyc", ".py"), self.pkg)
+        shutil.copy(os.path.join(PATCH_DIR, "ucscmeta.py"), os.path.join(self.pkg, "ucscmeta_full.py"))
+        shutil.copy(os.path.join(PATCH_DIR, "ucscmeta_lazy.py"), os.path.join(self.pkg, "ucscmeta.py"))
+        self.mkmetaindex = imp.load_source("mkmetaindex", os.path.join(PATCH_DIR, "mkmetaindex.py"))
+
+    def tearDown(self):
+        for m in [m for m in sys.modules if m.startswith("kubam_ucscmeta_test")]:
+            del sys.modules[m]
+        if self.work in sys.path:
+            sys.path.remove(self.work)
+        shutil.rmtree(self.work)
+
+    def test_index(self):
+        index_file, count = self.mkmetaindex.build(self.pkg)
+        assert(os.path.isfile(index_file))
+        full = importlib.import_module("kubam_ucscmeta_test.ucscmeta_full")
+        lazy = importlib.import_module("kubam_ucscmeta_test.ucscmeta")
+        assert(type(lazy.MO_CLASS_META).__name__ == "MoMetaIndex")
+        assert(count == len(full.MO_CLASS_META) == len(lazy.MO_CLASS_META))
+        assert(lazy.MO_CLASS_ID == full.MO_CLASS_ID)
+        assert(lazy.METHOD_CLASS_ID == full.METHOD_CLASS_ID)
+        assert("ConfigRemoteResolveChildren" in lazy.METHOD_CLASS_ID)
+        assert(lazy.OTHER_TYPE_CLASS_ID == full.OTHER_TYPE_CLASS_ID)
+        assert(str(lazy.VersionMeta.Version201b) == str(full.VersionMeta.Version201b))
+        assert("NoSuchClass" not in lazy.MO_CLASS_META)
+        assert(lazy.MO_CLASS_META.get("NoSuchClass") is None)
+        for class_id, f in full.MO_CLASS_META.items():
+            m = lazy.MO_CLASS_META[class_id]
+            assert((m.name, m.xml_attribute, m.rn, str(m.version), m.inp_out, m.mask, m.field_names, m.access,
+                    m.parents, m.children, m.verbs) ==
+                   (f.name, f.xml_attribute, f.rn, str(f.version), f.inp_out, f.mask, f.field_names, f.access,
+                    f.parents, f.children, f.verbs))
+        # decoded once, then the same object.
+        assert(lazy.MO_CLASS_META["ComputeBlade"] is lazy.MO_CLASS_META["ComputeBlade"])
+
+    def test_stale_index(self):
+        self.mkmetaindex.build(self.pkg)
+        full_file = os.path.join(self.pkg, "ucscmeta_full.py")
+        st = os.stat(full_file)
+        os.utime(full_file, (st.st_atime, st.st_mtime + 10))
+        lazy = importlib.import_module("kubam_ucscmeta_test.ucscmeta")
+        # falls back to the full module.
+        assert(isinstance(lazy.MO_CLASS_META, dict))
+        assert("ComputeBlade" in lazy.MO_CLASS_META)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,2 @@
+from tracer import Tracer
+from tracing import tracing
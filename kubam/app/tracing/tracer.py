@@ -0,0 +1,121 @@
+import time
+import uuid
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from contextlib import contextmanager
+from config import Const
+
+log = logging.getLogger("kubam.trace")
+
+
+class Tracer(object):
+    """
+    Collects timed spans for the request being served on the current thread.  SDK handle calls
+    and external commands are recorded with their arguments, finished traces are kept in memory
+    for the traces API and any span slower than Const.TRACE_SLOW_SECONDS is logged.
+    """
+    local = threading.local()
+    lock = threading.Lock()
+    traces = OrderedDict()
+    SDK_CALLS = ["query_classid", "query_dn", "query_dns", "query_children", "commit", "process_xml_elem", "rawXML"]
+
+    @staticmethod
+    def begin(name):
+        trace = {"id": uuid.uuid4().hex, "name": name, "start": time.time(), "duration": None, "spans": []}
+        Tracer.local.trace = trace
+        Tracer.local.depth = 0
+        return trace
+
+    @staticmethod
+    def end(**attrs):
+        trace = getattr(Tracer.local, "trace", None)
+        if trace is None:
+            return None
+        Tracer.local.trace = None
+        trace["duration"] = time.time() - trace["start"]
+        trace.update(attrs)
+        with Tracer.lock:
+            Tracer.traces[trace["id"]] = trace
+            while len(Tracer.traces) > Const.TRACE_KEEP:
+                Tracer.traces.popitem(last=False)
+        return trace
+
+    @staticmethod
+    def get(trace_id):
+        with Tracer.lock:
+            return Tracer.traces.get(trace_id)
+
+    @staticmethod
+    def list():
+        with Tracer.lock:
+            traces = list(Tracer.traces.values())
+        return [dict((k, v) for k, v in t.items() if k != "spans") for t in reversed(traces)]
+
+    @staticmethod
+    @contextmanager
+    def span(name, **args):
+        trace = getattr(Tracer.local, "trace", None)
+        depth = getattr(Tracer.local, "depth", 0)
+        Tracer.local.depth = depth + 1
+        start = time.time()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            Tracer.local.depth = depth
+            duration = time.time() - start
+            s = {"name": name, "args": args, "offset": start - trace["start"] if trace else 0,
+                 "duration": duration, "depth": depth}
+            if error:
+                s["error"] = error
+            if trace is not None:
+                trace["spans"].append(s)
+            if duration >= Const.TRACE_SLOW_SECONDS:
+                log.warning("slow %s took %.3fs: %s", name, duration, args)
+
+    @staticmethod
+    def call(args, **kwargs):
+        """
+        subprocess.call that records the command as a span.
+        """
+        with Tracer.span("exec " + args[0], argv=" ".join(args)):
+            return subprocess.call(args, **kwargs)
+
+    @staticmethod
+    def wrap(fn):
+        """
+        Run fn with the trace of the calling thread, for work handed off to a thread pool.
+        """
+        trace = getattr(Tracer.local, "trace", None)
+
+        def wrapper(*args, **kwargs):
+            Tracer.local.trace = trace
+            Tracer.local.depth = 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                Tracer.local.trace = None
+        return wrapper
+
+    @staticmethod
+    def traced(fn, call):
+        def wrapper(*args, **kwargs):
+            a = [repr(x)[:200] for x in args] + ["{0}={1}".format(k, repr(v)[:200]) for k, v in kwargs.items()]
+            with Tracer.span("sdk " + call, argv=", ".join(a)):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    @staticmethod
+    def instrument_handle(handle):
+        """
+        Record every query and commit made through this SDK handle as a span.
+        """
+        for call in Tracer.SDK_CALLS:
+            if hasattr(handle, call):
+                setattr(handle, call, Tracer.traced(getattr(handle, call), call))
+        return handle
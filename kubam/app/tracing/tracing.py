@@ -0,0 +1,39 @@
+from flask import Blueprint, jsonify, request
+from flask_cors import cross_origin
+from config import Const
+from tracer import Tracer
+
+tracing = Blueprint("tracing", __name__)
+
+
+@tracing.before_app_request
+def start_trace():
+    # Don't let polling the traces or metrics push the interesting requests out.
+    if request.path == "/metrics" or request.path.startswith(Const.API_ROOT2 + "/traces"):
+        return
+    Tracer.begin("{0} {1}".format(request.method, request.path))
+
+
+@tracing.after_app_request
+def end_trace(response):
+    trace = Tracer.end(status=response.status_code)
+    if trace:
+        response.headers["X-Kubam-Trace-Id"] = trace["id"]
+    return response
+
+
+# List the most recent request traces
+@tracing.route(Const.API_ROOT2 + "/traces", methods=["GET"])
+@cross_origin()
+def list_traces():
+    return jsonify({"traces": Tracer.list()}), Const.HTTP_OK
+
+
+# Get the spans of one request
+@tracing.route(Const.API_ROOT2 + "/traces/<trace_id>", methods=["GET"])
+@cross_origin()
+def get_trace(trace_id):
+    trace = Tracer.get(trace_id)
+    if trace is None:
+        return jsonify({"error": "trace {0} not found".format(trace_id)}), Const.HTTP_NOT_FOUND
+    return jsonify({"trace": trace}), Const.HTTP_OK
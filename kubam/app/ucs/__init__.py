@@ -1,7 +1,10 @@
-from ucs_monitor import UCSMonitor
-from ucs_net import UCSNet
-from ucs_profile import UCSProfile
-from ucs_server import UCSServer
-from ucs_session import UCSSession
-from ucs_template import UCSTemplate
-from ucs_util import UCSUtil
+from helper import LazyClass
+
+# ucsmsdk is only imported once one of these is used.
+UCSMonitor = LazyClass(__name__, "ucs_monitor", "UCSMonitor")
+UCSNet = LazyClass(__name__, "ucs_net", "UCSNet")
+UCSProfile = LazyClass(__name__, "ucs_profile", "UCSProfile")
+UCSServer = LazyClass(__name__, "ucs_server", "UCSServer")
+UCSSession = LazyClass(__name__, "ucs_session", "UCSSession")
+UCSTemplate = LazyClass(__name__, "ucs_template", "UCSTemplate")
+UCSUtil = LazyClass(__name__, "ucs_util", "UCSUtil")
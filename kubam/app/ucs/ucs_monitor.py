@@ -1,4 +1,9 @@
+from helper import XmlStream
+
+
 class UCSMonitor(object):
+    # the FSM classes of the servers, all asked for at once by fsm_status.
+    FSM_CLASSES = ["computeBladeFsm", "computeRackUnitFsm"]
 
     @staticmethod
     def get_status(handle, servers):
@@ -16,6 +21,21 @@ class UCSMonitor(object):
             all_r[s['dn']] = response
         return all_r
 
+    @staticmethod
+    def fsm_status(handle, servers):
+        """
+        Like get_status, with a query per FSM class rather than one per server.
+        :return: server dn -> the status of its FSM
+        """
+        dns = set(s['dn'] for s in servers)
+        all_r = dict()
+        for class_id in UCSMonitor.FSM_CLASSES:
+            for r in XmlStream.records(handle, "ucsm", class_id, XmlStream.FSM_FIELDS):
+                dn = r['dn'].rsplit("/fsm", 1)[0]
+                if dn in dns:
+                    all_r[dn] = dict((k, v) for k, v in r.items() if k != "dn")
+        return all_r
+
     @staticmethod
     def get_fsm(handle, server):
         fsm = handle.query_dn(server['dn'] + "/fsm")
@@ -1,12 +1,13 @@
 from ucsmsdk.ucsexception import UcsException
+from helper import DomainCache
 
 
 class UCSNet(object):
     @staticmethod
     def list_vlans(handle):
         filter_string = '(dn, "fabric/lan/net-[A-Za-z0-9]+", type="re")'
-        vlans = handle.query_classid("fabricVlan", filter_string)
-        return vlans
+        return DomainCache.get(DomainCache.of(handle), "vlans",
+                               lambda: handle.query_classid("fabricVlan", filter_string))
 
     @staticmethod
     def create_kube_macs(handle, org):
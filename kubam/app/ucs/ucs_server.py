@@ -1,5 +1,6 @@
 from ucsmsdk.ucsexception import UcsException
-from helper import KubamError
+from helper import KubamError, DomainCache, ServerIndex, XmlStream
+from config import Const
 
 
 
@@ -68,46 +69,124 @@ class UCSServer(object):
     
     @staticmethod
     def list_servers(handle):
+        return list(UCSServer.iter_servers(handle))
+
+    @staticmethod
+    def iter_servers(handle, stream=False):
+        """
+        The blades and rack servers, each turned into its API hash only when it is asked for.
+        They are decoded straight from the responses, without the SDK's objects.  With stream,
+        each one as soon as it has been read from the domain, not from the query cache, and the
+        rack servers are only asked for once the blades are done.
+        """
+        records = XmlStream.iter_records if stream else XmlStream.records
+        for s in records(handle, "ucsm", "computeBlade", XmlStream.SERVER_FIELDS):
+            yield UCSServer.record_to_api(s, "blade")
+        for s in records(handle, "ucsm", "computeRackUnit", XmlStream.SERVER_FIELDS):
+            yield UCSServer.record_to_api(s, "rack")
+
+    @staticmethod
+    def record_to_api(record, kind):
+        """
+        Like server_to_api, for a server record of XmlStream.SERVER_FIELDS.
+        """
+        server = dict(record, type=kind)
+        rn = record["dn"].split("/")[-1]
+        if kind == "blade":
+            server["slot"] = rn.replace("blade-", "")
+        else:
+            del server["chassis_id"]
+            server["rack_id"] = rn.replace("rack-unit-", "")
+        return server
+
+    @staticmethod
+    def server_to_api(s):
+        """
+        Turn a ComputeBlade or ComputeRackUnit into the hash the API uses for the server.
+        """
         from ucsmsdk.mometa.compute.ComputeRackUnit import ComputeRackUnit
         from ucsmsdk.mometa.compute.ComputeBlade import ComputeBlade
+        if type(s) is ComputeBlade:
+            return {
+                'type': "blade",
+                'label': s.usr_lbl,
+                'chassis_id': s.chassis_id,
+                'slot': s.rn.replace("blade-", ""),
+                'model': s.model,
+                'association': s.association,
+                'service_profile': s.assigned_to_dn,
+                'ram_speed': s.memory_speed,
+                'num_cpus': s.num_of_cpus,
+                'num_cores': s.num_of_cores,
+                'ram': s.total_memory,
+                'dn': s.dn,
+                'oper_power': s.oper_power
+            }
+        if type(s) is ComputeRackUnit:
+            return {
+                'type': "rack",
+                'label': s.usr_lbl,
+                'rack_id': s.rn.replace("rack-unit-", ""),
+                'model': s.model, 'association': s.association,
+                'service_profile': s.assigned_to_dn,
+                'ram_speed': s.memory_speed,
+                'num_cpus': s.num_of_cpus,
+                'num_cores': s.num_of_cores,
+                'ram': s.total_memory,
+                'dn': s.dn,
+                'oper_power': s.oper_power
+            }
+        return None
+
+    @staticmethod
+    def server_dn(kind, name):
+        """
+        The dn of a server from its API name: chassis/slot for blades, the rack id for rack servers.
+        """
+        parts = str(name).split("/")
+        if kind == "blades" and len(parts) == 2:
+            return "sys/chassis-{0}/blade-{1}".format(*parts)
+        if kind == "rack_servers" and len(parts) == 1:
+            return "sys/rack-unit-{0}".format(*parts)
+        raise KubamError("server {0} does not exist.".format(name))
+
+    @staticmethod
+    def stream_selected_servers(handle, servers):
+        """
+        Like list_selected_servers, but "all" the servers are streamed with iter_servers as they
+        are read.  Servers asked for by name are fetched, and checked, before anything is streamed.
+        """
+        if servers == "all":
+            return UCSServer.iter_servers(handle, True)
+        return UCSServer.list_selected_servers(handle, servers)
+
+    @staticmethod
+    def list_selected_servers(handle, servers):
+        """
+        Like list_servers followed by UCSUtil.servers_to_objects, but only the servers we
+        want are fetched from UCS, by their dns.  For "all" or more than
+        Const.SERVER_QUERY_MAX_DNS servers everything is fetched and filtered instead.
+        """
+        if servers == "all":
+            return UCSServer.list_servers(handle)
+        names = [(k, n) for k in ["blades", "rack_servers"] for n in servers.get(k, [])]
+        if len(names) > Const.SERVER_QUERY_MAX_DNS:
+            return ServerIndex(UCSServer.list_servers(handle)).select(servers)
+        selected = []
+        if not names:
+            return selected
+        dns = [UCSServer.server_dn(k, n) for k, n in names]
+        try:
+            mos = handle.query_dns(dns)
+        except UcsException as err:
+            raise KubamError("{0}".format(err))
+        for dn, (_, name) in zip(dns, names):
+            server = mos.get(dn) and UCSServer.server_to_api(mos[dn])
+            if not server:
+                raise KubamError("server {0} does not exist.".format(name))
+            selected.append(server)
+        return selected
 
-        blades = handle.query_classid(class_id="ComputeBlade")
-        servers = handle.query_classid(class_id="ComputeRackUnit")
-        m = blades + servers
-        all_servers = []
-        for i, s in enumerate(m):
-            if type(s) is ComputeBlade:
-                all_servers.append({
-                    'type': "blade",
-                    'label': s.usr_lbl,
-                    'chassis_id': s.chassis_id,
-                    'slot': s.rn.replace("blade-", ""),
-                    'model': s.model,
-                    'association': s.association,
-                    'service_profile': s.assigned_to_dn,
-                    'ram_speed': s.memory_speed,
-                    'num_cpus': s.num_of_cpus,
-                    'num_cores': s.num_of_cores,
-                    'ram': s.total_memory,
-                    'dn': s.dn,
-                    'oper_power': s.oper_power
-                })
-            if type(s) is ComputeRackUnit:
-                all_servers.append({
-                    'type': "rack",
-                    'label': s.usr_lbl,
-                    'rack_id': s.rn.replace("rack-unit-", ""),
-                    'model': s.model, 'association': s.association,
-                    'service_profile': s.assigned_to_dn,
-                    'ram_speed': s.memory_speed,
-                    'num_cpus': s.num_of_cpus,
-                    'num_cores': s.num_of_cores,
-                    'ram': s.total_memory,
-                    'dn': s.dn,
-                    'oper_power': s.oper_power
-                })
-        return all_servers
-   
     @staticmethod
     def list_blade(handle, server):
         chassis, slot = server.split("/")
@@ -138,6 +217,14 @@ class UCSServer(object):
                 all_disks.append(d)
         return all_disks
 
+    @staticmethod
+    def disk_records(handle, server):
+        """
+        Like list_disks, as records of XmlStream.DISK_FIELDS, in one query.
+        """
+        query = "(dn, \"{0}/board.*\", type=\"re\")".format(server["dn"])
+        return XmlStream.records(handle, "ucsm", "storageLocalDisk", XmlStream.DISK_FIELDS, query)
+
     # Reset the disks of a specific server to unconfigured good, so they can be used
     @staticmethod
     def reset_disks(handle, server):
@@ -423,6 +510,7 @@ class UCSServer(object):
                 return 1, err.error_descr
         except Exception as e:
             return 1, e
+        DomainCache.invalidate(DomainCache.of(handle), "templates")
         return 0, None
 
     @staticmethod
@@ -436,6 +524,7 @@ class UCSServer(object):
             print "\talready deleted"
         except UcsException as err:
             return 1, err.error_descr
+        DomainCache.invalidate(DomainCache.of(handle), "templates")
         return 0, None
 
     @staticmethod
@@ -649,7 +738,7 @@ class UCSServer(object):
         except AttributeError:
             print "\talready associated"
         except UcsException as err:
-                return 1, sp_name + ": " + err.error_descr
+                return 1, sp + ": " + err.error_descr
         return 0, None
 
     @staticmethod
@@ -1,6 +1,6 @@
 from ucsmsdk.ucshandle import UcsHandle
 from ucsmsdk.ucsexception import UcsException
-from helper import KubamError
+from helper import KubamError, DomainCache, DomainGuard, QueryCache
 import socket
 from urllib2 import HTTPError
 
@@ -9,9 +9,13 @@ class UCSSession(object):
     # Get the current firmware version.  Returns something like: 3.1(2b)
     @staticmethod
     def get_version(handle):
-        dn = "sys/mgmt/fw-system"
-        firmware = handle.query_dn(dn)
-        return firmware.version
+        def load():
+            # the SDK reads the version when it logs in, query it only if that didn't work.
+            try:
+                return str(handle.version)
+            except AttributeError:
+                return handle.query_dn("sys/mgmt/fw-system").version
+        return DomainCache.get(DomainCache.of(handle), "firmware", load)
 
     def ensure_version(self, handle):
         version = self.get_version(handle)
@@ -19,22 +23,33 @@ class UCSSession(object):
             return None
         return "Unsupported UCS firmware version: {0}. Please update to at least 3.0".format(version)
 
-    # Returns handle or error message
-    def login(self, username, password, server):
+    # Returns handle or error message.  A port other than 443 is spoken to over plain http.
+    def login(self, username, password, server, port=None):
+        guard = DomainGuard.of(DomainCache.domain("ucsm", server, port))
+        msg = guard.check()
+        if msg:
+            return None, msg
         # Test if the server reachable
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.settimeout(2)
         try:
-            result = s.connect_ex((server, 80))
+            result = s.connect_ex((server, int(port or 80)))
             if result != 0:
+                guard.failure()
                 return None, "{0} is not reachable".format(server)
             s.close()
         except socket.error as err:
+            guard.failure()
             return None, "UCS Login Error: {0} {1}".format(server, err.strerror)
 
-        handle = UcsHandle(server, username, password)
+        if port:
+            handle = UcsHandle(server, username, password, port=int(port), secure=int(port) == 443)
+        else:
+            handle = UcsHandle(server, username, password)
         try:
-            handle.login()
+            guard.call(handle.login, retry=True)
+        except KubamError as err:
+            return None, str(err)
         except UcsException as err:
             print "Login Error: " + err.error_descr
             return None, err.error_descr
@@ -46,6 +61,9 @@ class UCSSession(object):
             print e
             return None, "Issue logging in. Please check that all parameters are correct."
 
+        handle.kubam_domain = guard.domain
+        guard.instrument_handle(handle)
+        QueryCache.instrument_handle(handle)
         msg = self.ensure_version(handle)
         return handle, msg
 
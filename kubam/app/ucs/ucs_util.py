@@ -1,8 +1,11 @@
+import time
 from ucsmsdk.ucsexception import UcsException
 from ucs_session import UCSSession
 from db import YamlDB
 from config import Const
-from helper import KubamError
+from helper import KubamError, DomainCache, ServerIndex, server_name
+from metrics import Metrics
+from tracing import Tracer
 
 
 class UCSUtil(object):
@@ -23,11 +26,15 @@ class UCSUtil(object):
                 if err == 1:
                     raise KubamError(msg)
 
-                h, msg = ucs_session.login(credentials['user'], password, credentials['ip'])
+                start = time.time()
+                h, msg = ucs_session.login(credentials['user'], password, credentials['ip'], credentials.get('port'))
+                Metrics.observe("kubam_login_seconds", time.time() - start, platform="ucsm",
+                                server_group=server_group.get("name", ""), result="error" if msg or not h else "ok")
                 if msg:
                     raise KubamError(msg)
                 if h:
-                    return h
+                    h = Metrics.instrument_handle(h, "ucsm", server_group.get("name", ""))
+                    return Tracer.instrument_handle(h)
                 else:
                     raise KubamError("Not logged in into UCS")
             else:
@@ -83,7 +90,7 @@ class UCSUtil(object):
         if ip == "":
             raise KubamError("Please enter a valid UCSM IP address.")
         ucs_session = UCSSession()
-        h, err = ucs_session.login(user, pw, ip)
+        h, err = ucs_session.login(user, pw, ip, request['credentials'].get('port'))
         if not h:
             raise KubamError(err)
         UCSSession.logout(h)
@@ -102,6 +109,7 @@ class UCSUtil(object):
                 print "\tOrganization already exists."
             else:
                 return 1, err.error_descr
+        DomainCache.get(DomainCache.of(handle), "orgs", set).add(org)
         return 0, ""
 
     # org should not have org-<name> prepended."
@@ -126,6 +134,7 @@ class UCSUtil(object):
             handle.commit()
         except AttributeError:
             print "\talready deleted"
+        DomainCache.invalidate(DomainCache.of(handle), "orgs")
 
     def get_full_org(self, handle):
         db = YamlDB()
@@ -140,7 +149,8 @@ class UCSUtil(object):
         else:
             full_org = "org-root/org-" + org
 
-        if org != "root":
+        # the org is created once per domain, the orgs that exist are cached.
+        if org != "root" and org not in DomainCache.get(DomainCache.of(handle), "orgs", set):
             err, msg = self.create_org(handle, org)
         return err, msg, full_org
 
@@ -166,23 +176,24 @@ class UCSUtil(object):
     # See if there are any selected servers in the database
     @staticmethod
     def servers_to_api(ucs_servers, db_servers):
-        for i, real_server in enumerate(ucs_servers):
+        return list(UCSUtil.mark_selected(ucs_servers, db_servers))
+
+    @staticmethod
+    def mark_selected(ucs_servers, db_servers):
+        """
+        Yields the servers, with 'selected' set on the ones selected in the database.
+        """
+        blades = set(db_servers.get("blades", []))
+        # servers_to_db stores rack servers as rack_servers, older configs used rack.
+        racks = set(str(r) for r in db_servers.get("rack_servers", db_servers.get("rack", [])))
+        for real_server in ucs_servers:
             if real_server['type'] == "blade":
-                if "blades" in db_servers:
-                    for b in db_servers['blades']:
-                        b_parts = b.split("/")
-                        if (len(b_parts) == 2 and
-                                real_server['chassis_id'] == b_parts[0] and
-                                real_server['slot'] == b_parts[1]):
-                            real_server['selected'] = True
-                            ucs_servers[i] = real_server
+                if "{0}/{1}".format(real_server['chassis_id'], real_server['slot']) in blades:
+                    real_server['selected'] = True
             elif real_server['type'] == "rack":
-                if "rack" in db_servers:
-                    for s in db_servers['rack']:
-                        if real_server['rack_id'] == s:
-                            real_server['selected'] = True
-                            ucs_servers[i] = real_server
-        return ucs_servers
+                if str(real_server['rack_id']) in racks:
+                    real_server['selected'] = True
+            yield real_server
 
 
     @staticmethod
@@ -196,50 +207,14 @@ class UCSUtil(object):
         # of them. 
         if servers == "all":
             return objects
-
-        r_s = [] 
-        if "blades" in servers:
-            for s in servers["blades"]:
-                found = False
-                b_parts = s.split("/")
-                for real in objects:
-                    if not "chassis_id" in real:
-                        continue
-                    if (real['chassis_id'] ==  b_parts[0] and
-                       real['slot'] == b_parts[1] ):
-                        found = True
-                        r_s.append(real)
-                if not found:
-                    raise KubamError("server {0} does not exist.".format(s))
-        if "rack_servers" in servers:
-            for s in servers["rack_servers"]:
-                found = False
-                for real in objects:
-                    if not "rack_id" in real:
-                        continue
-                    if real['rack_id'] == s:
-                        found = True
-                        r_s.append(real)
-                if not found:
-                    raise KubamError("server {0} does not exist.".format(s))
-        return r_s
+        return ServerIndex(objects).select(servers)
 
     @staticmethod
     def objects_to_servers(servers, attribs):
-        blades = []
-        rack_mounts = []
         all_return = {}
         for s in servers:
-            parts = [x for x in s["dn"] if x.isdigit()]
-            if "chassis" in s["dn"]:
-                blades.append("{0}/{1}: {2}".format(parts[0], parts[1], ",".join([ s[p] for p in attribs] )))
-            else:
-                parts = "".join(parts)
-                rack_mounts.append("{0}: {1}".format(parts, ",".join([ s[p] for p in attribs] )))
-        if blades:
-            all_return["blades"] = blades
-        if rack_mounts:
-            all_return["rack_servers"] = rack_mounts
+            kind, name = server_name(s["dn"])
+            all_return.setdefault(kind, []).append("{0}: {1}".format(name, ",".join([ s[p] for p in attribs] )))
         return all_return
 
     @staticmethod
@@ -262,18 +237,8 @@ class UCSUtil(object):
             [...]
         }
         """
-        blades = {}
-        rack_mounts = {}
         all_return = {}
         for s in dn_hash.keys():
-            parts = [x for x in s if x.isdigit()]
-            if "chassis" in s:
-                blades["{0}/{1}".format(parts[0], parts[1])] = dn_hash[s]
-            else:
-                parts = "".join(parts)
-                rack_mounts["{0}".format(parts)] = dn_hash[s]
-        if blades:
-            all_return["blades"] = blades
-        if rack_mounts:
-            all_return["rack_servers"] = rack_mounts
+            kind, name = server_name(s)
+            all_return.setdefault(kind, {})[name] = dn_hash[s]
         return all_return
@@ -1,6 +1,9 @@
-from ucsc_util import UCSCUtil
-from ucsc_session import UCSCSession
-from ucsc_server import UCSCServer
-from ucsc_equipment import UCSCEquipment
-from ucsc_template import UCSCTemplate
-from ucsc_monitor import UCSCMonitor
+from helper import LazyClass
+
+# ucscsdk and its metadata are only imported once one of these is used.
+UCSCUtil = LazyClass(__name__, "ucsc_util", "UCSCUtil")
+UCSCSession = LazyClass(__name__, "ucsc_session", "UCSCSession")
+UCSCServer = LazyClass(__name__, "ucsc_server", "UCSCServer")
+UCSCEquipment = LazyClass(__name__, "ucsc_equipment", "UCSCEquipment")
+UCSCTemplate = LazyClass(__name__, "ucsc_template", "UCSCTemplate")
+UCSCMonitor = LazyClass(__name__, "ucsc_monitor", "UCSCMonitor")
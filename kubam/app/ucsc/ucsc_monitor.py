@@ -19,6 +19,16 @@ class UCSCMonitor(object):
             all_r[s['dn']] = response
         return all_r
 
+    @staticmethod
+    def fsm_status(handle, servers):
+        """
+        Like get_status, leaving out the servers without an FSM.  UCS Central servers are asked
+        for one after the other.
+        :return: server dn -> the status of its FSM
+        """
+        all_r = UCSCMonitor.get_status(handle, servers)
+        return dict((dn, fsm) for dn, fsm in all_r.items() if isinstance(fsm, dict))
+
     @staticmethod
     def get_fsm(handle, server):
         from ucscsdk.mometa.fsm.FsmStatus import FsmStatus
@@ -1,4 +1,5 @@
-from helper import KubamError
+from helper import KubamError, ServerIndex, XmlStream
+from config import Const
 from ucscsdk.ucscexception import UcscException
 import re
 
@@ -44,48 +45,126 @@ class UCSCServer(object):
 
     @staticmethod
     def list_servers(handle):
+        return list(UCSCServer.iter_servers(handle))
+
+    @staticmethod
+    def iter_servers(handle, stream=False):
+        """
+        The blades and rack servers, each turned into its API hash only when it is asked for.
+        They are decoded straight from the responses, without the SDK's objects.  With stream,
+        each one as soon as it has been read from the domain, not from the query cache, and the
+        rack servers are only asked for once the blades are done.
+        """
+        records = XmlStream.iter_records if stream else XmlStream.records
+        for s in records(handle, "ucsc", "computeBlade", XmlStream.SERVER_FIELDS):
+            yield UCSCServer.record_to_api(s, "blade")
+        for s in records(handle, "ucsc", "computeRackUnit", XmlStream.SERVER_FIELDS):
+            yield UCSCServer.record_to_api(s, "rack")
+
+    @staticmethod
+    def record_to_api(record, kind):
+        """
+        Like server_to_api, for a server record of XmlStream.SERVER_FIELDS.
+        """
+        server = dict(record, type=kind, domain_id=re.search('.*sys-(.+?)/.*', record["dn"]).group(1))
+        rn = record["dn"].split("/")[-1]
+        if kind == "blade":
+            server["slot"] = rn.replace("blade-", "")
+        else:
+            del server["chassis_id"]
+            server["rack_id"] = rn.replace("rack-unit-", "")
+        return server
+
+    @staticmethod
+    def server_to_api(s):
+        """
+        Turn a ComputeBlade or ComputeRackUnit into the hash the API uses for the server.
+        """
         from ucscsdk.mometa.compute.ComputeRackUnit import ComputeRackUnit
         from ucscsdk.mometa.compute.ComputeBlade import ComputeBlade
+        if type(s) is ComputeBlade:
+            return {
+                'type': "blade",
+                'label': s.usr_lbl,
+                'ram': s.total_memory,
+                'domain_id': re.search('.*sys-(.+?)/.*', s.dn).group(1),
+                'ram_speed': s.memory_speed,
+                'num_cpus': s.num_of_cpus,
+                'num_cores': s.num_of_cores,
+                'chassis_id': s.chassis_id,
+                'slot': s.rn.replace("blade-", ""),
+                'model': s.model,
+                'association': s.association,
+                'service_profile': s.assigned_to_dn,
+                'dn': s.dn,
+                'oper_power': s.oper_power
+            }
+        if type(s) is ComputeRackUnit:
+            return {
+                'type': "rack",
+                'label': s.usr_lbl,
+                'ram': s.total_memory,
+                'domain_id': re.search('.*sys-(.+?)/.*', s.dn).group(1),
+                'ram_speed': s.memory_speed,
+                'num_cpus': s.num_of_cpus,
+                'num_cores': s.num_of_cores,
+                'rack_id': s.rn.replace("rack-unit-", ""),
+                'model': s.model, 'association': s.association,
+                'service_profile': s.assigned_to_dn,
+                'dn': s.dn,
+                'oper_power': s.oper_power
+            }
+        return None
+
+    @staticmethod
+    def server_dn(kind, name):
+        """
+        The dn of a server from its API name: domain/chassis/slot for blades, domain/rack for rack servers.
+        """
+        parts = str(name).split("/")
+        if kind == "blades" and len(parts) == 3:
+            return "compute/sys-{0}/chassis-{1}/blade-{2}".format(*parts)
+        if kind == "rack_servers" and len(parts) == 2:
+            return "compute/sys-{0}/rack-unit-{1}".format(*parts)
+        raise KubamError("server {0} does not exist.".format(name))
+
+    @staticmethod
+    def stream_selected_servers(handle, servers):
+        """
+        Like list_selected_servers, but "all" the servers are streamed with iter_servers as they
+        are read.  Servers asked for by name are fetched, and checked, before anything is streamed.
+        """
+        if servers == "all":
+            return UCSCServer.iter_servers(handle, True)
+        return UCSCServer.list_selected_servers(handle, servers)
+
+    @staticmethod
+    def list_selected_servers(handle, servers):
+        """
+        Like list_servers followed by UCSCUtil.servers_to_objects, but only the servers we
+        want are fetched from UCS Central, by their dns.  For "all" or more than
+        Const.SERVER_QUERY_MAX_DNS servers everything is fetched and filtered instead.
+        """
+        if servers == "all":
+            return UCSCServer.list_servers(handle)
+        names = [(k, n) for k in ["blades", "rack_servers"] for n in servers.get(k, [])]
+        if len(names) > Const.SERVER_QUERY_MAX_DNS:
+            return ServerIndex(UCSCServer.list_servers(handle), domains=True).select(servers)
+        selected = []
+        if not names:
+            return selected
+        dns = [UCSCServer.server_dn(k, n) for k, n in names]
+        try:
+            mos = handle.query_dns(dns)
+        except UcscException as err:
+            raise KubamError("{0}".format(err))
+        for dn, (_, name) in zip(dns, names):
+            server = mos.get(dn) and UCSCServer.server_to_api(mos[dn])
+            if not server:
+                raise KubamError("server {0} does not exist.".format(name))
+            selected.append(server)
+        return selected
 
-        blades = handle.query_classid(class_id="ComputeBlade")
-        servers = handle.query_classid(class_id="ComputeRackUnit")
-        m = blades + servers
-        all_servers = []
-        for i, s in enumerate(m):
-            if type(s) is ComputeBlade:
-                all_servers.append({
-                    'type': "blade",
-                    'label': s.usr_lbl,
-                    'ram': s.total_memory,
-                    'domain_id': re.search('.*sys-(.+?)/.*', s.dn).group(1),
-                    'ram_speed': s.memory_speed,
-                    'num_cpus': s.num_of_cpus,
-                    'num_cores': s.num_of_cores,
-                    'chassis_id': s.chassis_id,
-                    'slot': s.rn.replace("blade-", ""),
-                    'model': s.model,
-                    'association': s.association,
-                    'service_profile': s.assigned_to_dn,
-                    'dn': s.dn,
-                    'oper_power': s.oper_power
-                })
-            if type(s) is ComputeRackUnit:
-                all_servers.append({
-                    'type': "rack",
-                    'label': s.usr_lbl,
-                    'ram': s.total_memory,
-                    'domain_id': re.search('.*sys-(.+?)/.*', s.dn).group(1),
-                    'ram_speed': s.memory_speed,
-                    'num_cpus': s.num_of_cpus,
-                    'num_cores': s.num_of_cores,
-                    'rack_id': s.rn.replace("rack-unit-", ""),
-                    'model': s.model, 'association': s.association,
-                    'service_profile': s.assigned_to_dn,
-                    'dn': s.dn,
-                    'oper_power': s.oper_power
-                })
-        return all_servers
-    
     @staticmethod
     def list_templates(handle):
 
@@ -138,7 +217,7 @@ class UCSCServer(object):
         except AttributeError:
             print "\talready associated."
         except UcscException as err:
-                return 1, sp_name + ": " + err.error_descr
+                return 1, sp + ": " + err.error_descr
         return 0, None
 
     @staticmethod
@@ -149,7 +228,7 @@ class UCSCServer(object):
         try:
             handle.commit()
         except UcscException as err:
-                return 1, sp_name + ": " + err.error_descr
+                return 1, sp + ": " + err.error_descr
         
 
     @staticmethod
@@ -336,6 +415,14 @@ class UCSCServer(object):
                 all_disks.append(d)
         return all_disks
 
+    @staticmethod
+    def disk_records(handle, server):
+        """
+        Like list_disks, as records of XmlStream.DISK_FIELDS, in one query.
+        """
+        query = "(dn, \"{0}/board.*\", type=\"re\")".format(server["dn"])
+        return XmlStream.records(handle, "ucsc", "storageLocalDisk", XmlStream.DISK_FIELDS, query)
+
     @staticmethod
     def reset_disks(handle, server):
         """
@@ -1,6 +1,6 @@
 from ucscsdk.ucschandle import UcscHandle
 from ucscsdk.ucscexception import UcscException
-from helper import KubamError
+from helper import KubamError, DomainCache, DomainGuard, QueryCache
 import socket
 from urllib2 import HTTPError
 
@@ -9,20 +9,29 @@ class UCSCSession(object):
     # Get the current firmware version.  Returns something like: 3.1(2b)
 
     # Returns handle or error message
-    def login(self, username, password, server):
+    def login(self, username, password, server, port=None):
+        port = int(port or 443)
+        guard = DomainGuard.of(DomainCache.domain("ucsc", server, port))
+        msg = guard.check()
+        if msg:
+            return None, msg
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.settimeout(20)
         try:
-            result = s.connect_ex((server, 443))
+            result = s.connect_ex((server, port))
             if result != 0:
-                return None, "{0} on port 443 is not reachable.".format(server)
+                guard.failure()
+                return None, "{0} on port {1} is not reachable.".format(server, port)
             s.close()
         except Exception as e:
+            guard.failure()
             return None, "UCS Central connection error: {0} {1}".format(server, e)
             
-        handle = EUcscHandle(server, username, password)
+        handle = EUcscHandle(server, username, password, port)
         try:
-            handle.login()
+            guard.call(handle.login, retry=True)
+        except KubamError as err:
+            return None, str(err)
         except UcscException as err:
             print "Login Error: " + err.error_descr
             return None, err.error_descr
@@ -34,6 +43,9 @@ class UCSCSession(object):
             print e
             return None, "Issue logging in: {0}".format(str(e))
 
+        handle.kubam_domain = guard.domain
+        guard.instrument_handle(handle)
+        QueryCache.instrument_handle(handle)
         return handle, None
 
     @staticmethod
@@ -45,7 +57,13 @@ class UCSCSession(object):
 
 
 class EUcscHandle(UcscHandle):
-    
+
+    def __init__(self, ip, username, password, port=443):
+        # The SDK only talks https on 443, any other port is spoken to over plain http.
+        super(EUcscHandle, self).__init__(ip, username, password)
+        if port != 443:
+            self._UcscSession__uri = "http://{0}:{1}".format(ip, port)
+
     def rawXML(self, xml):
         from ucscsdk import ucscxmlcodec
         # send the XML to UCS Central
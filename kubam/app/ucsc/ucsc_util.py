@@ -1,6 +1,9 @@
+import time
 from ucsc_session import UCSCSession
 from db import YamlDB
-from helper import KubamError
+from helper import KubamError, ServerIndex, server_name
+from metrics import Metrics
+from tracing import Tracer
 
 
 class UCSCUtil(object):
@@ -21,11 +24,15 @@ class UCSCUtil(object):
                 if err == 1:
                     raise KubamError(msg)
 
-                h, msg = ucs_session.login(credentials['user'], password, credentials['ip'])
+                start = time.time()
+                h, msg = ucs_session.login(credentials['user'], password, credentials['ip'], credentials.get('port'))
+                Metrics.observe("kubam_login_seconds", time.time() - start, platform="ucsc",
+                                server_group=server_group.get("name", ""), result="error" if msg or not h else "ok")
                 if msg:
                     raise KubamError(msg)
                 if h:
-                    return h
+                    h = Metrics.instrument_handle(h, "ucsc", server_group.get("name", ""))
+                    return Tracer.instrument_handle(h)
                 else:
                     raise KubamError("Not logged in into UCS")
             else:
@@ -60,31 +67,17 @@ class UCSCUtil(object):
         if ip == "":
             raise KubamError("Please enter a valid UCSM IP address.")
         ucsc_session = UCSCSession()
-        h, err = ucsc_session.login(user, pw, ip)
+        h, err = ucsc_session.login(user, pw, ip, request['credentials'].get('port'))
         if not h:
             raise KubamError(err)
         UCSCSession.logout(h)
 
     @staticmethod
     def objects_to_servers(servers, attribs):
-        blades = []
-        rack_mounts = []
         all_return = {}
         for s in servers:
-            parts = [x for x in s["dn"] if x.isdigit()]
-            if "chassis" in s["dn"]:
-                b = parts[-1]
-                c = parts[-2]
-                d = "".join(parts[:-2])
-                blades.append("{0}/{1}/{2}: {3}".format(d, c, b, ",".join([ s[p] for p in attribs] )))
-            else:
-                d = "".join(parts[0:4])
-                r = "".join(parts[4:])
-                rack_mounts.append("{0}/{1}: {2}".format(d, r, ",".join([ s[p] for p in attribs] )))
-        if blades:
-            all_return["blades"] = blades
-        if rack_mounts:
-            all_return["rack_servers"] = rack_mounts
+            kind, name = server_name(s["dn"], domains=True)
+            all_return.setdefault(kind, []).append("{0}: {1}".format(name, ",".join([ s[p] for p in attribs] )))
         return all_return
 
     @staticmethod
@@ -92,36 +85,9 @@ class UCSCUtil(object):
         """
         take in all of the UCS objects and filter out the ones the API 
         passed into us and return a list with just the servers we wanted. 
+        Blades are domain/chassis/slot and rack servers domain/rack.
         """
-        r_s = []
-        if "blades" in servers:
-            for s in servers["blades"]:
-                found = False
-                b_parts = s.split("/")
-                for real in objects:
-                    if not "chassis_id" in real:
-                        continue
-                    if (real['domain_id'] == b_parts[0] and
-                        real['chassis_id'] ==  b_parts[1] and
-                       real['slot'] == b_parts[2] ):
-                        found = True
-                        r_s.append(real)
-                if not found:
-                    raise KubamError("server {0} does not exist:".format(s))
-        if "rack_servers" in servers:
-            for s in servers["rack_servers"]:
-                found = False
-                r_parts = s.split("/")
-                for real in objects:
-                    if not "rack_id" in real:
-                        continue
-                    if (real['domain_id'] == r_parts[0] and 
-                        real['rack_id'] == r_parts[1]):
-                        found = True
-                        r_s.append(real)
-                if not found:
-                    raise KubamError("server {0} does not exist!".format(s))
-        return r_s
+        return ServerIndex(objects, domains=True).select(servers)
 
 
     @staticmethod
@@ -130,11 +96,11 @@ class UCSCUtil(object):
         Takes in hash that looks like:
         dn : <properties>
         such as:
-        /sys/chassis-1/blade-1 : { "foo" : "bar", "baz" : "bat" }
+        compute/sys-1009/chassis-1/blade-1 : { "foo" : "bar", "baz" : "bat" }
         returns the dn in a way the API likes to see it:
         {
            "blades" :
-            [ {"1/1" : {
+            [ {"1009/1/1" : {
                 "foo" : "bar",
                 "baz" : "bat"
                 }
@@ -144,23 +110,8 @@ class UCSCUtil(object):
             [...]
         }
         """
-        blades = {}
-        rack_mounts = {}
         all_return = {}
         for s in dn_hash.keys():
-            parts = [x for x in s if x.isdigit()]
-            if "chassis" in s:
-                b = parts[-1]
-                c = parts[-2]
-                d = "".join(parts[:-2])
-                blades["{0}/{1}/{2}".format(d, c, b)] = dn_hash[s]
-            else:
-                d = "".join(parts[0:4])
-                r = "".join(parts[4:])
-                rack_mounts["{0}/{1}".format(d, r)] = dn_hash[s]
-                
-        if blades:
-            all_return["blades"] = blades
-        if rack_mounts:
-            all_return["rack_servers"] = rack_mounts
+            kind, name = server_name(s, domains=True)
+            all_return.setdefault(kind, {})[name] = dn_hash[s]
         return all_return
@@ -0,0 +1,44 @@
+"""
+Write ucscmeta.idx, the compact class metadata index read by ucscmeta_lazy.py, for an installed
+ucscsdk whose patched ucscmeta.py was installed as ucscmeta_full.py:
+
+    python mkmetaindex.py /usr/lib/python2.7/site-packages/ucscsdk
+"""
+import os
+import sys
+import marshal
+import importlib
+
+
+def build(sdk_dir):
+    sdk_dir = os.path.abspath(sdk_dir)
+    sys.path.insert(0, os.path.dirname(sdk_dir))
+    full = importlib.import_module(os.path.basename(sdk_dir) + ".ucscmeta_full")
+    versions = dict((k, str(v)) for k, v in vars(full.VersionMeta).items() if k.startswith("Version"))
+    names = dict((id(v), k) for k, v in vars(full.VersionMeta).items() if k.startswith("Version"))
+    table = {}
+    for class_id, m in full.MO_CLASS_META.items():
+        table[class_id] = marshal.dumps((m.name, m.xml_attribute, m.rn, names[id(m.version)], m.inp_out, m.mask,
+                                         m.field_names, m.access, m.parents, m.children, m.verbs))
+    st = os.stat(os.path.join(sdk_dir, "ucscmeta_full.py"))
+    index = {
+        "source": (st.st_size, int(st.st_mtime)),
+        "versions": versions,
+        "mo_class_id": frozenset(full.MO_CLASS_ID),
+        "mo_class_meta": table,
+        "method_class_id": frozenset(full.METHOD_CLASS_ID),
+        "other_type_class_id": dict(full.OTHER_TYPE_CLASS_ID),
+    }
+    index_file = os.path.join(sdk_dir, "ucscmeta.idx")
+    with open(index_file + ".tmp", "wb") as f:
+        marshal.dump(index, f)
+    os.rename(index_file + ".tmp", index_file)
+    return index_file, len(table)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print "usage: {0} <ucscsdk directory>".format(sys.argv[0])
+        sys.exit(1)
+    index_file, count = build(sys.argv[1])
+    print "wrote {0} with the metadata of {1} classes".format(index_file, count)
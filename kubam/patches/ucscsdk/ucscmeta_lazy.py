@@ -0,0 +1,100 @@
+# Copyright 2015 Cisco Systems, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+KUBAM replacement for ucscmeta.  The class metadata of the patched ucscmeta (installed as
+ucscmeta_full.py) is read from ucscmeta.idx, a marshalled index written by mkmetaindex.py when
+the image is built.  Each MoMeta is only decoded the first time its class is looked up.  Without
+an up to date index the full module is imported as before.
+"""
+
+import os
+import marshal
+from .ucsccoremeta import UcscVersion
+from .ucsccoremeta import MoMeta
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_FILE = os.path.join(_DIR, "ucscmeta.idx")
+FULL_FILE = os.path.join(_DIR, "ucscmeta_full.py")
+
+
+class MoMetaIndex(object):
+    """
+    Read only mapping of class id to MoMeta over the marshalled MoMeta arguments of every class.
+    """
+
+    def __init__(self, table, versions):
+        self._table = table
+        self._versions = versions
+        self._metas = {}
+
+    def __getitem__(self, class_id):
+        meta = self._metas.get(class_id)
+        if meta is None:
+            args = list(marshal.loads(self._table[class_id]))
+            args[3] = getattr(self._versions, args[3])
+            meta = MoMeta(*args)
+            self._metas[class_id] = meta
+        return meta
+
+    def __contains__(self, class_id):
+        return class_id in self._table
+
+    def __iter__(self):
+        return iter(self._table)
+
+    def __len__(self):
+        return len(self._table)
+
+    def get(self, class_id, default=None):
+        if class_id in self._table:
+            return self[class_id]
+        return default
+
+    def keys(self):
+        return self._table.keys()
+
+    def values(self):
+        return [self[k] for k in self._table]
+
+    def items(self):
+        return [(k, self[k]) for k in self._table]
+
+
+def _load_index():
+    """
+    :return: the index, None if it is missing or was built from another ucscmeta_full.py
+    """
+    try:
+        st = os.stat(FULL_FILE)
+        with open(INDEX_FILE, "rb") as f:
+            index = marshal.load(f)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(index, dict) or index.get("source") != (st.st_size, int(st.st_mtime)):
+        return None
+    return index
+
+
+_index = _load_index()
+if _index is None:
+    from .ucscmeta_full import VersionMeta, MO_CLASS_ID, MO_CLASS_META, METHOD_CLASS_ID, \
+        OTHER_TYPE_CLASS_ID
+else:
+    VersionMeta = type("VersionMeta", (object,),
+                       dict((k, UcscVersion(v)) for k, v in _index["versions"].items()))
+    MO_CLASS_ID = _index["mo_class_id"]
+    MO_CLASS_META = MoMetaIndex(_index["mo_class_meta"], VersionMeta)
+    METHOD_CLASS_ID = _index["method_class_id"]
+    OTHER_TYPE_CLASS_ID = _index["other_type_class_id"]
+del _index